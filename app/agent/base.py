@@ -1,13 +1,19 @@
+import asyncio
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
 from typing import List, Optional
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 
+from app.agent.loop_detector import LoopDetector
+from app.deadline import deadline_scope
+from app.exceptions import DeadlineExceeded
+from app.journal import Journal
 from app.llm import LLM
 from app.logger import logger
-from app.sandbox.client import SANDBOX_CLIENT
+from app.sandbox.client import get_sandbox_client
 from app.schema import ROLE_TYPE, AgentState, Memory, Message
+from app.usage import UsageScope, run_usage_scope
 
 
 class BaseAgent(BaseModel, ABC):
@@ -41,6 +47,21 @@ class BaseAgent(BaseModel, ABC):
     current_step: int = Field(default=0, description="Current step in execution")
 
     duplicate_threshold: int = 2
+    # Number of recent assistant turns compared by the loop detector
+    duplicate_window: int = 20
+    # Estimated text similarity above which turns count as duplicates
+    # (None only detects exact repeats)
+    near_duplicate_similarity: Optional[float] = 0.9
+
+    _loop_detector: Optional[LoopDetector] = PrivateAttr(default=None)
+    _last_observed: Optional[Message] = PrivateAttr(default=None)
+
+    usage: Optional[UsageScope] = Field(
+        None, description="Token usage scope of the current or latest run"
+    )
+    journal: Optional[Journal] = Field(
+        None, description="Journal each completed step is recorded to"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -53,6 +74,7 @@ class BaseAgent(BaseModel, ABC):
             self.llm = LLM(config_name=self.name.lower())
         if not isinstance(self.memory, Memory):
             self.memory = Memory()
+        self.memory.set_token_counter(self.llm.count_message, self.llm.acount_messages)
         return self
 
     @asynccontextmanager
@@ -113,46 +135,85 @@ class BaseAgent(BaseModel, ABC):
         kwargs = {"base64_image": base64_image, **(kwargs if role == "tool" else {})}
         self.memory.add_message(message_map[role](content, **kwargs))
 
-    async def run(self, request: Optional[str] = None) -> str:
+    async def run(
+        self, request: Optional[str] = None, timeout: Optional[float] = None
+    ) -> str:
         """Execute the agent's main loop asynchronously.
 
         Args:
             request: Optional initial user request to process.
+            timeout: Optional time budget in seconds for the whole run.
 
         Returns:
             A string summarizing the execution results.
 
         Raises:
             RuntimeError: If the agent is not in IDLE state at start.
+            DeadlineExceeded: If the run (or an enclosing one) ran out of time.
         """
         if self.state != AgentState.IDLE:
             raise RuntimeError(f"Cannot run agent from state: {self.state}")
 
         if request:
             self.update_memory("user", request)
+            # The task itself must survive memory eviction
+            self.memory.pin(self.memory.messages[-1])
 
         results: List[str] = []
-        async with self.state_context(AgentState.RUNNING):
-            while (
-                self.current_step < self.max_steps and self.state != AgentState.FINISHED
-            ):
-                self.current_step += 1
-                logger.info(f"Executing step {self.current_step}/{self.max_steps}")
-                step_result = await self.step()
-
-                # Check for stuck state
-                if self.is_stuck():
-                    self.handle_stuck_state()
-
-                results.append(f"Step {self.current_step}: {step_result}")
-
-            if self.current_step >= self.max_steps:
-                self.current_step = 0
-                self.state = AgentState.IDLE
-                results.append(f"Terminated: Reached max steps ({self.max_steps})")
-        await SANDBOX_CLIENT.cleanup()
+        try:
+            # Charge usage to the enclosing run (e.g. a flow) or to this run
+            with run_usage_scope(self.name) as self.usage:
+                async with deadline_scope(timeout), self.state_context(
+                    AgentState.RUNNING
+                ):
+                    while (
+                        self.current_step < self.max_steps
+                        and self.state != AgentState.FINISHED
+                    ):
+                        self.current_step += 1
+                        logger.info(
+                            f"Executing step {self.current_step}/{self.max_steps}"
+                        )
+                        step_result = await self.step()
+
+                        # Check for stuck state
+                        if self.is_stuck():
+                            self.handle_stuck_state()
+
+                        results.append(f"Step {self.current_step}: {step_result}")
+                        await self.checkpoint()
+
+                    if self.current_step >= self.max_steps:
+                        self.current_step = 0
+                        self.state = AgentState.IDLE
+                        results.append(
+                            f"Terminated: Reached max steps ({self.max_steps})"
+                        )
+        except (DeadlineExceeded, asyncio.CancelledError):
+            # Stop subprocesses and browsers the interrupted step left behind
+            logger.warning(f"Run of agent '{self.name}' was interrupted")
+            await self.cleanup()
+            raise
+        finally:
+            self.cancel_background_tasks()
+            await get_sandbox_client().cleanup()
         return "\n".join(results) if results else "No steps executed"
 
+    def cancel_background_tasks(self) -> None:
+        """Cancel work started in the background that must not outlive a run."""
+
+    async def cleanup(self) -> None:
+        """Release the resources held by the agent's tools."""
+
+    async def checkpoint(self) -> None:
+        """Record the completed step to the journal, if any."""
+        if self.journal is None:
+            return
+        try:
+            await self.journal.acheckpoint(self)
+        except OSError as e:
+            logger.warning(f"Failed to journal step {self.current_step}: {e}")
+
     @abstractmethod
     async def step(self) -> str:
         """Execute a single step in the agent's workflow.
@@ -164,26 +225,36 @@ class BaseAgent(BaseModel, ABC):
         """Handle stuck state by adding a prompt to change strategy"""
         stuck_prompt = "\
         Observed duplicate responses. Consider new strategies and avoid repeating ineffective paths already attempted."
-        self.next_step_prompt = f"{stuck_prompt}\n{self.next_step_prompt}"
+        if not (self.next_step_prompt or "").startswith(stuck_prompt):
+            self.next_step_prompt = f"{stuck_prompt}\n{self.next_step_prompt or ''}"
         logger.warning(f"Agent detected stuck state. Added prompt: {stuck_prompt}")
 
-    def is_stuck(self) -> bool:
-        """Check if the agent is stuck in a loop by detecting duplicate content"""
-        if len(self.memory.messages) < 2:
-            return False
+    @property
+    def loop_detector(self) -> LoopDetector:
+        if self._loop_detector is None:
+            self._loop_detector = LoopDetector(
+                threshold=self.duplicate_threshold,
+                window=self.duplicate_window,
+                similarity=self.near_duplicate_similarity,
+            )
+        return self._loop_detector
 
-        last_message = self.memory.messages[-1]
-        if not last_message.content:
+    def is_stuck(self) -> bool:
+        """Check if the latest turn repeats recent assistant text or tool calls"""
+        # Only the messages added since the previous check are examined
+        new_messages = []
+        for message in reversed(self.memory.messages):
+            if message is self._last_observed:
+                break
+            new_messages.append(message)
+        if not new_messages:
             return False
+        self._last_observed = new_messages[0]
 
-        # Count identical content occurrences
-        duplicate_count = sum(
-            1
-            for msg in reversed(self.memory.messages[:-1])
-            if msg.role == "assistant" and msg.content == last_message.content
-        )
-
-        return duplicate_count >= self.duplicate_threshold
+        stuck = False
+        for message in reversed(new_messages):
+            stuck = self.loop_detector.observe(message) or stuck
+        return stuck
 
     @property
     def messages(self) -> List[Message]:
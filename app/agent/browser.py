@@ -1,3 +1,4 @@
+import asyncio
 import json
 from typing import Any, Optional
 
@@ -6,10 +7,14 @@ from pydantic import Field
 from app.agent.toolcall import ToolCallAgent
 from app.logger import logger
 from app.prompt.browser import NEXT_STEP_PROMPT, SYSTEM_PROMPT
-from app.schema import Message, ToolChoice
+from app.schema import Message, ToolCall, ToolChoice
 from app.tool import BrowserUseTool, Terminate, ToolCollection
 
 
+# Read from the class: instantiating the tool would create an LLM client
+BROWSER_TOOL_NAME = BrowserUseTool.model_fields["name"].default
+
+
 class BrowserAgent(ToolCallAgent):
     """
     A browser agent that uses the browser_use library to control a browser.
@@ -37,14 +42,65 @@ class BrowserAgent(ToolCallAgent):
     special_tool_names: list[str] = Field(default_factory=lambda: [Terminate().name])
 
     _current_base64_image: Optional[str] = None
+    # State capture for the next step, started once the browser is done acting
+    _browser_state_task: Optional[asyncio.Task] = None
 
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         if not self._is_special_tool(name):
             return
         else:
+            self._cancel_state_prefetch()
             await self.available_tools.get_tool(BrowserUseTool().name).cleanup()
             await super()._handle_special_tool(name, result, **kwargs)
 
+    async def execute_tool(self, command: ToolCall) -> str:
+        result = await super().execute_tool(command)
+        if self._is_last_browser_call(command):
+            # Capture the next step's state while the remaining tools run
+            self._start_state_prefetch()
+        return result
+
+    def _is_last_browser_call(self, command: ToolCall) -> bool:
+        """Whether no later browser call is known in this step.
+
+        While the response is streamed, `tool_calls` only holds the calls
+        dispatched so far; a browser call streamed later restarts the
+        prefetch once it has run.
+        """
+        if command.function.name != BROWSER_TOOL_NAME:
+            return False
+        calls = [call.id for call in self.tool_calls]
+        if command.id not in calls:
+            return False
+        later = self.tool_calls[calls.index(command.id) + 1 :]
+        return all(call.function.name != BROWSER_TOOL_NAME for call in later)
+
+    def _start_state_prefetch(self) -> None:
+        self._cancel_state_prefetch()
+        self._browser_state_task = asyncio.create_task(self.get_browser_state())
+
+    def _cancel_state_prefetch(self) -> None:
+        if self._browser_state_task is not None:
+            self._browser_state_task.cancel()
+            self._browser_state_task = None
+
+    def cancel_background_tasks(self) -> None:
+        """Also drop a browser state capture nobody will read."""
+        super().cancel_background_tasks()
+        self._cancel_state_prefetch()
+
+    async def _next_browser_state(self) -> Optional[dict]:
+        """The prefetched browser state if one is pending, else a fresh capture."""
+        task, self._browser_state_task = self._browser_state_task, None
+        if task is None:
+            return await self.get_browser_state()
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            return await self.get_browser_state()
+
     async def get_browser_state(self) -> Optional[dict]:
         """Get the current browser state for context in next steps."""
         browser_tool = self.available_tools.get_tool(BrowserUseTool().name)
@@ -72,8 +128,8 @@ class BrowserAgent(ToolCallAgent):
 
     async def think(self) -> bool:
         """Process current state and decide next actions using tools, with browser state info added"""
-        # Add browser state to the context
-        browser_state = await self.get_browser_state()
+        # Add browser state to the context, usually prefetched during `act`
+        browser_state = await self._next_browser_state()
 
         # Initialize placeholder values
         url_info = ""
@@ -109,7 +165,7 @@ class BrowserAgent(ToolCallAgent):
                     content="Current browser screenshot:",
                     base64_image=self._current_base64_image,
                 )
-                self.memory.add_message(image_message)
+                self.add_step_message(image_message)
 
         # Replace placeholders with actual browser state info
         self.next_step_prompt = NEXT_STEP_PROMPT.format(
@@ -0,0 +1,142 @@
+"""Background compaction of agent memory.
+
+When the stored conversation approaches a configurable fraction of the
+model's context (or of the remaining input token budget), the oldest span of
+messages is summarized by the LLM into a single synthetic message. The
+summary is produced in a background task while the current step's tools
+execute and is swapped into memory before a later `think`, so it adds no
+latency to the agent loop.
+
+The first user message (the task), pinned messages and the most recent
+messages are never summarized, and a span never ends between an assistant
+tool call and its tool results.
+"""
+
+import asyncio
+from typing import Callable, List, Optional
+
+from app.config import CompactionSettings, config
+from app.llm import LLM
+from app.logger import logger
+from app.prompt.compaction import SUMMARY_MESSAGE, SUMMARY_PROMPT, SUMMARY_SYSTEM_PROMPT
+from app.schema import Memory, Message, Role
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + " ...[truncated]"
+
+
+class ContextCompactor:
+    """Summarizes old spans of an agent's memory in the background."""
+
+    def __init__(self, llm: LLM, settings: Optional[CompactionSettings] = None):
+        self.llm = llm
+        self.settings = settings or config.compaction
+        self._task: Optional[asyncio.Task] = None
+        self._span: List[Message] = []
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def token_limit(self) -> int:
+        """The memory size in tokens above which compaction is required."""
+        limit = self.settings.context_tokens
+        remaining = self.llm.remaining_input_tokens()
+        if remaining is not None:
+            limit = min(limit, remaining)
+        return limit
+
+    def select_span(
+        self,
+        messages: List[Message],
+        is_pinned: Callable[[Message], bool] = lambda message: False,
+    ) -> List[Message]:
+        """The oldest messages that can be summarized as one unit."""
+        start = 1 if messages and messages[0].role == Role.USER else 0
+        while start < len(messages) and is_pinned(messages[start]):
+            start += 1
+        end = len(messages) - self.settings.keep_recent
+        # A pinned message ends the span; it is kept verbatim
+        end = next(
+            (i for i in range(start, max(end, start)) if is_pinned(messages[i])), end
+        )
+        # Tool results must stay with the assistant message that requested them
+        while start < end < len(messages) and messages[end].role == Role.TOOL:
+            end -= 1
+        if end - start < 2:
+            return []
+        return messages[start:end]
+
+    def maybe_start(self, memory: Memory) -> bool:
+        """Start summarizing in the background if memory is getting too large."""
+        if not self.settings.enabled or self.running:
+            return False
+        if memory.token_count < self.settings.threshold * self.token_limit():
+            return False
+        span = self.select_span(memory.messages, memory.is_pinned)
+        if not span:
+            return False
+
+        logger.info(
+            f"🗜️ Compacting {len(span)} messages in the background "
+            f"({memory.token_count} tokens in memory)"
+        )
+        self._span = span
+        self._task = asyncio.create_task(self._summarize(span))
+        return True
+
+    async def apply(self, memory: Memory) -> bool:
+        """Swap a finished summary into memory.
+
+        The summary is only awaited if memory has already outgrown the token
+        limit; otherwise an unfinished summary is left for a later step.
+        """
+        if self._task is None:
+            return False
+        if not self._task.done():
+            if memory.token_count < self.token_limit():
+                return False
+            await asyncio.wait([self._task])
+
+        task, span = self._task, self._span
+        self._task, self._span = None, []
+        try:
+            summary = task.result()
+        except Exception as e:
+            logger.warning(f"Memory compaction failed: {e}")
+            return False
+
+        message = Message.user_message(SUMMARY_MESSAGE.format(summary=summary))
+        if not memory.replace_messages(span, [message]):
+            logger.warning("Memory changed during compaction, summary discarded")
+            return False
+        logger.info(
+            f"🗜️ Replaced {len(span)} messages with a summary "
+            f"({memory.token_count} tokens in memory)"
+        )
+        return True
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._task, self._span = None, []
+
+    def _render(self, message: Message) -> str:
+        limit = self.settings.max_summary_input_chars
+        role = getattr(message.role, "value", message.role)
+        speaker = f"tool {message.name}" if role == Role.TOOL else role
+        lines = [f"{speaker}: {_clip(message.content or '', limit)}"]
+        for call in message.tool_calls or []:
+            lines.append(
+                f"  -> {call.function.name}({_clip(call.function.arguments, limit)})"
+            )
+        return "\n".join(lines)
+
+    async def _summarize(self, span: List[Message]) -> str:
+        conversation = "\n\n".join(self._render(message) for message in span)
+        return await self.llm.ask(
+            [Message.user_message(SUMMARY_PROMPT.format(conversation=conversation))],
+            system_msgs=[Message.system_message(SUMMARY_SYSTEM_PROMPT)],
+            stream=False,
+        )
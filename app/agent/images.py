@@ -0,0 +1,78 @@
+"""Aging out old images in agent memory.
+
+Browser agents attach a screenshot on every step, but only the most recent
+ones help the model decide what to do next. Images that have been in memory
+for more than `keep_recent_steps` steps are either dropped from their
+message (the text is kept) or replaced by a downscaled copy.
+"""
+
+import asyncio
+from typing import Dict, Optional, Set
+
+from app.blob_store import BlobStore, downscale_image, get_blob_store
+from app.config import ImageStoreSettings, config
+from app.logger import logger
+from app.schema import Memory
+
+
+class ImageRetention:
+    """Applies the `[image_store]` age policy to an agent's memory."""
+
+    def __init__(
+        self,
+        settings: Optional[ImageStoreSettings] = None,
+        store: Optional[BlobStore] = None,
+    ):
+        self.settings = settings or config.image_store
+        self.store = store or get_blob_store()
+        # Step at which each image message was first seen, by message id
+        self._seen: Dict[int, int] = {}
+        self._downscaled: Set[str] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.keep_recent_steps is not None
+
+    async def apply(self, memory: Memory, step: int) -> int:
+        """Age out images older than the configured number of steps.
+
+        Returns the number of messages whose image was dropped or downscaled.
+        """
+        if not self.enabled:
+            return 0
+
+        seen, aged = {}, []
+        for message in memory.messages:
+            if message.image_ref is None:
+                continue
+            first_seen = self._seen.get(id(message), step)
+            seen[id(message)] = first_seen
+            if step - first_seen >= self.settings.keep_recent_steps:
+                if message.image_ref not in self._downscaled:
+                    aged.append(message)
+        self._seen = seen
+
+        for message in aged:
+            if self.settings.old_images == "downscale":
+                message.image_ref = await self._downscale(message.image_ref)
+            else:
+                message.image_ref = None
+        if aged:
+            memory.recount(aged)
+            logger.debug(f"Aged out images of {len(aged)} messages")
+        return len(aged)
+
+    async def _downscale(self, ref: str) -> Optional[str]:
+        data = self.store.get(ref)
+        if data is None:
+            return None
+        try:
+            small = await asyncio.to_thread(
+                downscale_image, data, self.settings.downscale_max_side
+            )
+        except Exception as e:
+            logger.warning(f"Failed to downscale image {ref}, dropping it: {e}")
+            return None
+        small_ref = self.store.put(small)
+        self._downscaled.add(small_ref)
+        return small_ref
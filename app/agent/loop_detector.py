@@ -0,0 +1,128 @@
+"""Detection of agents repeating themselves.
+
+Each assistant turn is reduced to a few hashes: one of its text, one of its
+tool calls (name and canonicalized arguments) and a MinHash signature of
+the text's word shingles. Only the last `window` turns are kept, with counts
+indexed by hash, so checking a new turn costs the same however long the
+run has been going. A turn is a repeat if its text or its tool calls were
+seen `threshold` times in the window, or if its text is a near duplicate
+(estimated Jaccard similarity of at least `similarity`) of that many turns.
+"""
+
+import hashlib
+import json
+from collections import Counter, deque
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from app.schema import Message, Role
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _hash(text: str) -> int:
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _shingles(text: str, size: int = 3) -> Iterable[str]:
+    words = text.lower().split()
+    if len(words) <= size:
+        return [" ".join(words)]
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHash:
+    """Fixed-size MinHash signatures of word shingles."""
+
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        self.num_perm = num_perm
+        self._params = [
+            (_hash(f"a{seed}:{i}") % _MERSENNE_PRIME or 1, _hash(f"b{seed}:{i}"))
+            for i in range(num_perm)
+        ]
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [_hash(shingle) for shingle in _shingles(text)]
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._params
+        )
+
+    @staticmethod
+    def similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of the shingle sets."""
+        return sum(x == y for x, y in zip(left, right)) / len(left)
+
+
+class _Turn:
+    __slots__ = ("keys", "signature")
+
+    def __init__(self, keys: List[int], signature: Optional[Tuple[int, ...]]):
+        self.keys = keys
+        self.signature = signature
+
+
+class LoopDetector:
+    """Tracks the recent assistant turns of an agent in a bounded window."""
+
+    def __init__(
+        self,
+        threshold: int = 2,
+        window: int = 20,
+        similarity: Optional[float] = 0.9,
+        num_perm: int = 32,
+    ):
+        self.threshold = threshold
+        self.similarity = similarity
+        self._minhash = MinHash(num_perm) if similarity is not None else None
+        self._turns: Deque[_Turn] = deque(maxlen=window)
+        self._counts: Counter = Counter()
+
+    @staticmethod
+    def _calls_key(message: Message) -> Optional[int]:
+        if not message.tool_calls:
+            return None
+        calls = []
+        for call in message.tool_calls:
+            try:
+                arguments = json.loads(call.function.arguments or "{}")
+            except ValueError:
+                arguments = call.function.arguments
+            calls.append([call.function.name, arguments])
+        return _hash("calls:" + json.dumps(calls, sort_keys=True, default=str))
+
+    def observe(self, message: Message) -> bool:
+        """Record an assistant turn and report whether it repeats recent ones."""
+        if message.role != Role.ASSISTANT:
+            return False
+
+        content = (message.content or "").strip()
+        keys = [key for key in (self._calls_key(message),) if key is not None]
+        if content:
+            keys.append(_hash("content:" + content))
+        signature = None
+        if content and self._minhash is not None:
+            signature = self._minhash.signature(content)
+
+        repeated = any(self._counts[key] >= self.threshold for key in keys)
+        if not repeated and signature is not None:
+            similar = sum(
+                1
+                for turn in self._turns
+                if turn.signature is not None
+                and MinHash.similarity(signature, turn.signature) >= self.similarity
+            )
+            repeated = similar >= self.threshold
+
+        if len(self._turns) == self._turns.maxlen:
+            for key in self._turns[0].keys:
+                self._counts[key] -= 1
+                if not self._counts[key]:
+                    del self._counts[key]
+        self._turns.append(_Turn(keys, signature))
+        self._counts.update(keys)
+        return repeated
+
+    def reset(self) -> None:
+        self._turns.clear()
+        self._counts.clear()
@@ -4,6 +4,7 @@ from typing import Dict, List, Optional
 from pydantic import Field, model_validator
 
 from app.agent.toolcall import ToolCallAgent
+from app.deadline import deadline_scope
 from app.logger import logger
 from app.prompt.planning import NEXT_STEP_PROMPT, PLANNING_SYSTEM_PROMPT
 from app.schema import TOOL_CHOICE_TYPE, Message, ToolCall, ToolChoice
@@ -56,7 +57,7 @@ class PlanningAgent(ToolCallAgent):
             if self.active_plan_id
             else self.next_step_prompt
         )
-        self.messages.append(Message.user_message(prompt))
+        self.add_step_message(Message.user_message(prompt))
 
         # Get the current step index before thinking
         self.current_step_index = await self._get_current_step_index()
@@ -113,11 +114,17 @@ class PlanningAgent(ToolCallAgent):
         )
         return result.output if hasattr(result, "output") else str(result)
 
-    async def run(self, request: Optional[str] = None) -> str:
-        """Run the agent with an optional initial request."""
-        if request:
-            await self.create_initial_plan(request)
-        return await super().run()
+    async def run(
+        self, request: Optional[str] = None, timeout: Optional[float] = None
+    ) -> str:
+        """Run the agent with an optional initial request.
+
+        The time budget `timeout` also covers creating the initial plan.
+        """
+        async with deadline_scope(timeout):
+            if request:
+                await self.create_initial_plan(request)
+            return await super().run()
 
     async def update_plan_status(self, tool_call_id: str) -> None:
         """
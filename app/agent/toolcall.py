@@ -1,11 +1,16 @@
+import asyncio
 import json
-from typing import Any, List, Optional, Union
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
+from app.agent.compaction import ContextCompactor
+from app.agent.images import ImageRetention
 from app.agent.react import ReActAgent
-from app.exceptions import TokenLimitExceeded
+from app.exceptions import DeadlineExceeded, OpenManusError, TokenLimitExceeded
 from app.logger import logger
+from app.output_collector import set_observation_limit
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import TOOL_CHOICE_TYPE, AgentState, Message, ToolCall, ToolChoice
 from app.tool import CreateChatCompletion, Terminate, ToolCollection
@@ -13,6 +18,9 @@ from app.tool import CreateChatCompletion, Terminate, ToolCollection
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
 
+# Screenshot returned by the tool call running in the current task
+_tool_image: ContextVar[Optional[str]] = ContextVar("tool_image", default=None)
+
 
 class ToolCallAgent(ReActAgent):
     """Base agent class for handling tool/function calls with enhanced abstraction"""
@@ -23,53 +31,80 @@ class ToolCallAgent(ReActAgent):
     system_prompt: str = SYSTEM_PROMPT
     next_step_prompt: str = NEXT_STEP_PROMPT
 
-    available_tools: ToolCollection = ToolCollection(
-        CreateChatCompletion(), Terminate()
+    available_tools: ToolCollection = Field(
+        default_factory=lambda: ToolCollection(CreateChatCompletion(), Terminate())
     )
     tool_choices: TOOL_CHOICE_TYPE = ToolChoice.AUTO  # type: ignore
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
-    _current_base64_image: Optional[str] = None
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
 
+    # Upper bound on concurrency-safe tool calls of one step run at once
+    max_parallel_tools: int = 4
+
+    # Stream the LLM response and start each tool call as soon as it is complete
+    stream_tool_calls: bool = False
+    _early_tool_tasks: Optional[Dict[str, asyncio.Task]] = None
+    _last_early_tool_task: Optional[asyncio.Task] = None
+
+    # Summarizes old memory in the background (see `[compaction]` in config)
+    _compactor: Optional[ContextCompactor] = None
+    # Drops or downscales old images (see `[image_store]` in config)
+    _image_retention: Optional[ImageRetention] = None
+
+    # Per-step context (e.g. browser screenshots) sent with the next request only
+    _step_messages: List[Message] = PrivateAttr(default_factory=list)
+
+    def add_step_message(self, message: Message) -> None:
+        """Send `message` with this step's request without storing it in memory."""
+        self._step_messages.append(message)
+
     async def think(self) -> bool:
         """Process current state and decide next actions using tools"""
+        # Count the messages added since the last step without blocking
+        await self.memory.atoken_count()
+        await self.compactor.apply(self.memory)
+        if self._image_retention is None:
+            self._image_retention = ImageRetention()
+        await self._image_retention.apply(self.memory, self.current_step)
+
+        # The step prompt is rebuilt every step, so it is sent but not stored;
+        # otherwise each step would carry one more copy of it
+        step_messages, self._step_messages = self._step_messages, []
         if self.next_step_prompt:
-            user_msg = Message.user_message(self.next_step_prompt)
-            self.messages += [user_msg]
+            step_messages.append(Message.user_message(self.next_step_prompt))
+
+        request = dict(
+            messages=self.messages + step_messages,
+            system_msgs=(
+                [Message.system_message(self.system_prompt)]
+                if self.system_prompt
+                else None
+            ),
+            tools=self.available_tools.to_params(),
+            tool_choice=self.tool_choices,
+            tools_tokens=self.available_tools.params_token_cost(self.llm.count_tokens),
+        )
 
         try:
             # Get response with tool options
-            response = await self.llm.ask_tool(
-                messages=self.messages,
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
-                tools=self.available_tools.to_params(),
-                tool_choice=self.tool_choices,
-            )
-        except ValueError:
-            raise
-        except Exception as e:
-            # Check if this is a RetryError containing TokenLimitExceeded
-            if hasattr(e, "__cause__") and isinstance(e.__cause__, TokenLimitExceeded):
-                token_limit_error = e.__cause__
-                logger.error(
-                    f"🚨 Token limit error (from RetryError): {token_limit_error}"
-                )
-                self.memory.add_message(
-                    Message.assistant_message(
-                        f"Maximum token limit reached, cannot continue execution: {str(token_limit_error)}"
-                    )
+            if self.stream_tool_calls and self.tool_choices != ToolChoice.NONE:
+                response = await self._ask_tool_streaming(request)
+            else:
+                response = await self.llm.ask_tool(**request)
+        except TokenLimitExceeded as e:
+            # Token limits are permanent errors and are raised without retrying
+            logger.error(f"🚨 Token limit error: {e}")
+            self.memory.add_message(
+                Message.assistant_message(
+                    f"Maximum token limit reached, cannot continue execution: {str(e)}"
                 )
-                self.state = AgentState.FINISHED
-                return False
-            raise
+            )
+            self.state = AgentState.FINISHED
+            return False
 
         self.tool_calls = response.tool_calls
 
@@ -134,13 +169,13 @@ class ToolCallAgent(ReActAgent):
             # Return last message content if no tool calls
             return self.messages[-1].content or "No content or commands to execute"
 
-        results = []
-        for command in self.tool_calls:
-            # Reset base64_image for each tool call
-            self._current_base64_image = None
-
-            result = await self.execute_tool(command)
+        # Summarize old messages while the tools run
+        await self.memory.atoken_count()
+        self.compactor.maybe_start(self.memory)
 
+        results = []
+        outcomes = await self._run_tool_calls(self.tool_calls)
+        for command, (result, base64_image) in zip(self.tool_calls, outcomes):
             if self.max_observe:
                 result = result[: self.max_observe]
 
@@ -153,13 +188,122 @@ class ToolCallAgent(ReActAgent):
                 content=result,
                 tool_call_id=command.id,
                 name=command.function.name,
-                base64_image=self._current_base64_image,
+                base64_image=base64_image,
             )
             self.memory.add_message(tool_msg)
             results.append(result)
 
+        self._discard_early_tool_tasks()
         return "\n\n".join(results)
 
+    async def _run_tool_calls(
+        self, commands: List[ToolCall]
+    ) -> List[Tuple[str, Optional[str]]]:
+        """Run the calls of one step and return their outcomes in call order.
+
+        Consecutive calls whose tools declare them concurrency-safe run
+        together, at most `max_parallel_tools` at a time; any other call waits
+        for everything before it and runs alone.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.max_parallel_tools))
+
+        async def run(command: ToolCall) -> Tuple[str, Optional[str]]:
+            early_task = (self._early_tool_tasks or {}).pop(command.id, None)
+            if early_task:
+                # Already started while the LLM response was still streaming
+                return await early_task
+            async with semaphore:
+                return await self._execute_tool_with_image(command)
+
+        outcomes: List[Tuple[str, Optional[str]]] = []
+        batch: List[ToolCall] = []
+        for command in commands:
+            if self._is_concurrency_safe(command):
+                batch.append(command)
+                continue
+            if batch:
+                outcomes.extend(await asyncio.gather(*map(run, batch)))
+                batch = []
+            outcomes.append(await run(command))
+        if batch:
+            outcomes.extend(await asyncio.gather(*map(run, batch)))
+        return outcomes
+
+    def _is_concurrency_safe(self, command: ToolCall) -> bool:
+        tool = self.available_tools.tool_map.get(command.function.name)
+        if tool is None or self._is_special_tool(command.function.name):
+            return False
+        try:
+            args = json.loads(command.function.arguments or "{}")
+        except json.JSONDecodeError:
+            return False
+        return isinstance(args, dict) and tool.is_concurrency_safe(args)
+
+    @property
+    def compactor(self) -> ContextCompactor:
+        if self._compactor is None or self._compactor.llm is not self.llm:
+            if self._compactor is not None:
+                # A summary of the old LLM must not be swapped in later
+                self._compactor.cancel()
+            self._compactor = ContextCompactor(self.llm)
+        return self._compactor
+
+    async def _ask_tool_streaming(self, request: dict):
+        """Stream the tool-call response, dispatching completed calls early.
+
+        Falls back to the retried, non-streaming `ask_tool` when the stream
+        fails before any tool call was dispatched.
+        """
+        self._discard_early_tool_tasks()
+        self._early_tool_tasks = {}
+        # Holds the calls streamed so far until the full response replaces it
+        self.tool_calls = []
+        try:
+            return await self.llm.ask_tool_stream(
+                **request, on_tool_call=self._dispatch_tool_call
+            )
+        except Exception as e:
+            if self._early_tool_tasks or isinstance(e, (OpenManusError, ValueError)):
+                # The step failed; tools it already started must not keep running
+                self._discard_early_tool_tasks()
+                raise
+            logger.warning(f"Streaming tool call failed ({e}), retrying unstreamed")
+            return await self.llm.ask_tool(**request)
+
+    async def _dispatch_tool_call(self, command: ToolCall) -> None:
+        """Start a tool call in the background, after the previously dispatched one"""
+        previous = self._last_early_tool_task
+
+        async def run_in_order() -> Tuple[str, Optional[str]]:
+            if previous:
+                await asyncio.wait([previous])
+            return await self._execute_tool_with_image(command)
+
+        logger.info(f"🚀 Dispatching tool '{command.function.name}' early")
+        self.tool_calls.append(command)
+        task = asyncio.create_task(run_in_order())
+        self._early_tool_tasks[command.id] = task
+        self._last_early_tool_task = task
+
+    def _discard_early_tool_tasks(self) -> None:
+        """Cancel early tool tasks that were never consumed by `act`"""
+        for task in (self._early_tool_tasks or {}).values():
+            task.cancel()
+        self._early_tool_tasks = None
+        self._last_early_tool_task = None
+
+    async def _execute_tool_with_image(
+        self, command: ToolCall
+    ) -> Tuple[str, Optional[str]]:
+        """Execute a tool call and return its observation and optional screenshot"""
+        # Reset base64_image for each tool call; concurrent calls run in
+        # separate tasks and so each see their own value
+        _tool_image.set(None)
+        # Keeps long command output within what `act` will keep of it
+        set_observation_limit(self.max_observe or None)
+        result = await self.execute_tool(command)
+        return result, _tool_image.get()
+
     async def execute_tool(self, command: ToolCall) -> str:
         """Execute a single tool call with robust error handling"""
         if not command or not command.function or not command.function.name:
@@ -183,7 +327,7 @@ class ToolCallAgent(ReActAgent):
             # Check if result is a ToolResult with base64_image
             if hasattr(result, "base64_image") and result.base64_image:
                 # Store the base64_image for later use in tool_message
-                self._current_base64_image = result.base64_image
+                _tool_image.set(result.base64_image)
 
                 # Format result for display
                 observation = (
@@ -207,11 +351,31 @@ class ToolCallAgent(ReActAgent):
                 f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{command.function.arguments}"
             )
             return f"Error: {error_msg}"
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             error_msg = f"⚠️ Tool '{name}' encountered a problem: {str(e)}"
             logger.error(error_msg)
             return f"Error: {error_msg}"
 
+    def cancel_background_tasks(self) -> None:
+        """Cancel an unfinished memory summary and unconsumed early tool calls."""
+        if self._compactor is not None:
+            self._compactor.cancel()
+        self._discard_early_tool_tasks()
+
+    async def cleanup(self) -> None:
+        """Release the resources held by the agent's tools."""
+        self.cancel_background_tasks()
+        for tool in self.available_tools or []:
+            cleanup = getattr(tool, "cleanup", None)
+            if cleanup is None:
+                continue
+            try:
+                await cleanup()
+            except Exception as e:
+                logger.warning(f"Failed to clean up tool '{tool.name}': {e}")
+
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
         if not self._is_special_tool(name):
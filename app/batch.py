@@ -0,0 +1,191 @@
+"""Running many agent tasks concurrently in one process.
+
+Each task gets a fresh agent (and so its own tools, memory and plans), its
+own sandbox client and its own usage scope, while expensive resources are
+shared: LLM clients and their connection pools are already shared per
+config, and browser tools open a private context in one shared browser.
+Results are appended to a JSONL file as tasks finish.
+
+    runner = BatchRunner(concurrency=4, timeout=1800)
+    results = await runner.run(load_tasks("tasks.jsonl"), "results.jsonl")
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from app.agent.base import BaseAgent
+from app.exceptions import DeadlineExceeded
+from app.logger import logger
+from app.sandbox.client import sandbox_client_scope
+from app.tool.browser_use_tool import BrowserUseTool, create_browser
+from app.usage import usage_scope
+
+
+class BatchTask(BaseModel):
+    """One line of a task file."""
+
+    id: str
+    prompt: str
+    max_steps: Optional[int] = None
+
+
+class TaskResult(BaseModel):
+    """Outcome and metrics of one task."""
+
+    id: str
+    status: str  # completed, failed or timeout
+    result: Optional[str] = None
+    error: Optional[str] = None
+    steps: int = 0
+    duration: float = 0.0
+    usage: Dict[str, Any] = Field(default_factory=dict)
+
+
+def load_tasks(path: Union[str, Path]) -> List[BatchTask]:
+    """Read tasks from a JSONL file; ids default to the line number."""
+    tasks = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            data.setdefault("id", str(line_no))
+            data["id"] = str(data["id"])
+            tasks.append(BatchTask(**data))
+    return tasks
+
+
+class SharedBrowser:
+    """One browser process whose contexts are handed out to browser tools."""
+
+    def __init__(self):
+        self._browser = None
+
+    def attach(self, agent: BaseAgent) -> None:
+        """Make the agent's browser tools open their context in this browser."""
+        tools = getattr(agent, "available_tools", None)
+        for tool in tools or []:
+            if isinstance(tool, BrowserUseTool):
+                if self._browser is None:
+                    self._browser = create_browser()
+                tool.browser = self._browser
+                tool.owns_browser = False
+
+    async def close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+
+
+def _default_agent() -> BaseAgent:
+    from app.agent.manus import Manus
+
+    return Manus()
+
+
+class BatchRunner:
+    """Runs tasks with at most `concurrency` agents at a time."""
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        timeout: Optional[float] = None,
+        agent_factory: Callable[[], BaseAgent] = _default_agent,
+        share_browser: bool = True,
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.agent_factory = agent_factory
+        self.browser = SharedBrowser() if share_browser else None
+
+    async def run(
+        self,
+        tasks: List[BatchTask],
+        output: Optional[Union[str, Path]] = None,
+    ) -> List[TaskResult]:
+        """Run all tasks and return their results in task order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        output_file = open(output, "a", encoding="utf-8") if output else None
+
+        async def run_one(task: BatchTask) -> TaskResult:
+            async with semaphore:
+                result = await self.run_task(task)
+            if output_file is not None:
+                output_file.write(result.model_dump_json() + "\n")
+                output_file.flush()
+            return result
+
+        start = time.monotonic()
+        try:
+            results = await asyncio.gather(*map(run_one, tasks))
+        finally:
+            if output_file is not None:
+                output_file.close()
+            if self.browser is not None:
+                await self.browser.close()
+
+        summary = summarize(results, time.monotonic() - start)
+        logger.info(f"Batch finished: {json.dumps(summary)}")
+        return list(results)
+
+    async def run_task(self, task: BatchTask) -> TaskResult:
+        """Run one task with its own agent, sandbox and usage scope."""
+        with usage_scope(f"task:{task.id}") as usage, sandbox_client_scope() as sandbox:
+            agent = self.agent_factory()
+            if task.max_steps is not None:
+                agent.max_steps = task.max_steps
+            if self.browser is not None:
+                self.browser.attach(agent)
+
+            logger.info(f"Starting task {task.id}")
+            start = time.monotonic()
+            status, result, error = "completed", None, None
+            try:
+                result = await agent.run(task.prompt, timeout=self.timeout)
+            except DeadlineExceeded:
+                status, error = "timeout", f"Timed out after {self.timeout}s"
+            except Exception as e:
+                status, error = "failed", str(e)
+            finally:
+                await agent.cleanup()
+                await sandbox.cleanup()
+
+            duration = time.monotonic() - start
+            logger.info(f"Task {task.id} {status} in {duration:.1f}s")
+            return TaskResult(
+                id=task.id,
+                status=status,
+                result=result,
+                error=error,
+                steps=agent.current_step,
+                duration=duration,
+                usage=usage.snapshot(),
+            )
+
+
+def summarize(results: List[TaskResult], wall_time: float) -> Dict[str, Any]:
+    """Aggregate metrics over a batch."""
+    durations = sorted(result.duration for result in results)
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+
+    def percentile(q: float) -> float:
+        if not durations:
+            return 0.0
+        return durations[min(len(durations) - 1, int(q * len(durations)))]
+
+    return {
+        "tasks": len(results),
+        "statuses": statuses,
+        "wall_time": round(wall_time, 3),
+        "duration_p50": round(percentile(0.5), 3),
+        "duration_p95": round(percentile(0.95), 3),
+        "input_tokens": sum(r.usage.get("input_tokens", 0) for r in results),
+        "completion_tokens": sum(r.usage.get("completion_tokens", 0) for r in results),
+    }
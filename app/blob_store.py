@@ -0,0 +1,154 @@
+"""Content-addressed store for base64 images referenced by messages.
+
+Screenshots are several megabytes of base64 each. Instead of carrying them
+inline, a `Message` keeps only the blob's hash (`image_ref`) and the bytes
+are looked up here when a request is sent. Blobs are kept in memory up to a
+size limit and the least recently used ones are evicted, spilling to disk
+when a directory is configured so that they can still be loaded later.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import PROJECT_ROOT, ImageStoreSettings, config
+from app.logger import logger
+
+
+class BlobStore:
+    """A size-bounded LRU of base64 strings keyed by their sha256."""
+
+    def __init__(self, max_memory_bytes: int, directory: Optional[Path] = None):
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = directory
+        self.spilled = 0
+        self._lock = threading.Lock()
+        self._blobs: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+
+    @classmethod
+    def from_settings(cls, settings: ImageStoreSettings) -> "BlobStore":
+        directory = None
+        if settings.directory:
+            directory = Path(settings.directory)
+            if not directory.is_absolute():
+                directory = PROJECT_ROOT / directory
+        return cls(
+            max_memory_bytes=settings.max_memory_mb * 1024 * 1024,
+            directory=directory,
+        )
+
+    @staticmethod
+    def make_ref(data: str) -> str:
+        return hashlib.sha256(data.encode("ascii", "surrogatepass")).hexdigest()
+
+    def _path(self, ref: str) -> Path:
+        return self.directory / ref[:2] / f"{ref}.b64"
+
+    def put(self, data: str) -> str:
+        """Store `data` and return its reference."""
+        ref = self.make_ref(data)
+        self._insert(ref, data)
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        """Return the blob for `ref`, or None if it is no longer available."""
+        with self._lock:
+            data = self._blobs.get(ref)
+            if data is not None:
+                self._blobs.move_to_end(ref)
+                return data
+        if self.directory is None:
+            return None
+        try:
+            data = self._path(ref).read_text(encoding="ascii")
+        except OSError:
+            return None
+        self._insert(ref, data)
+        return data
+
+    def persist(self, ref: str) -> bool:
+        """Write the blob for `ref` to disk so that it outlives the process.
+
+        Returns False if it cannot be, e.g. without a configured directory.
+        """
+        if self.directory is None:
+            return False
+        with self._lock:
+            data = self._blobs.get(ref)
+        if data is not None:
+            self._spill(ref, data)
+        return self._path(ref).exists()
+
+    def __contains__(self, ref: str) -> bool:
+        with self._lock:
+            if ref in self._blobs:
+                return True
+        return self.directory is not None and self._path(ref).exists()
+
+    def _insert(self, ref: str, data: str) -> None:
+        with self._lock:
+            if ref in self._blobs:
+                self._blobs.move_to_end(ref)
+                return
+            self._blobs[ref] = data
+            self._size += len(data)
+            evicted = []
+            while self._size > self.max_memory_bytes and len(self._blobs) > 1:
+                old_ref, old_data = self._blobs.popitem(last=False)
+                self._size -= len(old_data)
+                evicted.append((old_ref, old_data))
+        for old_ref, old_data in evicted:
+            self._spill(old_ref, old_data)
+
+    def _spill(self, ref: str, data: str) -> None:
+        if self.directory is None:
+            return
+        path = self._path(ref)
+        if path.exists():
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="ascii") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.spilled += 1
+        except OSError as e:
+            logger.warning(f"Failed to spill image blob {ref}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "blobs": len(self._blobs),
+                "memory_bytes": self._size,
+                "spilled": self.spilled,
+            }
+
+
+def downscale_image(data: str, max_side: int, quality: int = 70) -> str:
+    """Shrink a base64 image so that its longer side is at most `max_side`."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(base64.b64decode(data))) as image:
+        image.thumbnail((max_side, max_side))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Return the process-wide blob store built from `config.image_store`."""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore.from_settings(config.image_store)
+    return _blob_store
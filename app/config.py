@@ -15,6 +15,19 @@ PROJECT_ROOT = get_project_root()
 WORKSPACE_ROOT = PROJECT_ROOT / "workspace"
 
 
+class LLMEndpointSettings(BaseModel):
+    base_url: str = Field(..., description="API base URL")
+    api_key: Optional[str] = Field(
+        None, description="API key (defaults to the config's api_key)"
+    )
+    api_type: Optional[str] = Field(
+        None, description="Azure, Openai, or Ollama (defaults to the config's api_type)"
+    )
+    api_version: Optional[str] = Field(
+        None, description="Azure Openai version (defaults to the config's api_version)"
+    )
+
+
 class LLMSettings(BaseModel):
     model: str = Field(..., description="Model name")
     base_url: str = Field(..., description="API base URL")
@@ -27,6 +40,24 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="Azure, Openai, or Ollama")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    requests_per_minute: Optional[int] = Field(
+        None, description="Client-side request rate limit (None for unlimited)"
+    )
+    tokens_per_minute: Optional[int] = Field(
+        None, description="Client-side input token rate limit (None for unlimited)"
+    )
+    max_concurrency: Optional[int] = Field(
+        None,
+        description="Upper bound of the adaptive concurrency window (None for unbounded)",
+    )
+    hedge_percentile: Optional[float] = Field(
+        None,
+        description="Send a hedged duplicate request once this latency percentile (e.g. 95) is exceeded (None disables hedging)",
+    )
+    endpoints: List[LLMEndpointSettings] = Field(
+        default_factory=list,
+        description="Additional equivalent endpoints to balance and fail over across",
+    )
 
 
 class ProxySettings(BaseModel):
@@ -78,8 +109,100 @@ class SandboxSettings(BaseModel):
     )
 
 
+class LLMCacheSettings(BaseModel):
+    """Configuration for the on-disk LLM response cache"""
+
+    mode: str = Field(
+        "off",
+        description="Cache mode: off, read_through, record (always call and store) or replay (never call)",
+    )
+    directory: str = Field(
+        str(PROJECT_ROOT / ".cache" / "llm"),
+        description="Directory holding the cached responses",
+    )
+    max_size_mb: int = Field(
+        512, description="Size limit of the cache directory before LRU eviction"
+    )
+
+
+class HTTPClientSettings(BaseModel):
+    """Connection pool settings shared by all LLM clients"""
+
+    max_connections: int = Field(
+        100, description="Maximum open connections per API host"
+    )
+    max_keepalive_connections: int = Field(
+        20, description="Maximum idle keep-alive connections per API host"
+    )
+    keepalive_expiry: float = Field(
+        30.0, description="Seconds an idle connection is kept open"
+    )
+    http2: bool = Field(False, description="Use HTTP/2 (requires the 'h2' package)")
+    connect_timeout: float = Field(10.0, description="Connect timeout (seconds)")
+    read_timeout: float = Field(600.0, description="Read timeout (seconds)")
+    write_timeout: float = Field(600.0, description="Write timeout (seconds)")
+    pool_timeout: float = Field(
+        30.0, description="Seconds to wait for a free pooled connection"
+    )
+
+
+class CompactionSettings(BaseModel):
+    """Configuration for background compaction of agent memory"""
+
+    enabled: bool = Field(False, description="Summarize old messages automatically")
+    threshold: float = Field(
+        0.7,
+        description="Fraction of the context (or remaining budget) that triggers compaction",
+    )
+    context_tokens: int = Field(
+        128000, description="Context window of the agent's model in tokens"
+    )
+    keep_recent: int = Field(
+        8, description="Number of most recent messages that are never summarized"
+    )
+    max_summary_input_chars: int = Field(
+        2000, description="Characters of each old message shown to the summarizer"
+    )
+
+
+class ImageStoreSettings(BaseModel):
+    """Configuration for out-of-line storage of message images"""
+
+    max_memory_mb: int = Field(
+        64, description="Memory held by image blobs before LRU eviction"
+    )
+    directory: Optional[str] = Field(
+        None,
+        description="Directory evicted blobs are spilled to (None drops them)",
+    )
+    keep_recent_steps: Optional[int] = Field(
+        None,
+        description="Images older than this many agent steps are aged out (None keeps all)",
+    )
+    old_images: str = Field(
+        "drop", description="What to do with aged-out images: drop or downscale"
+    )
+    downscale_max_side: int = Field(
+        512, description="Longer side in pixels of downscaled images"
+    )
+
+
 class AppConfig(BaseModel):
     llm: Dict[str, LLMSettings]
+    llm_cache: LLMCacheSettings = Field(
+        default_factory=LLMCacheSettings, description="LLM response cache configuration"
+    )
+    llm_http: HTTPClientSettings = Field(
+        default_factory=HTTPClientSettings, description="LLM HTTP pool configuration"
+    )
+    compaction: CompactionSettings = Field(
+        default_factory=CompactionSettings,
+        description="Memory compaction configuration",
+    )
+    image_store: ImageStoreSettings = Field(
+        default_factory=ImageStoreSettings,
+        description="Message image storage configuration",
+    )
     sandbox: Optional[SandboxSettings] = Field(
         None, description="Sandbox configuration"
     )
@@ -146,6 +269,11 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "requests_per_minute": base_llm.get("requests_per_minute"),
+            "tokens_per_minute": base_llm.get("tokens_per_minute"),
+            "max_concurrency": base_llm.get("max_concurrency"),
+            "hedge_percentile": base_llm.get("hedge_percentile"),
+            "endpoints": base_llm.get("endpoints", []),
         }
 
         # handle browser config.
@@ -185,6 +313,12 @@ class Config:
         search_settings = None
         if search_config:
             search_settings = SearchSettings(**search_config)
+        llm_cache_config = raw_config.get("llm_cache", {})
+        llm_cache_settings = LLMCacheSettings(**llm_cache_config)
+        llm_http_settings = HTTPClientSettings(**raw_config.get("llm_http", {}))
+        compaction_settings = CompactionSettings(**raw_config.get("compaction", {}))
+        image_store_settings = ImageStoreSettings(**raw_config.get("image_store", {}))
+
         sandbox_config = raw_config.get("sandbox", {})
         if sandbox_config:
             sandbox_settings = SandboxSettings(**sandbox_config)
@@ -195,10 +329,15 @@ class Config:
             "llm": {
                 "default": default_settings,
                 **{
-                    name: {**default_settings, **override_config}
+                    # Endpoints belong to one deployment and are not inherited
+                    name: {**default_settings, "endpoints": [], **override_config}
                     for name, override_config in llm_overrides.items()
                 },
             },
+            "llm_cache": llm_cache_settings,
+            "llm_http": llm_http_settings,
+            "compaction": compaction_settings,
+            "image_store": image_store_settings,
             "sandbox": sandbox_settings,
             "browser_config": browser_settings,
             "search_config": search_settings,
@@ -210,6 +349,22 @@ class Config:
     def llm(self) -> Dict[str, LLMSettings]:
         return self._config.llm
 
+    @property
+    def llm_cache(self) -> LLMCacheSettings:
+        return self._config.llm_cache
+
+    @property
+    def llm_http(self) -> HTTPClientSettings:
+        return self._config.llm_http
+
+    @property
+    def compaction(self) -> CompactionSettings:
+        return self._config.compaction
+
+    @property
+    def image_store(self) -> ImageStoreSettings:
+        return self._config.image_store
+
     @property
     def sandbox(self) -> SandboxSettings:
         return self._config.sandbox
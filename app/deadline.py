@@ -0,0 +1,94 @@
+"""Run-scoped deadlines.
+
+A run (an agent run, a flow or a batch task) gets one wall-clock budget that
+everything it calls shares: LLM requests, tool executions and sandbox
+commands clamp their own timeouts to the time remaining instead of applying
+independent ones. When the deadline expires, the scope that set it cancels
+whatever is still running, so that subprocesses, sandbox containers and
+browsers are torn down on the cancellation path instead of being leaked.
+Like usage scopes, deadlines follow asyncio tasks through `contextvars`.
+
+    async with deadline_scope(1800):
+        await agent.run(prompt)  # raises DeadlineExceeded after 30 minutes
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+from app.exceptions import DeadlineExceeded
+
+
+class Deadline:
+    """A point in time by which a run must have finished."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def clamp(self, timeout: Optional[float]) -> float:
+        """`timeout` reduced to the time remaining."""
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"Run exceeded its deadline of {self.timeout:g}s")
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the run active in this context, if any."""
+    return _current_deadline.get()
+
+
+def clamp_timeout(timeout: Optional[float]) -> Optional[float]:
+    """`timeout` reduced to the current run's remaining time."""
+    deadline = current_deadline()
+    return timeout if deadline is None else deadline.clamp(timeout)
+
+
+def check_deadline() -> None:
+    """Raise `DeadlineExceeded` if the current run is out of time."""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+
+
+@asynccontextmanager
+async def deadline_scope(timeout: Optional[float]) -> AsyncIterator[Optional[Deadline]]:
+    """Run the body under a deadline of `timeout` seconds from now.
+
+    An enclosing deadline that expires sooner is kept, and is already enforced
+    by its own scope. Otherwise the body is cancelled when the new deadline
+    expires and `DeadlineExceeded` is raised in its place.
+    """
+    parent = current_deadline()
+    if timeout is None or (
+        parent is not None and parent.expires_at <= time.monotonic() + timeout
+    ):
+        yield parent
+        return
+
+    deadline = Deadline(timeout)
+    token = _current_deadline.set(deadline)
+    try:
+        async with asyncio.timeout(deadline.remaining()) as timer:
+            yield deadline
+    except TimeoutError as e:
+        if timer.expired():
+            raise DeadlineExceeded(f"Run exceeded its deadline of {timeout:g}s") from e
+        raise
+    finally:
+        _current_deadline.reset(token)
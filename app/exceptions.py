@@ -11,3 +11,19 @@ class OpenManusError(Exception):
 
 class TokenLimitExceeded(OpenManusError):
     """Exception raised when the token limit is exceeded"""
+
+
+class ResponseCacheMiss(OpenManusError):
+    """Exception raised when a replay-only response cache has no entry"""
+
+
+class EmptyLLMResponse(OpenManusError, ValueError):
+    """Exception raised when the LLM returns an empty or invalid response"""
+
+
+class CircuitOpenError(OpenManusError):
+    """Exception raised when every endpoint's circuit breaker is open"""
+
+
+class DeadlineExceeded(OpenManusError):
+    """Exception raised when a run has used up its time budget"""
@@ -5,6 +5,8 @@ from typing import Dict, List, Optional, Union
 from pydantic import BaseModel
 
 from app.agent.base import BaseAgent
+from app.journal import Journal
+from app.usage import UsageScope
 
 
 class FlowType(str, Enum):
@@ -17,6 +19,8 @@ class BaseFlow(BaseModel, ABC):
     agents: Dict[str, BaseAgent]
     tools: Optional[List] = None
     primary_agent_key: Optional[str] = None
+    usage: Optional[UsageScope] = None
+    journal: Optional[Journal] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -5,11 +5,13 @@ from typing import Dict, List, Optional, Union
 from pydantic import Field
 
 from app.agent.base import BaseAgent
+from app.exceptions import DeadlineExceeded
 from app.flow.base import BaseFlow, PlanStepStatus
 from app.llm import LLM
 from app.logger import logger
 from app.schema import AgentState, Message, ToolChoice
 from app.tool import PlanningTool
+from app.usage import run_usage_scope
 
 
 class PlanningFlow(BaseFlow):
@@ -63,45 +65,103 @@ class PlanningFlow(BaseFlow):
 
     async def execute(self, input_text: str) -> str:
         """Execute the planning flow with agents."""
+        # All agents run inside the flow's usage scope
+        with run_usage_scope(f"flow:{self.active_plan_id}") as self.usage:
+            try:
+                if not self.primary_agent:
+                    raise ValueError("No primary agent available")
+
+                # Agents journal their steps alongside the flow's plan
+                if self.journal:
+                    for agent in self.agents.values():
+                        agent.journal = agent.journal or self.journal
+
+                # Create initial plan if input provided
+                if input_text:
+                    await self._create_initial_plan(input_text)
+                    await self._record_plan()
+
+                    # Verify plan was created successfully
+                    if self.active_plan_id not in self.planning_tool.plans:
+                        logger.error(
+                            f"Plan creation failed. Plan ID {self.active_plan_id} not found in planning tool."
+                        )
+                        return f"Failed to create plan for: {input_text}"
+
+                result = ""
+                while True:
+                    # Get current step to execute
+                    (
+                        self.current_step_index,
+                        step_info,
+                    ) = await self._get_current_step_info()
+
+                    # Exit if no more steps or plan completed
+                    if self.current_step_index is None:
+                        result += await self._finalize_plan()
+                        break
+
+                    # Execute current step with appropriate agent
+                    step_type = step_info.get("type") if step_info else None
+                    executor = self.get_executor(step_type)
+                    step_result = await self._execute_step(executor, step_info)
+                    result += step_result + "\n"
+                    await self._record_plan()
+
+                    # Check if agent wants to terminate
+                    if (
+                        hasattr(executor, "state")
+                        and executor.state == AgentState.FINISHED
+                    ):
+                        break
+
+                return result
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Error in PlanningFlow: {str(e)}")
+                return f"Execution failed: {str(e)}"
+
+    def restore(self) -> bool:
+        """Resume the plan and agents recorded in the journal.
+
+        Steps that were in progress when the journal was written are run
+        again; call `execute("")` afterwards to continue the plan.
+        """
+        if self.journal is None:
+            return False
+        state = self.journal.state
+        plan_id = state.flow.get("plan_id")
+        if plan_id not in state.plans:
+            return False
+
+        plan = state.plans[plan_id]
+        plan["step_statuses"] = [
+            (
+                PlanStepStatus.NOT_STARTED.value
+                if status == PlanStepStatus.IN_PROGRESS.value
+                else status
+            )
+            for status in plan.get("step_statuses", [])
+        ]
+        self.planning_tool.plans[plan_id] = plan
+        self.active_plan_id = plan_id
+        for agent in self.agents.values():
+            self.journal.restore_agent(agent)
+        logger.info(f"Resumed plan {plan_id} from {self.journal.path}")
+        return True
+
+    async def _record_plan(self) -> None:
+        """Journal the active plan after it changed."""
+        plan = self.planning_tool.plans.get(self.active_plan_id)
+        if self.journal is None or plan is None:
+            return
         try:
-            if not self.primary_agent:
-                raise ValueError("No primary agent available")
-
-            # Create initial plan if input provided
-            if input_text:
-                await self._create_initial_plan(input_text)
-
-                # Verify plan was created successfully
-                if self.active_plan_id not in self.planning_tool.plans:
-                    logger.error(
-                        f"Plan creation failed. Plan ID {self.active_plan_id} not found in planning tool."
-                    )
-                    return f"Failed to create plan for: {input_text}"
-
-            result = ""
-            while True:
-                # Get current step to execute
-                self.current_step_index, step_info = await self._get_current_step_info()
-
-                # Exit if no more steps or plan completed
-                if self.current_step_index is None:
-                    result += await self._finalize_plan()
-                    break
-
-                # Execute current step with appropriate agent
-                step_type = step_info.get("type") if step_info else None
-                executor = self.get_executor(step_type)
-                step_result = await self._execute_step(executor, step_info)
-                result += step_result + "\n"
-
-                # Check if agent wants to terminate
-                if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
-                    break
-
-            return result
-        except Exception as e:
-            logger.error(f"Error in PlanningFlow: {str(e)}")
-            return f"Execution failed: {str(e)}"
+            await self.journal.arecord_plan(
+                self.active_plan_id, plan, self.current_step_index
+            )
+        except OSError as e:
+            logger.warning(f"Failed to journal plan {self.active_plan_id}: {e}")
 
     async def _create_initial_plan(self, request: str) -> None:
         """Create an initial plan based on the request using the flow's LLM and PlanningTool."""
@@ -251,6 +311,9 @@ class PlanningFlow(BaseFlow):
             await self._mark_step_completed()
 
             return step_result
+        except DeadlineExceeded:
+            # The whole flow is out of time; don't move on to the next step
+            raise
         except Exception as e:
             logger.error(f"Error executing step {self.current_step_index}: {e}")
             return f"Error executing step {self.current_step_index}: {str(e)}"
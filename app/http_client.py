@@ -0,0 +1,132 @@
+"""Process-wide pooled HTTP clients for LLM API traffic.
+
+Every `LLM` instance that targets the same origin (scheme, host and port)
+shares one `httpx.AsyncClient`, so keep-alive connections and TLS sessions
+are reused across config names, agents and flows. Pool limits, HTTP/2 and
+timeouts come from the `[llm_http]` section of `config.toml`.
+"""
+
+import importlib.util
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.config import HTTPClientSettings, config
+from app.logger import logger
+
+
+class _PoolCounters:
+    """Request counters collected through httpx event hooks."""
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+
+    async def on_response(self, response: httpx.Response) -> None:
+        self.responses += 1
+        if response.status_code >= 500:
+            self.errors += 1
+
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_counters: Dict[str, _PoolCounters] = {}
+
+
+def _origin(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    scheme = parts.scheme or "https"
+    port = parts.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{parts.hostname}:{port}"
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_timeout(settings: HTTPClientSettings) -> httpx.Timeout:
+    """Build the request timeout configured in `[llm_http]`."""
+    return httpx.Timeout(
+        connect=settings.connect_timeout,
+        read=settings.read_timeout,
+        write=settings.write_timeout,
+        pool=settings.pool_timeout,
+    )
+
+
+def get_http_client(
+    base_url: str, settings: Optional[HTTPClientSettings] = None
+) -> httpx.AsyncClient:
+    """Return the shared HTTP client for the origin of `base_url`."""
+    origin = _origin(base_url)
+    client = _clients.get(origin)
+    if client is not None and not client.is_closed:
+        return client
+
+    settings = settings or config.llm_http
+    http2 = settings.http2
+    if http2 and not _http2_available():
+        logger.warning(
+            "HTTP/2 requested but the 'h2' package is missing, using HTTP/1.1"
+        )
+        http2 = False
+
+    counters = _counters.setdefault(origin, _PoolCounters())
+    client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=build_timeout(settings),
+        follow_redirects=True,
+        event_hooks={
+            "request": [counters.on_request],
+            "response": [counters.on_response],
+        },
+    )
+    _clients[origin] = client
+    return client
+
+
+def pool_stats() -> Dict[str, dict]:
+    """Connection pool statistics for every shared client, keyed by origin."""
+    stats = {}
+    for origin, client in _clients.items():
+        counters = _counters[origin]
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        stats[origin] = {
+            "closed": client.is_closed,
+            "connections": len(connections),
+            "idle": sum(1 for conn in connections if conn.is_idle()),
+            "available": sum(1 for conn in connections if conn.is_available()),
+            "requests": counters.requests,
+            "responses": counters.responses,
+            "server_errors": counters.errors,
+        }
+    return stats
+
+
+def log_pool_stats() -> None:
+    """Log the `pool_stats` of every shared client."""
+    for origin, stats in pool_stats().items():
+        logger.info(
+            f"HTTP pool {origin}: {stats['requests']} requests, "
+            f"{stats['responses']} responses ({stats['server_errors']} server "
+            f"errors), {stats['connections']} connections "
+            f"({stats['idle']} idle)"
+        )
+
+
+async def close_http_clients() -> None:
+    """Log pool statistics and close every shared client, e.g. at shutdown."""
+    log_pool_stats()
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
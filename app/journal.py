@@ -0,0 +1,305 @@
+"""Durable append-only journal of agent and plan state.
+
+Every completed agent step appends one JSON line recording the messages that
+were added to (or removed from) the agent's memory, its step counter and its
+state; `PlanningFlow` appends the plan after every mutation. After a crash,
+`Journal.load` replays the records into a `JournalState` from which agents
+and flows resume at their last completed step instead of starting over.
+
+Every `snapshot_every` records the full state of all journaled agents and
+plans is written to a snapshot file and the journal is truncated, so that
+recovery only ever replays a short tail:
+
+    journal = Journal("workspace/run.jsonl")
+    agent = Manus(journal=journal)
+    if journal.restore_agent(agent):
+        await agent.run()  # continue where the last run stopped
+
+Agents and flows use `acheckpoint` and `arecord_plan`, which write (and
+fsync) in a worker thread so that other agents of the process keep running.
+Images are journaled by reference: their blobs are written to the
+`[image_store]` directory, without which they cannot be restored.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from app.blob_store import get_blob_store
+from app.logger import logger
+from app.schema import Memory, Message
+
+
+if TYPE_CHECKING:
+    from app.agent.base import BaseAgent
+
+
+class AgentRecord:
+    """The journaled state of one agent."""
+
+    def __init__(self):
+        self.messages: List[dict] = []
+        self.pinned: List[int] = []
+        self.current_step = 0
+        self.state: Optional[str] = None
+
+    def apply(self, record: dict) -> None:
+        if record.get("reset"):
+            self.messages, self.pinned = [], []
+        removed = set(record.get("removed", []))
+        if removed:
+            survivors = [i for i in range(len(self.messages)) if i not in removed]
+            position = {old: new for new, old in enumerate(survivors)}
+            self.messages = [self.messages[i] for i in survivors]
+            self.pinned = [position[i] for i in self.pinned if i in position]
+        offset = len(self.messages)
+        self.messages.extend(record.get("messages", []))
+        self.pinned.extend(offset + i for i in record.get("pinned", []))
+        self.current_step = record.get("current_step", self.current_step)
+        self.state = record.get("state", self.state)
+
+    def to_record(self) -> dict:
+        return {
+            "reset": True,
+            "messages": self.messages,
+            "pinned": self.pinned,
+            "current_step": self.current_step,
+            "state": self.state,
+        }
+
+
+class JournalState:
+    """Agent and plan state reconstructed from a snapshot and journal tail."""
+
+    def __init__(self):
+        self.seq = 0
+        self.agents: Dict[str, AgentRecord] = {}
+        self.plans: Dict[str, dict] = {}
+        self.flow: Dict[str, Any] = {}
+
+    def apply(self, record: dict) -> None:
+        self.seq = record["seq"]
+        if record["type"] == "agent":
+            self.agents.setdefault(record["agent"], AgentRecord()).apply(record)
+        elif record["type"] == "plan":
+            self.plans[record["plan_id"]] = record["plan"]
+            self.flow = {k: record[k] for k in ("plan_id", "current_step_index")}
+
+    @property
+    def empty(self) -> bool:
+        return not self.agents and not self.plans
+
+
+class Journal:
+    """Appends state records to a JSONL file and snapshots it periodically."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        snapshot_every: int = 50,
+        fsync: bool = True,
+    ):
+        self.path = Path(path)
+        self.snapshot_path = self.path.with_name(self.path.name + ".snapshot")
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._state: Optional[JournalState] = None
+        self._since_snapshot = 0
+        # Memory of each agent as of its last record, to journal only changes
+        self._recorded: Dict[str, List[Message]] = {}
+        self._warned_images = False
+
+    @property
+    def state(self) -> JournalState:
+        """The state recorded so far, loaded from disk on first access."""
+        if self._state is None:
+            self._state = self.load()
+        return self._state
+
+    def load(self) -> JournalState:
+        """Rebuild the recorded state from the snapshot and the journal."""
+        state = JournalState()
+        if self.snapshot_path.exists():
+            snapshot = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+            state.seq = snapshot["seq"]
+            for record in snapshot["records"]:
+                state.apply({**record, "seq": snapshot["seq"]})
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final write is expected after a crash
+                        logger.warning(
+                            f"Ignoring unreadable journal record {self.path}:{line_no}"
+                        )
+                        break
+                    # Records already covered by the snapshot are skipped
+                    if record["seq"] > state.seq:
+                        state.apply(record)
+        return state
+
+    def _append(self, record: dict, image_refs: List[str] = ()) -> None:
+        self._persist_images(image_refs)
+        state = self.state
+        with self._lock:
+            record = {"seq": state.seq + 1, "ts": time.time(), **record}
+            state.apply(record)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def _persist_images(self, image_refs: List[str]) -> None:
+        """Make sure the images of journaled messages survive a restart."""
+        store = get_blob_store()
+        lost = [ref for ref in image_refs if not store.persist(ref)]
+        if lost and not self._warned_images:
+            self._warned_images = True
+            logger.warning(
+                f"{len(lost)} journaled image(s) are only kept in memory and "
+                "will be missing after a restart; set `directory` in "
+                "[image_store] to keep them"
+            )
+
+    def checkpoint(self, agent: "BaseAgent") -> None:
+        """Record the changes to `agent` since its previous checkpoint."""
+        self._append(*self._agent_record(agent))
+
+    async def acheckpoint(self, agent: "BaseAgent") -> None:
+        """Like `checkpoint`, writing the record in a worker thread."""
+        await asyncio.to_thread(self._append, *self._agent_record(agent))
+
+    def _agent_record(self, agent: "BaseAgent") -> Tuple[dict, List[str]]:
+        """The record of `agent`'s changes and the images of its new messages"""
+        memory = agent.memory
+        current = list(memory.messages)
+        record = {
+            "type": "agent",
+            "agent": agent.name,
+            "current_step": agent.current_step,
+            "state": getattr(agent.state, "value", agent.state),
+        }
+        previous = self._recorded.get(agent.name)
+        if previous is None:
+            new, record["reset"] = current, True
+        else:
+            live = {id(message) for message in current}
+            survivors = [m for m in previous if id(m) in live]
+            if len(current) >= len(survivors) and all(
+                a is b for a, b in zip(current, survivors)
+            ):
+                record["removed"] = [
+                    i for i, m in enumerate(previous) if id(m) not in live
+                ]
+                new = current[len(survivors) :]
+            else:
+                # Memory was rewritten (e.g. compacted); record it in full
+                new, record["reset"] = current, True
+        record["messages"] = [m.model_dump(exclude_none=True) for m in new]
+        record["pinned"] = [i for i, m in enumerate(new) if memory.is_pinned(m)]
+
+        self._recorded[agent.name] = current
+        return record, [m.image_ref for m in new if m.image_ref]
+
+    def record_plan(
+        self, plan_id: str, plan: dict, current_step_index: Optional[int] = None
+    ) -> None:
+        """Record the current version of a plan."""
+        self._append(self._plan_record(plan_id, plan, current_step_index))
+
+    async def arecord_plan(
+        self, plan_id: str, plan: dict, current_step_index: Optional[int] = None
+    ) -> None:
+        """Like `record_plan`, writing the record in a worker thread."""
+        # Copied here, as the plan may change while the record is written
+        record = self._plan_record(plan_id, copy.deepcopy(plan), current_step_index)
+        await asyncio.to_thread(self._append, record)
+
+    @staticmethod
+    def _plan_record(
+        plan_id: str, plan: dict, current_step_index: Optional[int]
+    ) -> dict:
+        return {
+            "type": "plan",
+            "plan_id": plan_id,
+            "plan": plan,
+            "current_step_index": current_step_index,
+        }
+
+    def snapshot(self) -> None:
+        """Write the full recorded state and start a new, empty journal."""
+        state = self.state
+        with self._lock:
+            records = [
+                {"type": "agent", "agent": name, **agent.to_record()}
+                for name, agent in state.agents.items()
+            ]
+            records += [
+                {
+                    "type": "plan",
+                    "plan_id": plan_id,
+                    "plan": plan,
+                    "current_step_index": state.flow.get("current_step_index")
+                    if state.flow.get("plan_id") == plan_id
+                    else None,
+                }
+                for plan_id, plan in state.plans.items()
+            ]
+            payload = json.dumps({"seq": state.seq, "records": records})
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.snapshot_path.parent, suffix=".tmp"
+            )
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # Records up to `seq` are in the snapshot; a crash before this
+            # truncation only leaves records that `load` skips
+            self.path.unlink(missing_ok=True)
+            self._since_snapshot = 0
+        logger.debug(f"Journal snapshot written at seq {state.seq}")
+
+    def restore_agent(self, agent: "BaseAgent") -> bool:
+        """Load the recorded memory and step counter into `agent`.
+
+        Returns False if nothing was recorded for the agent.
+        """
+        record = self.state.agents.get(agent.name)
+        if record is None:
+            return False
+        messages = [Message(**message) for message in record.messages]
+        memory: Memory = agent.memory
+        memory.clear()
+        memory.messages.extend(messages)
+        for i in record.pinned:
+            memory.pin(messages[i])
+        store = get_blob_store()
+        lost = sum(1 for m in messages if m.image_ref and m.image_ref not in store)
+        if lost:
+            logger.warning(
+                f"{lost} image(s) of agent '{agent.name}' could not be restored"
+            )
+        agent.current_step = record.current_step
+        self._recorded[agent.name] = list(messages)
+        logger.info(
+            f"Restored agent '{agent.name}' at step {record.current_step} "
+            f"with {len(messages)} messages from {self.path}"
+        )
+        return True
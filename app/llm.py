@@ -1,32 +1,55 @@
+import asyncio
+import hashlib
+import json
 import math
-from typing import Dict, List, Optional, Union
+import time
+from collections import OrderedDict
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import tiktoken
-from openai import (
-    APIError,
-    AsyncAzureOpenAI,
-    AsyncOpenAI,
-    AuthenticationError,
-    OpenAIError,
-    RateLimitError,
-)
+from openai import APIError, AuthenticationError, OpenAIError, RateLimitError
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
 from tenacity import (
     retry,
-    retry_if_exception_type,
+    retry_if_exception,
     stop_after_attempt,
     wait_random_exponential,
 )
 
 from app.config import LLMSettings, config
-from app.exceptions import TokenLimitExceeded
+from app.deadline import check_deadline, clamp_timeout
+from app.exceptions import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    EmptyLLMResponse,
+    ResponseCacheMiss,
+    TokenLimitExceeded,
+)
+from app.llm_cache import CacheMode, get_response_cache
+from app.llm_router import EndpointRouter, get_latency_tracker, hedged
+from app.llm_stream import StdoutSink, StreamDelta, StreamSink
 from app.logger import logger  # Assuming a logger is set up in your app
+from app.rate_limiter import get_rate_limiter, parse_retry_after
+from app.retry_policy import is_transient
 from app.schema import (
     ROLE_VALUES,
     TOOL_CHOICE_TYPE,
     TOOL_CHOICE_VALUES,
     Message,
     ToolChoice,
+    WireMessage,
 )
+from app.usage import current_usage, process_usage
 
 
 REASONING_MODELS = ["o1", "o3-mini"]
@@ -52,13 +75,40 @@ class TokenCounter:
     HIGH_DETAIL_TARGET_SHORT_SIDE = 768
     TILE_SIZE = 512
 
-    def __init__(self, tokenizer):
+    # Per-message memoization
+    MESSAGE_CACHE_SIZE = 4096
+
+    # Texts longer than this (in characters) are tokenized in a worker thread
+    OFFLOAD_THRESHOLD = 32_000
+
+    def __init__(
+        self,
+        tokenizer,
+        cache_size: int = MESSAGE_CACHE_SIZE,
+        offload_threshold: int = OFFLOAD_THRESHOLD,
+    ):
         self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self.offload_threshold = offload_threshold
+        self._message_cache: "OrderedDict[str, int]" = OrderedDict()
 
     def count_text(self, text: str) -> int:
         """Calculate tokens for a text string"""
         return 0 if not text else len(self.tokenizer.encode(text))
 
+    def _encode_lengths(self, texts: List[str]) -> List[int]:
+        """Token counts of several texts, encoded in one batch if supported"""
+        encode_batch = getattr(self.tokenizer, "encode_batch", None)
+        if encode_batch is None:
+            return [self.count_text(text) for text in texts]
+        return [len(tokens) for tokens in encode_batch(texts)]
+
+    async def acount_text(self, text: str) -> int:
+        """Calculate tokens for a text string, off the event loop if it is large"""
+        if len(text or "") < self.offload_threshold:
+            return self.count_text(text)
+        return await asyncio.to_thread(self.count_text, text)
+
     def count_image(self, image_item: dict) -> int:
         """
         Calculate tokens for an image based on detail level and dimensions
@@ -149,31 +199,205 @@ class TokenCounter:
                 token_count += self.count_text(function.get("arguments", ""))
         return token_count
 
-    def count_message_tokens(self, messages: List[dict]) -> int:
-        """Calculate the total number of tokens in a message list"""
-        total_tokens = self.FORMAT_TOKENS  # Base format tokens
-
-        for message in messages:
-            tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+    @staticmethod
+    def _message_key(message: dict) -> str:
+        """Build a content hash for a formatted message.
 
-            # Add role tokens
-            tokens += self.count_text(message.get("role", ""))
+        Image payloads are left out of the key because their token cost only
+        depends on the detail level and dimensions, not on the encoded bytes.
+        """
+        content = message.get("content")
+        if isinstance(content, list):
+            content = [
+                (
+                    {k: v for k, v in item.items() if k != "image_url"}
+                    if isinstance(item, dict) and "image_url" in item
+                    else item
+                )
+                for item in content
+            ]
+        payload = [
+            message.get("role"),
+            content,
+            message.get("tool_calls"),
+            message.get("name"),
+            message.get("tool_call_id"),
+        ]
+        raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _key_for(self, message: dict) -> str:
+        """The content hash of a message, remembered on cached wire dicts"""
+        key = getattr(message, "token_key", None)
+        if key is None:
+            key = self._message_key(message)
+            if isinstance(message, WireMessage):
+                message.token_key = key
+        return key
+
+    def _message_parts(self, message: dict) -> Tuple[List[str], int]:
+        """Split a message into the texts to tokenize and a fixed token cost"""
+        tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+        texts = [message.get("role", "")]
+
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        elif content:
+            for item in content:
+                if isinstance(item, str):
+                    texts.append(item)
+                elif isinstance(item, dict):
+                    if "text" in item:
+                        texts.append(item["text"])
+                    elif "image_url" in item:
+                        tokens += self.count_image(item)
+
+        for tool_call in message.get("tool_calls") or []:
+            if "function" in tool_call:
+                function = tool_call["function"]
+                texts.append(function.get("name", ""))
+                texts.append(function.get("arguments", ""))
+
+        # Add name and tool_call_id tokens
+        texts.append(message.get("name", ""))
+        texts.append(message.get("tool_call_id", ""))
+        return [text for text in texts if text], tokens
+
+    def _count_single_message(self, message: dict) -> int:
+        """Calculate tokens for one message without any caching"""
+        texts, tokens = self._message_parts(message)
+        return tokens + sum(self.count_text(text) for text in texts)
+
+    def _remember(self, key: str, tokens: int) -> None:
+        self._message_cache[key] = tokens
+        if len(self._message_cache) > self.cache_size:
+            self._message_cache.popitem(last=False)
+
+    def count_single_message(self, message: dict) -> int:
+        """Calculate tokens for one formatted message, memoized by content hash"""
+        key = self._key_for(message)
+        cached = self._message_cache.get(key)
+        if cached is not None:
+            self._message_cache.move_to_end(key)
+            return cached
+
+        tokens = self._count_single_message(message)
+        self._remember(key, tokens)
+        return tokens
 
-            # Add content tokens
-            if "content" in message:
-                tokens += self.count_content(message["content"])
+    def count_message_tokens(self, messages: List[dict]) -> int:
+        """Calculate the total number of tokens in a message list.
 
-            # Add tool calls tokens
-            if "tool_calls" in message:
-                tokens += self.count_tool_calls(message["tool_calls"])
+        Each message is counted once and memoized, so repeated calls over a
+        growing conversation only tokenize the messages that are new.
+        """
+        return self.FORMAT_TOKENS + sum(
+            self.count_single_message(message) for message in messages
+        )
 
-            # Add name and tool_call_id tokens
-            tokens += self.count_text(message.get("name", ""))
-            tokens += self.count_text(message.get("tool_call_id", ""))
+    async def acount_message_tokens(self, messages: List[dict]) -> int:
+        """Like `count_message_tokens`, without blocking the event loop.
 
-            total_tokens += tokens
+        The texts of all messages that are not memoized yet are tokenized
+        together in one batch call; when they are larger than
+        `offload_threshold` the batch runs in a worker thread, so other
+        coroutines keep running while a huge context is counted.
+        """
+        total = self.FORMAT_TOKENS
+        pending: List[Tuple[str, List[str], int]] = []
+        for message in messages:
+            key = self._key_for(message)
+            cached = self._message_cache.get(key)
+            if cached is not None:
+                self._message_cache.move_to_end(key)
+                total += cached
+            else:
+                texts, fixed = self._message_parts(message)
+                pending.append((key, texts, fixed))
+        if not pending:
+            return total
+
+        texts = [text for _, message_texts, _ in pending for text in message_texts]
+        if sum(len(text) for text in texts) < self.offload_threshold:
+            lengths = [self.count_text(text) for text in texts]
+        else:
+            lengths = await asyncio.to_thread(self._encode_lengths, texts)
+
+        offset = 0
+        for key, message_texts, fixed in pending:
+            tokens = fixed + sum(lengths[offset : offset + len(message_texts)])
+            offset += len(message_texts)
+            self._remember(key, tokens)
+            total += tokens
+        return total
+
+
+class ToolCallAssembler:
+    """Assemble streamed tool-call deltas into complete tool calls.
+
+    A call is complete once its accumulated arguments parse as a JSON object,
+    or when the stream moves on to the next call index.
+    """
+
+    def __init__(self):
+        self._parts: Dict[int, dict] = {}
+        self._emitted: set = set()
+        self.tool_calls: List[ChatCompletionMessageToolCall] = []
+
+    def feed(self, deltas: List) -> List[ChatCompletionMessageToolCall]:
+        """Consume one chunk's tool-call deltas, returning newly completed calls"""
+        completed = []
+        for delta in deltas:
+            index = delta.index
+            # A new index means every earlier call has been fully streamed
+            for earlier in sorted(self._parts):
+                if earlier < index:
+                    completed.extend(self._emit(earlier))
+
+            part = self._parts.setdefault(
+                index, {"id": "", "name": "", "arguments": ""}
+            )
+            if delta.id:
+                part["id"] = delta.id
+            if delta.function:
+                part["name"] += delta.function.name or ""
+                part["arguments"] += delta.function.arguments or ""
+
+            if self._arguments_closed(part["arguments"]):
+                completed.extend(self._emit(index))
+        return completed
+
+    def finish(self) -> List[ChatCompletionMessageToolCall]:
+        """Flush calls that were still open when the stream ended"""
+        completed = []
+        for index in sorted(self._parts):
+            completed.extend(self._emit(index))
+        return completed
 
-        return total_tokens
+    @staticmethod
+    def _arguments_closed(arguments: str) -> bool:
+        if not arguments.rstrip().endswith("}"):
+            return False
+        try:
+            return isinstance(json.loads(arguments), dict)
+        except ValueError:
+            return False
+
+    def _emit(self, index: int) -> List[ChatCompletionMessageToolCall]:
+        if index in self._emitted:
+            return []
+        part = self._parts[index]
+        if not part["name"]:
+            return []
+        self._emitted.add(index)
+        tool_call = ChatCompletionMessageToolCall(
+            id=part["id"] or f"call_{index}",
+            type="function",
+            function={"name": part["name"], "arguments": part["arguments"] or "{}"},
+        )
+        self.tool_calls.append(tool_call)
+        return [tool_call]
 
 
 class LLM:
@@ -194,6 +418,7 @@ class LLM:
         if not hasattr(self, "client"):  # Only initialize if not already initialized
             llm_config = llm_config or config.llm
             llm_config = llm_config.get(config_name, llm_config["default"])
+            self.config_name = config_name
             self.model = llm_config.model
             self.max_tokens = llm_config.max_tokens
             self.temperature = llm_config.temperature
@@ -218,53 +443,196 @@ class LLM:
                 # If the model is not in tiktoken's presets, use cl100k_base as default
                 self.tokenizer = tiktoken.get_encoding("cl100k_base")
 
-            if self.api_type == "azure":
-                self.client = AsyncAzureOpenAI(
-                    base_url=self.base_url,
-                    api_key=self.api_key,
-                    api_version=self.api_version,
-                )
-            else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+            # Requests are routed across the config's equivalent endpoints
+            self.router = EndpointRouter.from_settings(llm_config)
+            self.client = self.router.endpoints[0].client
 
             self.token_counter = TokenCounter(self.tokenizer)
+            self.response_cache = get_response_cache()
+            self.rate_limiter = get_rate_limiter(config_name, llm_config)
+            self.hedge_percentile = llm_config.hedge_percentile
+            self.latency_tracker = get_latency_tracker(self.model)
+            # Streamed text of `ask` is echoed here; replace to redirect it
+            self.stream_sink: StreamSink = StdoutSink()
 
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
-        if not text:
-            return 0
-        return len(self.tokenizer.encode(text))
+        return self.token_counter.count_text(text)
 
     def count_message_tokens(self, messages: List[dict]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
+    def count_message(self, message: Union[dict, Message]) -> int:
+        """Calculate the (memoized) token cost of a single message"""
+        formatted = self.format_messages(
+            [message], supports_images=self.model in MULTIMODAL_MODELS
+        )
+        return sum(self.token_counter.count_single_message(m) for m in formatted)
+
+    async def acount_messages(self, messages: List[Message]) -> List[int]:
+        """Token cost of each message, tokenizing the batch off the event loop"""
+        supports_images = self.model in MULTIMODAL_MODELS
+        formatted = [self.format_messages([m], supports_images) for m in messages]
+        # Counts every message once (offloading large batches); memoized below
+        await self.token_counter.acount_message_tokens(
+            [wire for wires in formatted for wire in wires]
+        )
+        return [
+            sum(self.token_counter.count_single_message(m) for m in wires)
+            for wires in formatted
+        ]
+
     def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
-        """Update token counts"""
-        # Only track tokens if max_input_tokens is set
-        self.total_input_tokens += input_tokens
-        self.total_completion_tokens += completion_tokens
+        """Update token counts.
+
+        Usage is charged to the active run's usage scope and the process
+        aggregate; the totals on this (shared) instance cover every run of
+        this config.
+        """
+        self._record_usage(input_tokens, completion_tokens)
+        scope = current_usage() or process_usage
         logger.info(
             f"Token usage: Input={input_tokens}, Completion={completion_tokens}, "
-            f"Cumulative Input={self.total_input_tokens}, Cumulative Completion={self.total_completion_tokens}, "
-            f"Total={input_tokens + completion_tokens}, Cumulative Total={self.total_input_tokens + self.total_completion_tokens}"
+            f"Cumulative Input={scope.input_tokens}, Cumulative Completion={scope.completion_tokens}, "
+            f"Total={input_tokens + completion_tokens}, Cumulative Total={scope.total_tokens}"
         )
 
+    def _record_usage(self, input_tokens: int, completion_tokens: int = 0) -> None:
+        self.total_input_tokens += input_tokens
+        self.total_completion_tokens += completion_tokens
+        (current_usage() or process_usage).record(
+            self.config_name, input_tokens, completion_tokens
+        )
+
+    def _used_input_tokens(self) -> int:
+        """Input tokens counted against `max_input_tokens` so far"""
+        scope = current_usage()
+        if scope is None:
+            return self.total_input_tokens
+        return scope.run.config_input_tokens(self.config_name)
+
+    def remaining_input_tokens(self) -> Optional[int]:
+        """Input tokens left in the current budget (None if unlimited)"""
+        if self.max_input_tokens is None:
+            return None
+        return max(0, self.max_input_tokens - self._used_input_tokens())
+
+    def _limit_error(self, input_tokens: int) -> Optional[str]:
+        """Describe the budget `input_tokens` would exceed, if any.
+
+        Inside a usage scope, `max_input_tokens` applies to the run's usage of
+        this config and the scopes' own budgets are checked as well. Outside
+        of any scope it applies to all usage of this config.
+        """
+        scope = current_usage()
+        used = self._used_input_tokens()
+        if self.max_input_tokens is not None and (
+            used + input_tokens > self.max_input_tokens
+        ):
+            return f"Request may exceed input token limit (Current: {used}, Needed: {input_tokens}, Max: {self.max_input_tokens})"
+        return scope.budget_error(input_tokens) if scope else None
+
     def check_token_limit(self, input_tokens: int) -> bool:
         """Check if token limits are exceeded"""
-        if self.max_input_tokens is not None:
-            return (self.total_input_tokens + input_tokens) <= self.max_input_tokens
-        # If max_input_tokens is not set, always return True
-        return True
+        return self._limit_error(input_tokens) is None
 
     def get_limit_error_message(self, input_tokens: int) -> str:
         """Generate error message for token limit exceeded"""
-        if (
-            self.max_input_tokens is not None
-            and (self.total_input_tokens + input_tokens) > self.max_input_tokens
-        ):
-            return f"Request may exceed input token limit (Current: {self.total_input_tokens}, Needed: {input_tokens}, Max: {self.max_input_tokens})"
+        return self._limit_error(input_tokens) or "Token limit exceeded"
+
+    def _cache_key(self, kind: str, params: dict) -> str:
+        """Build the response cache key for a completion request"""
+        return self.response_cache.make_key(
+            kind=kind,
+            model=params.get("model"),
+            messages=params.get("messages"),
+            tools=params.get("tools"),
+            tool_choice=params.get("tool_choice"),
+            temperature=params.get("temperature"),
+        )
 
-        return "Token limit exceeded"
+    async def _get_cached_response(self, key: str) -> Optional[dict]:
+        """Look up a cached response, failing fast on a replay-mode miss"""
+        if not self.response_cache.enabled:
+            return None
+        cached = await self.response_cache.aget(key)
+        if cached is None and self.response_cache.mode == CacheMode.REPLAY:
+            raise ResponseCacheMiss(
+                f"No cached response for request {key[:12]} in replay mode"
+            )
+        return cached
+
+    async def _create_completion(
+        self, params: dict, input_tokens: int = 0, hedge: bool = False
+    ):
+        """Send a chat completion request through the config's rate limiter.
+
+        The endpoint router fails over between the config's endpoints within
+        a single attempt, so the retry budget is only spent once every
+        endpoint has failed. The limiter slot is held until the response
+        arrives, or for streaming requests until the stream has been fully
+        consumed. Non-streaming requests with `hedge` set are hedged when the
+        config enables it. The request timeout is clamped to the time left
+        before the current run's deadline.
+        """
+        # Time out the request by the end of the run at the latest
+        check_deadline()
+        timeout = clamp_timeout(params.get("timeout"))
+        if timeout is not None:
+            params = {**params, "timeout": timeout}
+
+        await self.rate_limiter.acquire(input_tokens)
+        start = time.monotonic()
+        try:
+            if hedge and self.hedge_percentile and not params.get("stream"):
+                response = await hedged(
+                    lambda: self.router.send(params),
+                    self.latency_tracker.hedge_delay(self.hedge_percentile),
+                    hedge=lambda: self._send_hedge(params, input_tokens),
+                    on_hedge=self._on_hedge,
+                )
+            else:
+                response = await self.router.send(params)
+        except RateLimitError as e:
+            await self.rate_limiter.release(
+                throttled=True, retry_after=parse_retry_after(e)
+            )
+            raise
+        except BaseException:
+            await self.rate_limiter.release()
+            raise
+
+        if params.get("stream"):
+            return self._release_after_stream(response)
+        self.latency_tracker.record(time.monotonic() - start)
+        await self.rate_limiter.release()
+        return response
+
+    async def _send_hedge(self, params: dict, input_tokens: int):
+        """Send the duplicate request of a hedge under its own limiter slot"""
+        await self.rate_limiter.acquire(input_tokens)
+        throttled = False
+        try:
+            return await self.router.send(params)
+        except RateLimitError:
+            throttled = True
+            raise
+        finally:
+            await self.rate_limiter.release(throttled=throttled)
+
+    def _on_hedge(self) -> None:
+        self.latency_tracker.hedges += 1
+        logger.info(
+            f"Hedging slow request to {self.model} "
+            f"(p{self.hedge_percentile:g} latency exceeded)"
+        )
+
+    async def _release_after_stream(self, stream):
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await self.rate_limiter.release()
 
     @staticmethod
     def format_messages(
@@ -295,9 +663,13 @@ class LLM:
         formatted_messages = []
 
         for message in messages:
-            # Convert Message objects to dictionaries
+            # Message objects cache their wire format, so unchanged history
+            # is not serialized again on every request
             if isinstance(message, Message):
-                message = message.to_dict()
+                wire = message.to_wire(supports_images)
+                if "content" in wire or "tool_calls" in wire:
+                    formatted_messages.append(wire)
+                continue
 
             if isinstance(message, dict):
                 # If message is a dict, ensure it has required fields
@@ -354,12 +726,122 @@ class LLM:
 
         return formatted_messages
 
+    async def _prepare_request(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+    ) -> Tuple[dict, int]:
+        """Format a plain completion request and check the token limit.
+
+        Returns:
+            Tuple of the completion parameters and the estimated input tokens.
+
+        Raises:
+            TokenLimitExceeded: If token limits are exceeded
+            ValueError: If messages are invalid
+        """
+        # Check if the model supports images
+        supports_images = self.model in MULTIMODAL_MODELS
+
+        # Format system and user messages with image support check
+        if system_msgs:
+            system_msgs = self.format_messages(system_msgs, supports_images)
+            messages = system_msgs + self.format_messages(messages, supports_images)
+        else:
+            messages = self.format_messages(messages, supports_images)
+
+        # Calculate input token count
+        input_tokens = await self.token_counter.acount_message_tokens(messages)
+
+        # Check if token limits are exceeded
+        if not self.check_token_limit(input_tokens):
+            error_message = self.get_limit_error_message(input_tokens)
+            # Raise a special exception that won't be retried
+            raise TokenLimitExceeded(error_message)
+
+        params = {
+            "model": self.model,
+            "messages": messages,
+        }
+
+        if self.model in REASONING_MODELS:
+            params["max_completion_tokens"] = self.max_tokens
+        else:
+            params["max_tokens"] = self.max_tokens
+            params["temperature"] = (
+                temperature if temperature is not None else self.temperature
+            )
+        return params, input_tokens
+
+    async def _stream_text(
+        self, params: dict, input_tokens: int, cache_key: str
+    ) -> AsyncIterator[StreamDelta]:
+        """Stream a text completion, ending with a delta that carries usage.
+
+        The completion is stored in the response cache once it is complete.
+        """
+        # For streaming, update estimated token count before making the request
+        self.update_token_count(input_tokens)
+
+        params = {**params, "stream": True}
+        response = await self._create_completion(params, input_tokens)
+
+        collected_messages = []
+        usage = None
+        async for chunk in response:
+            # Some providers send usage in a final chunk without choices
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            chunk_message = chunk.choices[0].delta.content or ""
+            if chunk_message:
+                collected_messages.append(chunk_message)
+                yield StreamDelta(content=chunk_message)
+
+        completion_text = "".join(collected_messages)
+        if not completion_text.strip():
+            raise EmptyLLMResponse("Empty response from streaming LLM")
+
+        # estimate completion tokens for streaming response
+        completion_tokens = (
+            usage.completion_tokens
+            if usage
+            else await self.token_counter.acount_text(completion_text)
+        )
+        logger.info(
+            f"Estimated completion tokens for streaming response: {completion_tokens}"
+        )
+        self._record_usage(0, completion_tokens)
+
+        await self.response_cache.aput(cache_key, {"content": completion_text.strip()})
+        yield StreamDelta(
+            usage=CompletionUsage(
+                prompt_tokens=input_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=input_tokens + completion_tokens,
+            )
+        )
+
+    async def _collect_stream(
+        self, deltas: AsyncIterator[StreamDelta], sink: Optional[StreamSink]
+    ) -> str:
+        """Forward streamed text to a sink and return the full response"""
+        sink = sink or self.stream_sink
+        parts = []
+        try:
+            async for delta in deltas:
+                if delta.content:
+                    parts.append(delta.content)
+                    sink.write(delta.content)
+        finally:
+            sink.close()
+        return "".join(parts).strip()
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        retry=retry_if_exception(is_transient),
     )
     async def ask(
         self,
@@ -367,6 +849,7 @@ class LLM:
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = True,
         temperature: Optional[float] = None,
+        sink: Optional[StreamSink] = None,
     ) -> str:
         """
         Send a prompt to the LLM and get the response.
@@ -376,6 +859,7 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            sink: Receives streamed text (defaults to `self.stream_sink`)
 
         Returns:
             str: The generated response
@@ -387,84 +871,52 @@ class LLM:
             Exception: For unexpected errors
         """
         try:
-            # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
-
-            # Format system and user messages with image support check
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
-                messages = system_msgs + self.format_messages(messages, supports_images)
-            else:
-                messages = self.format_messages(messages, supports_images)
-
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
-
-            # Check if token limits are exceeded
-            if not self.check_token_limit(input_tokens):
-                error_message = self.get_limit_error_message(input_tokens)
-                # Raise a special exception that won't be retried
-                raise TokenLimitExceeded(error_message)
-
-            params = {
-                "model": self.model,
-                "messages": messages,
-            }
+            params, input_tokens = await self._prepare_request(
+                messages, system_msgs=system_msgs, temperature=temperature
+            )
 
-            if self.model in REASONING_MODELS:
-                params["max_completion_tokens"] = self.max_tokens
-            else:
-                params["max_tokens"] = self.max_tokens
-                params["temperature"] = (
-                    temperature if temperature is not None else self.temperature
-                )
+            cache_key = self._cache_key("ask", params)
+            cached = await self._get_cached_response(cache_key)
+            if cached is not None:
+                return cached["content"]
 
             if not stream:
                 # Non-streaming request
                 params["stream"] = False
 
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create_completion(
+                    params, input_tokens, hedge=True
+                )
 
                 if not response.choices or not response.choices[0].message.content:
-                    raise ValueError("Empty or invalid response from LLM")
+                    raise EmptyLLMResponse("Empty or invalid response from LLM")
 
                 # Update token counts
                 self.update_token_count(
                     response.usage.prompt_tokens, response.usage.completion_tokens
                 )
 
-                return response.choices[0].message.content
-
-            # Streaming request, For streaming, update estimated token count before making the request
-            self.update_token_count(input_tokens)
-
-            params["stream"] = True
-            response = await self.client.chat.completions.create(**params)
+                content = response.choices[0].message.content
+                await self.response_cache.aput(cache_key, {"content": content})
+                return content
 
-            collected_messages = []
-            completion_text = ""
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                completion_text += chunk_message
-                print(chunk_message, end="", flush=True)
-
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
-            if not full_response:
-                raise ValueError("Empty response from streaming LLM")
-
-            # estimate completion tokens for streaming response
-            completion_tokens = self.count_tokens(completion_text)
-            logger.info(
-                f"Estimated completion tokens for streaming response: {completion_tokens}"
+            # Streaming request, echoed to the sink as it arrives
+            return await self._collect_stream(
+                self._stream_text(params, input_tokens, cache_key), sink
             )
-            self.total_completion_tokens += completion_tokens
-
-            return full_response
 
-        except TokenLimitExceeded:
-            # Re-raise token limit errors without logging
+        except (
+            TokenLimitExceeded,
+            ResponseCacheMiss,
+            CircuitOpenError,
+            DeadlineExceeded,
+        ):
+            # Re-raise token limit, replay cache, open circuit and deadline errors
+            # without logging
+            raise
+        except EmptyLLMResponse as e:
+            # Checked before ValueError, which it subclasses for compatibility
+            logger.warning(f"{e} in ask")
             raise
         except ValueError as ve:
             logger.error(f"Validation error: {ve}")
@@ -482,12 +934,57 @@ class LLM:
             logger.error(f"Unexpected error in ask: {e}")
             raise
 
+    async def ask_stream(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[StreamDelta]:
+        """
+        Stream the LLM response as it is generated.
+
+        Yields text deltas as they arrive, followed by a final delta whose
+        `usage` holds the prompt and completion token counts. Unlike `ask`
+        this is not retried, since deltas may already have been consumed.
+
+        Args:
+            messages: List of conversation messages
+            system_msgs: Optional system messages to prepend
+            temperature (float): Sampling temperature for the response
+
+        Yields:
+            StreamDelta: Text deltas, then the usage
+
+        Raises:
+            TokenLimitExceeded: If token limits are exceeded
+            ValueError: If messages are invalid or response is empty
+            OpenAIError: If the API call fails
+        """
+        params, input_tokens = await self._prepare_request(
+            messages, system_msgs=system_msgs, temperature=temperature
+        )
+        cache_key = self._cache_key("ask", params)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            content = cached["content"]
+            completion_tokens = await self.token_counter.acount_text(content)
+            yield StreamDelta(content=content)
+            yield StreamDelta(
+                usage=CompletionUsage(
+                    prompt_tokens=input_tokens,
+                    completion_tokens=completion_tokens,
+                    total_tokens=input_tokens + completion_tokens,
+                )
+            )
+            return
+
+        async for delta in self._stream_text(params, input_tokens, cache_key):
+            yield delta
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        retry=retry_if_exception(is_transient),
     )
     async def ask_with_images(
         self,
@@ -496,6 +993,7 @@ class LLM:
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = False,
         temperature: Optional[float] = None,
+        sink: Optional[StreamSink] = None,
     ) -> str:
         """
         Send a prompt with images to the LLM and get the response.
@@ -506,6 +1004,7 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            sink: Receives streamed text (defaults to `self.stream_sink`)
 
         Returns:
             str: The generated response
@@ -533,15 +1032,17 @@ class LLM:
                     "The last message must be from the user to attach images"
                 )
 
-            # Process the last user message to include images
-            last_message = formatted_messages[-1]
+            # Process the last user message to include images. Formatted
+            # messages may be the cached wire dicts of `Message` objects, so
+            # the images are added to a copy
+            formatted_messages[-1] = last_message = dict(formatted_messages[-1])
 
             # Convert content to multimodal format if needed
             content = last_message["content"]
             multimodal_content = (
                 [{"type": "text", "text": content}]
                 if isinstance(content, str)
-                else content
+                else list(content)
                 if isinstance(content, list)
                 else []
             )
@@ -572,7 +1073,7 @@ class LLM:
                 all_messages = formatted_messages
 
             # Calculate tokens and check limits
-            input_tokens = self.count_message_tokens(all_messages)
+            input_tokens = await self.token_counter.acount_message_tokens(all_messages)
             if not self.check_token_limit(input_tokens):
                 raise TokenLimitExceeded(self.get_limit_error_message(input_tokens))
 
@@ -592,35 +1093,37 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
+            cache_key = self._cache_key("ask_with_images", params)
+            cached = await self._get_cached_response(cache_key)
+            if cached is not None:
+                return cached["content"]
+
             # Handle non-streaming request
             if not stream:
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create_completion(params, input_tokens)
 
                 if not response.choices or not response.choices[0].message.content:
-                    raise ValueError("Empty or invalid response from LLM")
+                    raise EmptyLLMResponse("Empty or invalid response from LLM")
 
                 self.update_token_count(response.usage.prompt_tokens)
-                return response.choices[0].message.content
+                content = response.choices[0].message.content
+                await self.response_cache.aput(cache_key, {"content": content})
+                return content
 
             # Handle streaming request
-            self.update_token_count(input_tokens)
-            response = await self.client.chat.completions.create(**params)
-
-            collected_messages = []
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
-
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
-
-            if not full_response:
-                raise ValueError("Empty response from streaming LLM")
-
-            return full_response
+            return await self._collect_stream(
+                self._stream_text(params, input_tokens, cache_key), sink
+            )
 
-        except TokenLimitExceeded:
+        except (
+            TokenLimitExceeded,
+            ResponseCacheMiss,
+            CircuitOpenError,
+            DeadlineExceeded,
+        ):
+            raise
+        except EmptyLLMResponse as e:
+            logger.warning(f"{e} in ask_with_images")
             raise
         except ValueError as ve:
             logger.error(f"Validation error in ask_with_images: {ve}")
@@ -638,12 +1141,89 @@ class LLM:
             logger.error(f"Unexpected error in ask_with_images: {e}")
             raise
 
+    async def _prepare_tool_request(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        timeout: int = 300,
+        tools: Optional[List[dict]] = None,
+        tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
+        temperature: Optional[float] = None,
+        tools_tokens: Optional[int] = None,
+        **kwargs,
+    ) -> Tuple[dict, int]:
+        """Validate and format a tool-calling request.
+
+        Returns:
+            Tuple of the completion parameters and the estimated input tokens.
+
+        Raises:
+            TokenLimitExceeded: If token limits are exceeded
+            ValueError: If tools, tool_choice, or messages are invalid
+        """
+        # Validate tool_choice
+        if tool_choice not in TOOL_CHOICE_VALUES:
+            raise ValueError(f"Invalid tool_choice: {tool_choice}")
+
+        # Check if the model supports images
+        supports_images = self.model in MULTIMODAL_MODELS
+
+        # Format messages
+        if system_msgs:
+            system_msgs = self.format_messages(system_msgs, supports_images)
+            messages = system_msgs + self.format_messages(messages, supports_images)
+        else:
+            messages = self.format_messages(messages, supports_images)
+
+        # Calculate input token count
+        input_tokens = await self.token_counter.acount_message_tokens(messages)
+
+        # If there are tools, calculate token count for tool descriptions
+        # unless the caller already knows it (e.g. ToolCollection caches it)
+        if tools_tokens is None:
+            tools_tokens = 0
+            if tools:
+                for tool in tools:
+                    tools_tokens += self.count_tokens(str(tool))
+
+        input_tokens += tools_tokens
+
+        # Check if token limits are exceeded
+        if not self.check_token_limit(input_tokens):
+            error_message = self.get_limit_error_message(input_tokens)
+            # Raise a special exception that won't be retried
+            raise TokenLimitExceeded(error_message)
+
+        # Validate tools if provided
+        if tools:
+            for tool in tools:
+                if not isinstance(tool, dict) or "type" not in tool:
+                    raise ValueError("Each tool must be a dict with 'type' field")
+
+        # Set up the completion request
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "tools": tools,
+            "tool_choice": tool_choice,
+            "timeout": timeout,
+            **kwargs,
+        }
+
+        if self.model in REASONING_MODELS:
+            params["max_completion_tokens"] = self.max_tokens
+        else:
+            params["max_tokens"] = self.max_tokens
+            params["temperature"] = (
+                temperature if temperature is not None else self.temperature
+            )
+
+        return params, input_tokens
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
+        retry=retry_if_exception(is_transient),
     )
     async def ask_tool(
         self,
@@ -653,6 +1233,7 @@ class LLM:
         tools: Optional[List[dict]] = None,
         tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
         temperature: Optional[float] = None,
+        tools_tokens: Optional[int] = None,
         **kwargs,
     ):
         """
@@ -665,6 +1246,7 @@ class LLM:
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            tools_tokens: Precomputed token cost of `tools` (counted here if None)
             **kwargs: Additional completion arguments
 
         Returns:
@@ -677,77 +1259,49 @@ class LLM:
             Exception: For unexpected errors
         """
         try:
-            # Validate tool_choice
-            if tool_choice not in TOOL_CHOICE_VALUES:
-                raise ValueError(f"Invalid tool_choice: {tool_choice}")
-
-            # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
-
-            # Format messages
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
-                messages = system_msgs + self.format_messages(messages, supports_images)
-            else:
-                messages = self.format_messages(messages, supports_images)
-
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
-
-            # If there are tools, calculate token count for tool descriptions
-            tools_tokens = 0
-            if tools:
-                for tool in tools:
-                    tools_tokens += self.count_tokens(str(tool))
-
-            input_tokens += tools_tokens
-
-            # Check if token limits are exceeded
-            if not self.check_token_limit(input_tokens):
-                error_message = self.get_limit_error_message(input_tokens)
-                # Raise a special exception that won't be retried
-                raise TokenLimitExceeded(error_message)
-
-            # Validate tools if provided
-            if tools:
-                for tool in tools:
-                    if not isinstance(tool, dict) or "type" not in tool:
-                        raise ValueError("Each tool must be a dict with 'type' field")
-
-            # Set up the completion request
-            params = {
-                "model": self.model,
-                "messages": messages,
-                "tools": tools,
-                "tool_choice": tool_choice,
-                "timeout": timeout,
+            params, input_tokens = await self._prepare_tool_request(
+                messages,
+                system_msgs=system_msgs,
+                timeout=timeout,
+                tools=tools,
+                tool_choice=tool_choice,
+                temperature=temperature,
+                tools_tokens=tools_tokens,
                 **kwargs,
-            }
+            )
 
-            if self.model in REASONING_MODELS:
-                params["max_completion_tokens"] = self.max_tokens
-            else:
-                params["max_tokens"] = self.max_tokens
-                params["temperature"] = (
-                    temperature if temperature is not None else self.temperature
-                )
+            cache_key = self._cache_key("ask_tool", params)
+            cached = await self._get_cached_response(cache_key)
+            if cached is not None:
+                return ChatCompletionMessage.model_validate(cached)
 
-            response = await self.client.chat.completions.create(**params)
+            response = await self._create_completion(params, input_tokens, hedge=True)
 
             # Check if response is valid
             if not response.choices or not response.choices[0].message:
                 print(response)
-                raise ValueError("Invalid or empty response from LLM")
+                raise EmptyLLMResponse("Invalid or empty response from LLM")
 
             # Update token counts
             self.update_token_count(
                 response.usage.prompt_tokens, response.usage.completion_tokens
             )
 
-            return response.choices[0].message
+            message = response.choices[0].message
+            await self.response_cache.aput(cache_key, message.model_dump())
+            return message
 
-        except TokenLimitExceeded:
-            # Re-raise token limit errors without logging
+        except (
+            TokenLimitExceeded,
+            ResponseCacheMiss,
+            CircuitOpenError,
+            DeadlineExceeded,
+        ):
+            # Re-raise token limit, replay cache, open circuit and deadline errors
+            # without logging
+            raise
+        except EmptyLLMResponse as e:
+            logger.warning(f"{e} in ask_tool")
             raise
         except ValueError as ve:
             logger.error(f"Validation error in ask_tool: {ve}")
@@ -764,3 +1318,117 @@ class LLM:
         except Exception as e:
             logger.error(f"Unexpected error in ask_tool: {e}")
             raise
+
+    async def ask_tool_stream(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        timeout: int = 300,
+        tools: Optional[List[dict]] = None,
+        tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
+        temperature: Optional[float] = None,
+        tools_tokens: Optional[int] = None,
+        on_tool_call: Optional[
+            Callable[[ChatCompletionMessageToolCall], Awaitable[None]]
+        ] = None,
+        **kwargs,
+    ) -> ChatCompletionMessage:
+        """
+        Streaming variant of `ask_tool` that dispatches tool calls early.
+
+        Tool calls are assembled from the streamed deltas and each one is
+        passed to `on_tool_call` as soon as its arguments form complete JSON,
+        while the model may still be emitting later calls.
+
+        Unlike `ask_tool` this method is not retried: a tool call that has
+        already been dispatched cannot be taken back. Callers that want
+        retries should fall back to `ask_tool` if nothing was dispatched.
+
+        Args:
+            on_tool_call: Awaitable callback invoked once per completed tool call
+            (other arguments as for `ask_tool`)
+
+        Returns:
+            ChatCompletionMessage: The fully assembled response
+        """
+        try:
+            params, input_tokens = await self._prepare_tool_request(
+                messages,
+                system_msgs=system_msgs,
+                timeout=timeout,
+                tools=tools,
+                tool_choice=tool_choice,
+                temperature=temperature,
+                tools_tokens=tools_tokens,
+                **kwargs,
+            )
+
+            cache_key = self._cache_key("ask_tool", params)
+            cached = await self._get_cached_response(cache_key)
+            if cached is not None:
+                message = ChatCompletionMessage.model_validate(cached)
+                for tool_call in message.tool_calls or []:
+                    if on_tool_call:
+                        await on_tool_call(tool_call)
+                return message
+
+            # Token usage is estimated up front, as for streaming `ask`
+            self.update_token_count(input_tokens)
+
+            params["stream"] = True
+            response = await self._create_completion(params, input_tokens)
+
+            assembler = ToolCallAssembler()
+            content_parts = []
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                for tool_call in assembler.feed(delta.tool_calls or []):
+                    if on_tool_call:
+                        await on_tool_call(tool_call)
+
+            for tool_call in assembler.finish():
+                if on_tool_call:
+                    await on_tool_call(tool_call)
+
+            message = ChatCompletionMessage(
+                role="assistant",
+                content="".join(content_parts) or None,
+                tool_calls=assembler.tool_calls or None,
+            )
+            if not message.content and not message.tool_calls:
+                raise EmptyLLMResponse("Empty response from streaming LLM")
+
+            completion_tokens = await self.token_counter.acount_text(
+                message.content or ""
+            ) + sum(
+                self.count_tokens(call.function.arguments)
+                for call in assembler.tool_calls
+            )
+            self._record_usage(0, completion_tokens)
+
+            await self.response_cache.aput(cache_key, message.model_dump())
+            return message
+
+        except (
+            TokenLimitExceeded,
+            ResponseCacheMiss,
+            CircuitOpenError,
+            DeadlineExceeded,
+        ):
+            raise
+        except EmptyLLMResponse as e:
+            logger.warning(f"{e} in ask_tool_stream")
+            raise
+        except ValueError as ve:
+            logger.error(f"Validation error in ask_tool_stream: {ve}")
+            raise
+        except OpenAIError as oe:
+            logger.error(f"OpenAI API error: {oe}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in ask_tool_stream: {e}")
+            raise
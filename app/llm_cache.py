@@ -0,0 +1,179 @@
+"""Content-addressed on-disk cache for LLM responses.
+
+Responses are stored as JSON files named after a hash of the request
+(model, formatted messages, tools, tool_choice and temperature). The cache
+supports read-through, record-only and replay-only modes and evicts the least
+recently used entries once the directory grows past its size limit.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import PROJECT_ROOT, LLMCacheSettings, config
+from app.logger import logger
+
+
+class CacheMode(str, Enum):
+    """Response cache modes"""
+
+    OFF = "off"
+    READ_THROUGH = "read_through"
+    RECORD = "record"
+    REPLAY = "replay"
+
+    @property
+    def reads(self) -> bool:
+        return self in (CacheMode.READ_THROUGH, CacheMode.REPLAY)
+
+    @property
+    def writes(self) -> bool:
+        return self in (CacheMode.READ_THROUGH, CacheMode.RECORD)
+
+
+class ResponseCache:
+    """A size-bounded LRU store of LLM responses keyed by request hash."""
+
+    def __init__(self, directory: Path, mode: CacheMode, max_size_bytes: int):
+        self.directory = directory
+        self.mode = mode
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        if self.mode != CacheMode.OFF:
+            self._load_index()
+
+    @classmethod
+    def from_settings(cls, settings: LLMCacheSettings) -> "ResponseCache":
+        directory = Path(settings.directory)
+        if not directory.is_absolute():
+            directory = PROJECT_ROOT / directory
+        return cls(
+            directory=directory,
+            mode=CacheMode(settings.mode.lower()),
+            max_size_bytes=settings.max_size_mb * 1024 * 1024,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != CacheMode.OFF
+
+    @staticmethod
+    def make_key(**request: Any) -> str:
+        """Hash the request parts that determine the completion."""
+        raw = json.dumps(request, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU order from file modification times."""
+        if not self.directory.exists():
+            return
+        files = sorted(
+            (path.stat().st_mtime, path.stem, path.stat().st_size)
+            for path in self.directory.glob("*/*.json")
+        )
+        for _, key, size in files:
+            self._entries[key] = size
+            self._size += size
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored response for `key`, or None."""
+        if not self.mode.reads:
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable LLM cache entry {key}: {e}")
+            self._discard(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Store `response` under `key` and evict old entries if needed."""
+        if not self.mode.writes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(payload) - self._entries.pop(key, 0)
+            self._entries[key] = len(payload)
+            evicted = []
+            while self._size > self.max_size_bytes and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                self._size -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._path(old_key).unlink(missing_ok=True)
+
+    def _discard(self, key: str) -> None:
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+        self._path(key).unlink(missing_ok=True)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.mode.reads:
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, response: Dict[str, Any]) -> None:
+        if not self.mode.writes:
+            return
+        try:
+            await asyncio.to_thread(self.put, key, response)
+        except OSError as e:
+            logger.warning(f"Failed to write LLM cache entry {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode.value,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache built from `config.llm_cache`."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache.from_settings(config.llm_cache)
+        if _response_cache.enabled:
+            logger.info(
+                f"LLM response cache enabled ({_response_cache.mode.value}) at {_response_cache.directory}"
+            )
+    return _response_cache
@@ -0,0 +1,304 @@
+"""Latency-aware routing across equivalent LLM endpoints.
+
+An `LLMSettings` entry may list several interchangeable endpoints (e.g. Azure
+deployments in different regions, or a self-hosted gateway next to the public
+API). The router keeps an EWMA of each endpoint's latency and error rate and
+sends every request to the healthiest one. Endpoints that fail with a 5xx,
+timeout, connection error or 429 are put in a short cooldown so that the
+current request fails over immediately instead of spending the whole retry
+budget on a dead endpoint.
+
+Configs may also opt into hedging: when a request is slower than a latency
+percentile tracked per model, an identical second request is raced against
+it and whichever answers first wins.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncAzureOpenAI,
+    AsyncOpenAI,
+    RateLimitError,
+)
+
+from app.config import LLMSettings, config
+from app.exceptions import CircuitOpenError
+from app.http_client import build_timeout, get_http_client
+from app.logger import logger
+from app.rate_limiter import parse_retry_after
+from app.retry_policy import CircuitBreaker, get_circuit_breaker
+
+
+# Smoothing factor for latency and error-rate averages
+EWMA_ALPHA = 0.3
+# Cooldown after a failure grows exponentially up to this many seconds
+MAX_COOLDOWN = 60.0
+# Hedging needs this many latency samples before it kicks in
+HEDGE_MIN_SAMPLES = 20
+# At most this fraction of requests may send a hedge
+HEDGE_MAX_RATIO = 0.1
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """Whether another endpoint may succeed where this one failed."""
+    if isinstance(error, (APITimeoutError, APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+@dataclass
+class Endpoint:
+    """One API endpoint and its live health statistics."""
+
+    base_url: str
+    client: Any
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    latency: Optional[float] = None
+    error_rate: float = 0.0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self) -> float:
+        """Lower is better; endpoints without samples are tried first."""
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + 4 * self.error_rate)
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.latency = (
+            latency
+            if self.latency is None
+            else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+        )
+        self.error_rate *= 1 - EWMA_ALPHA
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record_failure(self, retry_after: Optional[float] = None) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_rate
+        self.consecutive_failures += 1
+        cooldown = retry_after or min(
+            MAX_COOLDOWN, 2 ** (self.consecutive_failures - 1)
+        )
+        self.cooldown_until = time.monotonic() + cooldown
+
+
+@dataclass
+class EndpointRouter:
+    """Chooses endpoints for one LLM config and tracks their health."""
+
+    endpoints: List[Endpoint] = field(default_factory=list)
+
+    @classmethod
+    def from_settings(cls, settings: LLMSettings) -> "EndpointRouter":
+        """Build the primary endpoint plus any extra `endpoints` of the config."""
+        specs = [
+            {
+                "base_url": settings.base_url,
+                "api_key": settings.api_key,
+                "api_type": settings.api_type,
+                "api_version": settings.api_version,
+            }
+        ]
+        for extra in settings.endpoints:
+            specs.append(
+                {
+                    "base_url": extra.base_url,
+                    "api_key": extra.api_key or settings.api_key,
+                    "api_type": extra.api_type or settings.api_type,
+                    "api_version": extra.api_version or settings.api_version,
+                }
+            )
+        return cls(
+            [
+                Endpoint(
+                    spec["base_url"],
+                    cls._make_client(**spec),
+                    breaker=get_circuit_breaker(spec["base_url"]),
+                )
+                for spec in specs
+            ]
+        )
+
+    @staticmethod
+    def _make_client(base_url: str, api_key: str, api_type: str, api_version: str):
+        # All configs targeting the same API host share one connection pool
+        http_client = get_http_client(base_url)
+        timeout = build_timeout(config.llm_http)
+        if api_type == "azure":
+            return AsyncAzureOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                api_version=api_version,
+                http_client=http_client,
+                timeout=timeout,
+            )
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+            timeout=timeout,
+        )
+
+    def choose(self, exclude: Optional[List[Endpoint]] = None) -> Optional[Endpoint]:
+        """Pick the best untried endpoint, preferring ones not cooling down.
+
+        Endpoints whose circuit breaker is open are never chosen.
+        """
+        candidates = [
+            ep
+            for ep in self.endpoints
+            if ep not in (exclude or []) and ep.breaker.available
+        ]
+        if not candidates:
+            return None
+        healthy = [ep for ep in candidates if ep.available]
+        if healthy:
+            return min(healthy, key=Endpoint.score)
+        # Everything is cooling down: use the one that recovers first
+        return min(candidates, key=lambda ep: ep.cooldown_until)
+
+    async def send(self, params: dict):
+        """Send a chat completion, failing over between endpoints.
+
+        Each endpoint is tried at most once per call; the last error is
+        raised if all of them fail, or `CircuitOpenError` if no endpoint's
+        breaker lets the request through.
+        """
+        tried: List[Endpoint] = []
+        last_error: Optional[Exception] = None
+        while (endpoint := self.choose(exclude=tried)) is not None:
+            tried.append(endpoint)
+            endpoint.breaker.allow()
+            start = time.monotonic()
+            try:
+                response = await endpoint.client.chat.completions.create(**params)
+            except Exception as e:
+                if not is_failover_error(e):
+                    # The endpoint answered, so it is healthy
+                    endpoint.breaker.record_success()
+                    raise
+                if isinstance(e, RateLimitError):
+                    endpoint.breaker.release()
+                    endpoint.record_failure(parse_retry_after(e))
+                else:
+                    endpoint.breaker.record_failure()
+                    endpoint.record_failure()
+                last_error = e
+                if len(tried) < len(self.endpoints):
+                    logger.warning(
+                        f"LLM endpoint {endpoint.base_url} failed ({type(e).__name__}), failing over"
+                    )
+                continue
+            except BaseException:
+                endpoint.breaker.release()
+                raise
+            endpoint.breaker.record_success()
+            endpoint.record_success(time.monotonic() - start)
+            return response
+
+        if last_error is None:
+            retry_in = min(ep.breaker.retry_in() for ep in self.endpoints)
+            raise CircuitOpenError(
+                f"Circuit open for all endpoints, retry in {retry_in:.0f}s"
+            )
+        raise last_error
+
+    def stats(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        return {
+            ep.base_url: {
+                "latency": ep.latency,
+                "error_rate": round(ep.error_rate, 4),
+                "requests": ep.requests,
+                "failures": ep.failures,
+                "cooldown": max(0.0, ep.cooldown_until - now),
+                "circuit": ep.breaker.state.value,
+            }
+            for ep in self.endpoints
+        }
+
+
+class LatencyTracker:
+    """Recent completion latencies of one model, used to time hedges."""
+
+    def __init__(self, window: int = 256):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+
+    def record(self, latency: float) -> None:
+        self.samples.append(latency)
+        self.requests += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th percentile (0-100) of recent latencies, or None if too few."""
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1)
+        return ordered[max(0, index)]
+
+    def hedge_delay(self, q: float) -> Optional[float]:
+        """How long to wait before hedging, or None if hedging is not allowed."""
+        if self.hedges >= HEDGE_MAX_RATIO * max(self.requests, HEDGE_MIN_SAMPLES):
+            return None
+        return self.percentile(q)
+
+
+_latency_trackers: Dict[str, LatencyTracker] = {}
+
+
+def get_latency_tracker(model: str) -> LatencyTracker:
+    """Return the latency tracker shared by every LLM using `model`."""
+    return _latency_trackers.setdefault(model, LatencyTracker())
+
+
+async def hedged(
+    send: Callable[[], Awaitable[Any]],
+    delay: Optional[float],
+    hedge: Optional[Callable[[], Awaitable[Any]]] = None,
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> Any:
+    """Await `send()`, racing a second request if it is slower than `delay`.
+
+    The first successful result wins and the other request is cancelled. If
+    both fail, the error of the original request is raised.
+    """
+    primary = asyncio.ensure_future(send())
+    pending = {primary}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                if on_hedge:
+                    on_hedge()
+                pending.add(asyncio.ensure_future((hedge or send)()))
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        return primary.result()
+    finally:
+        for task in pending:
+            task.cancel()
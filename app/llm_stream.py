@@ -0,0 +1,70 @@
+"""Streaming primitives for text completions.
+
+`LLM.ask_stream` yields `StreamDelta` objects as the model produces them,
+ending with one delta that carries the token usage. Streaming `LLM.ask`
+consumes the same deltas and hands the text to a `StreamSink`, which by
+default echoes it to stdout for the CLI.
+"""
+
+import sys
+from typing import Optional, Protocol, TextIO
+
+from openai.types import CompletionUsage
+from pydantic import BaseModel, Field
+
+
+class StreamDelta(BaseModel):
+    """A piece of streamed text; the final delta carries the usage."""
+
+    content: str = Field(default="")
+    usage: Optional[CompletionUsage] = Field(default=None)
+
+    @property
+    def is_final(self) -> bool:
+        return self.usage is not None
+
+
+class StreamSink(Protocol):
+    """Receives streamed text as it arrives."""
+
+    def write(self, text: str) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class NullSink:
+    """A sink that discards streamed text."""
+
+    def write(self, text: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class StdoutSink:
+    """Echo streamed text to a terminal.
+
+    Output is flushed per delta only when the stream is interactive; when
+    stdout is redirected it is flushed once per completion instead.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self._stream = stream
+
+    @property
+    def stream(self) -> TextIO:
+        # Resolved lazily so that later stdout redirection is honoured
+        return self._stream or sys.stdout
+
+    def write(self, text: str) -> None:
+        stream = self.stream
+        stream.write(text)
+        if stream.isatty():
+            stream.flush()
+
+    def close(self) -> None:
+        self.stream.write("\n")
+        self.stream.flush()
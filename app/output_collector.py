@@ -0,0 +1,162 @@
+"""Bounded collection of command output.
+
+Commands like `cat` on a big log or `find /` can print far more than an
+observation can hold. `OutputCollector` keeps only the head and the tail of
+the output in memory. Once the output outgrows `limit`, all of it is also
+written to a file in the workspace, and the text handed back to the agent
+points at that file instead of carrying the middle of the output. Pass
+`spill=False` when the reader cannot open host files (e.g. commands run in
+the sandbox); the middle of the output is then dropped.
+
+An agent that clips observations to `max_observe` characters announces it
+with `set_observation_limit`, and collectors shrink to fit so that the
+clipping never removes the tail or the note about the saved file. Spilled
+files are kept up to `MAX_SPILL_BYTES` in total, oldest removed first.
+
+    collector = OutputCollector(limit=10000, name="terminal")
+    await collector.consume(process.stdout)
+    observation = collector.text()
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+from app.config import config
+from app.logger import logger
+
+
+DEFAULT_OUTPUT_LIMIT = 10000  # bytes
+MAX_SPILL_BYTES = 256 * 1024 * 1024
+
+# Characters of an observation the running agent keeps (None: no limit)
+_observation_limit: ContextVar[Optional[int]] = ContextVar(
+    "observation_limit", default=None
+)
+
+
+def set_observation_limit(limit: Optional[int]) -> None:
+    """Bound the output of commands run in the current context to fit `limit`."""
+    _observation_limit.set(limit)
+
+
+def _prune(directory: Path, keep: Path) -> None:
+    """Remove the oldest spilled files until `directory` fits in `MAX_SPILL_BYTES`."""
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.stat().st_size, Path(entry.path))
+            for entry in os.scandir(directory)
+            if entry.is_file() and entry.path != str(keep)
+        ]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= MAX_SPILL_BYTES:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+
+
+class OutputCollector:
+    """Keeps the first and last `limit / 2` bytes of a stream of output."""
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_OUTPUT_LIMIT,
+        name: str = "output",
+        directory: Optional[Union[str, Path]] = None,
+        spill: bool = True,
+    ):
+        observe = _observation_limit.get()
+        if observe:
+            # Commands report stdout and stderr; a third of the observation
+            # is left for the agent's header and the omission notes
+            limit = min(limit, max(1, observe // 3))
+        self.limit = limit
+        self.name = name
+        self.spill = spill
+        self.directory = (
+            Path(directory) if directory else config.workspace_root / "tool_output"
+        )
+        self.total = 0
+        self.path: Optional[Path] = None
+        self._head_limit = limit - limit // 2
+        self._tail_limit = limit // 2
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._file: Optional[BinaryIO] = None
+        self._spilled = False
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self.limit
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        if self.spill and not self._spilled and self.total + len(data) > self.limit:
+            # Head and tail still hold everything written so far
+            self._spill()
+        self.total += len(data)
+        if self._file is not None:
+            self._file.write(data)
+
+        room = self._head_limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        self._tail += data
+        excess = len(self._tail) - self._tail_limit
+        if excess > 0:
+            del self._tail[:excess]
+
+    def _spill(self) -> None:
+        self._spilled = True
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"{self.name}-{stamp}-{uuid.uuid4().hex[:8]}.log"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = path.open("wb")
+        except OSError as e:
+            logger.warning(f"Cannot save full {self.name} output to {path}: {e}")
+            return
+        self.path = path
+        self._file.write(self._head)
+        self._file.write(self._tail)
+        _prune(self.directory, keep=path)
+
+    async def consume(self, reader: asyncio.StreamReader) -> None:
+        """Collect everything `reader` produces until EOF."""
+        while chunk := await reader.read(65536):
+            self.write(chunk)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def text(self) -> str:
+        """Finish collecting and return the output, shortened if it is too long."""
+        self.close()
+        if not self.truncated:
+            return (self._head + self._tail).decode(errors="replace")
+        omitted = self.total - len(self._head) - len(self._tail)
+        if self.path:
+            where = f"; full output saved to {self.path}"
+        elif not self.spill:
+            where = "; redirect it to a file to keep the full output"
+        else:
+            where = ""
+        return (
+            f"{self._head.decode(errors='replace')}\n"
+            f"[... {omitted} bytes omitted of {self.total}{where} ...]\n"
+            f"{self._tail.decode(errors='replace')}"
+        )
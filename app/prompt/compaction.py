@@ -0,0 +1,14 @@
+SUMMARY_SYSTEM_PROMPT = (
+    "You compress the history of an agent's work so that it can continue the task "
+    "with a much shorter context."
+)
+
+SUMMARY_PROMPT = """Summarize the following part of the conversation between a user, an AI agent and its tools.
+
+Keep everything the agent needs to continue the task: the goal, decisions taken, facts and results obtained, files, URLs and identifiers involved, errors encountered and what remains to be done. Omit pleasantries and repeated tool output. Be concise.
+
+Conversation:
+{conversation}
+"""
+
+SUMMARY_MESSAGE = "[Summary of the earlier conversation]\n{summary}"
@@ -0,0 +1,178 @@
+"""Client-side rate limiting for LLM requests.
+
+Each LLM config gets one `LLMRateLimiter` that combines:
+
+* token buckets for requests per minute and tokens per minute, where every
+  request reserves its estimated input tokens before it is sent, and
+* an AIMD concurrency window that grows by one slot per window of successful
+  requests, halves on a 429 and pauses all callers for the `Retry-After`
+  period the provider asked for.
+"""
+
+import asyncio
+import math
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from app.config import LLMSettings
+from app.logger import logger
+
+
+class TokenBucket:
+    """An asyncio token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until `amount` tokens are available and take them.
+
+        Requests larger than the bucket are clamped to its capacity so that a
+        single oversized call cannot block forever.
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:  # FIFO: one waiter drains the bucket at a time
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class AdaptiveConcurrency:
+    """An additive-increase / multiplicative-decrease concurrency window."""
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self.ceiling = float(max_concurrency) if max_concurrency else math.inf
+        self.window = self.ceiling
+        self.in_flight = 0
+        self._blocked_until = 0.0
+        self._condition = asyncio.Condition()
+
+    def _limit(self) -> float:
+        return self.window if math.isinf(self.window) else max(1, int(self.window))
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            while True:
+                delay = self._blocked_until - time.monotonic()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < self._limit():
+                    self.in_flight += 1
+                    return
+                await self._condition.wait()
+
+    async def release(
+        self, throttled: bool = False, retry_after: Optional[float] = None
+    ) -> None:
+        async with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            if throttled:
+                base = self.window if self.window != math.inf else self.in_flight + 1
+                self.window = max(1.0, base / 2)
+                if retry_after:
+                    self._blocked_until = max(
+                        self._blocked_until, time.monotonic() + retry_after
+                    )
+            elif self.window < self.ceiling:
+                self.window = min(self.ceiling, self.window + 1 / self.window)
+            self._condition.notify_all()
+
+
+class LLMRateLimiter:
+    """Rate limiter shared by every caller of one LLM config."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.name = name
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+
+    async def acquire(self, input_tokens: int = 0) -> None:
+        """Reserve a request slot and the estimated input tokens."""
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens and input_tokens:
+            await self.tokens.acquire(input_tokens)
+        await self.concurrency.acquire()
+
+    async def release(
+        self, throttled: bool = False, retry_after: Optional[float] = None
+    ) -> None:
+        """Return the slot, shrinking the window if the provider throttled us."""
+        if throttled:
+            logger.warning(
+                f"Rate limited on '{self.name}', concurrency window "
+                f"{self.concurrency.window:g} -> halved"
+                + (f", pausing {retry_after:.1f}s" if retry_after else "")
+            )
+        await self.concurrency.release(throttled, retry_after)
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """Extract the Retry-After delay in seconds from an API error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return max(
+                0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()
+            )
+        except (TypeError, ValueError):
+            return None
+
+
+_rate_limiters: Dict[str, LLMRateLimiter] = {}
+
+
+def get_rate_limiter(config_name: str, settings: LLMSettings) -> LLMRateLimiter:
+    """Return the limiter shared by all LLM instances using `config_name`."""
+    if config_name not in _rate_limiters:
+        _rate_limiters[config_name] = LLMRateLimiter(
+            config_name,
+            requests_per_minute=settings.requests_per_minute,
+            tokens_per_minute=settings.tokens_per_minute,
+            max_concurrency=settings.max_concurrency,
+        )
+    return _rate_limiters[config_name]
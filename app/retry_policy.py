@@ -0,0 +1,132 @@
+"""Retry classification and circuit breaking for LLM calls.
+
+Errors are split into transient ones (timeouts, connection failures, 429s,
+5xx responses and empty completions) that are worth retrying with backoff,
+and permanent ones (token limits, invalid requests, authentication, replay
+cache misses, open circuits) that fail immediately.
+
+Each API endpoint has one `CircuitBreaker` shared by every LLM config and
+agent in the process. After repeated failures the breaker opens and callers
+fail fast with `CircuitOpenError` until a single probe request is let through
+to check whether the endpoint has recovered.
+"""
+
+import asyncio
+import time
+from enum import Enum
+from typing import Dict
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from app.exceptions import EmptyLLMResponse
+from app.logger import logger
+
+
+TRANSIENT_ERRORS = (
+    APITimeoutError,
+    APIConnectionError,
+    RateLimitError,
+    InternalServerError,
+    EmptyLLMResponse,
+    asyncio.TimeoutError,
+)
+# Status codes that may succeed when the same request is sent again
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429}
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether retrying the same request might succeed."""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    if isinstance(error, APIStatusError):
+        code = error.status_code
+        return code in TRANSIENT_STATUS_CODES or code >= 500
+    return False
+
+
+class CircuitState(str, Enum):
+    """Circuit breaker states"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """A consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(
+        self, name: str = "", failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self.failures < self.failure_threshold:
+            return CircuitState.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    @property
+    def available(self) -> bool:
+        """Whether a request may be sent now, without claiming the probe."""
+        state = self.state
+        return state == CircuitState.CLOSED or (
+            state == CircuitState.HALF_OPEN and not self._probing
+        )
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a probe through."""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return self.reset_timeout - (time.monotonic() - self.opened_at)
+
+    def allow(self) -> bool:
+        """Claim permission to send a request, taking the probe if half-open."""
+        if not self.available:
+            return False
+        if self.state == CircuitState.HALF_OPEN:
+            self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        if self.failures >= self.failure_threshold:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold:
+            if self.failures == self.failure_threshold:
+                logger.warning(
+                    f"Circuit for {self.name} opened after {self.failures} failures"
+                )
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back the probe of a request that was abandoned."""
+        self._probing = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(base_url: str) -> CircuitBreaker:
+    """Return the breaker shared by everything calling `base_url`."""
+    if base_url not in _breakers:
+        _breakers[base_url] = CircuitBreaker(base_url)
+    return _breakers[base_url]
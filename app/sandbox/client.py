@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Protocol
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Protocol
 
 from app.config import SandboxSettings
 from app.sandbox.core.sandbox import DockerSandbox
@@ -199,3 +201,33 @@ def create_sandbox_client() -> LocalSandboxClient:
 
 
 SANDBOX_CLIENT = create_sandbox_client()
+
+# Sandbox client of the current task, when tasks must not share a sandbox
+_current_client: ContextVar[Optional[BaseSandboxClient]] = ContextVar(
+    "sandbox_client", default=None
+)
+
+
+def get_sandbox_client() -> BaseSandboxClient:
+    """Returns the sandbox client of the current task, or the global one."""
+    return _current_client.get() or SANDBOX_CLIENT
+
+
+@contextmanager
+def sandbox_client_scope(
+    client: Optional[BaseSandboxClient] = None,
+) -> Iterator[BaseSandboxClient]:
+    """Uses a separate sandbox client for the enclosed code and its tasks.
+
+    Args:
+        client: Client to use; a new one is created if not given.
+
+    Yields:
+        BaseSandboxClient: The client in effect inside the scope.
+    """
+    client = client or create_sandbox_client()
+    token = _current_client.set(client)
+    try:
+        yield client
+    finally:
+        _current_client.reset(token)
@@ -11,6 +11,7 @@ from docker.errors import NotFound
 from docker.models.containers import Container
 
 from app.config import SandboxSettings
+from app.deadline import check_deadline, clamp_timeout
 from app.sandbox.core.exceptions import SandboxTimeoutError
 from app.sandbox.core.terminal import AsyncDockerizedTerminal
 
@@ -142,7 +143,7 @@ class DockerSandbox:
 
         Args:
             cmd: Command to execute.
-            timeout: Timeout in seconds.
+            timeout: Timeout in seconds, clamped to the current run's deadline.
 
         Returns:
             Command output as string.
@@ -150,17 +151,19 @@ class DockerSandbox:
         Raises:
             RuntimeError: If sandbox not initialized or command execution fails.
             TimeoutError: If command execution times out.
+            DeadlineExceeded: If the current run is already out of time.
         """
         if not self.terminal:
             raise RuntimeError("Sandbox not initialized")
 
+        # Never wait past the deadline of the run issuing the command
+        check_deadline()
+        timeout = clamp_timeout(timeout or self.config.timeout)
         try:
-            return await self.terminal.run_command(
-                cmd, timeout=timeout or self.config.timeout
-            )
+            return await self.terminal.run_command(cmd, timeout=timeout)
         except TimeoutError:
             raise SandboxTimeoutError(
-                f"Command execution timed out after {timeout or self.config.timeout} seconds"
+                f"Command execution timed out after {timeout:g} seconds"
             )
 
     async def read_file(self, path: str) -> str:
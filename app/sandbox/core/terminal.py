@@ -15,6 +15,8 @@ from docker import APIClient
 from docker.errors import APIError
 from docker.models.containers import Container
 
+from app.output_collector import DEFAULT_OUTPUT_LIMIT, OutputCollector
+
 
 class DockerSession:
     def __init__(self, container_id: str) -> None:
@@ -136,12 +138,20 @@ class DockerSession:
                 raise
         return buffer.decode("utf-8")
 
-    async def execute(self, command: str, timeout: Optional[int] = None) -> str:
+    async def execute(
+        self,
+        command: str,
+        timeout: Optional[int] = None,
+        max_output: int = DEFAULT_OUTPUT_LIMIT,
+    ) -> str:
         """Executes a command and returns cleaned output.
 
         Args:
             command: Shell command to execute.
             timeout: Maximum execution time in seconds.
+            max_output: Bytes of output to return; only the head and tail of
+                longer output are kept (host files are out of the sandbox's
+                reach, so nothing is saved).
 
         Returns:
             Command output as string with prompt markers removed.
@@ -161,7 +171,8 @@ class DockerSession:
 
             async def read_output() -> str:
                 buffer = b""
-                result_lines = []
+                # Only the head and tail of long output are kept in memory
+                collector = OutputCollector(max_output, name="sandbox", spill=False)
                 command_sent = False
 
                 while True:
@@ -187,7 +198,7 @@ class DockerSession:
                                 continue
 
                             if line.strip():
-                                result_lines.append(line)
+                                collector.write(line + b"\n")
 
                         if buffer.endswith(b"$ "):
                             break
@@ -198,8 +209,8 @@ class DockerSession:
                             continue
                         raise
 
-                output = b"\n".join(result_lines).decode("utf-8")
-                output = re.sub(r"\n\$ echo \$\$?.*$", "", output)
+                output = collector.text()
+                output = re.sub(r"\n\$ echo \$\$?.*$", "", output.rstrip("\n"))
 
                 return output
 
@@ -211,10 +222,22 @@ class DockerSession:
             return result.strip()
 
         except asyncio.TimeoutError:
+            self._interrupt()
             raise TimeoutError(f"Command execution timed out after {timeout} seconds")
+        except asyncio.CancelledError:
+            # Stop the command rather than leave it running in the container
+            self._interrupt()
+            raise
         except Exception as e:
             raise RuntimeError(f"Failed to execute command: {e}")
 
+    def _interrupt(self) -> None:
+        """Sends Ctrl-C to the command running in the session."""
+        try:
+            self.socket.sendall(b"\x03")
+        except (OSError, AttributeError):
+            pass
+
     def _sanitize_command(self, command: str) -> str:
         """Sanitizes the command string to prevent shell injection.
 
@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+
+from app.blob_store import get_blob_store
 
 
 class Role(str, Enum):
@@ -51,15 +53,48 @@ class ToolCall(BaseModel):
     function: Function
 
 
+class WireMessage(dict):
+    """A formatted message dict that can carry memoized metadata.
+
+    Instances are sent to the API like plain dicts; attributes such as the
+    token counter's content hash ride along without touching the payload.
+    """
+
+
 class Message(BaseModel):
-    """Represents a chat message in the conversation"""
+    """Represents a chat message in the conversation
+
+    Images passed as `base64_image` are kept in the blob store; the message
+    only holds their reference and loads the bytes when they are needed.
+    """
 
     role: ROLE_TYPE = Field(...)  # type: ignore
     content: Optional[str] = Field(default=None)
     tool_calls: Optional[List[ToolCall]] = Field(default=None)
     name: Optional[str] = Field(default=None)
     tool_call_id: Optional[str] = Field(default=None)
-    base64_image: Optional[str] = Field(default=None)
+    image_ref: Optional[str] = Field(default=None)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _store_image(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "base64_image" in data:
+            data = dict(data)
+            base64_image = data.pop("base64_image")
+            if base64_image:
+                data["image_ref"] = get_blob_store().put(base64_image)
+        return data
+
+    @property
+    def base64_image(self) -> Optional[str]:
+        """The image of this message, loaded from the blob store"""
+        if self.image_ref is None:
+            return None
+        return get_blob_store().get(self.image_ref)
+
+    @base64_image.setter
+    def base64_image(self, value: Optional[str]) -> None:
+        self.image_ref = get_blob_store().put(value) if value else None
 
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
@@ -81,8 +116,22 @@ class Message(BaseModel):
                 f"unsupported operand type(s) for +: '{type(other).__name__}' and '{type(self).__name__}'"
             )
 
-    def to_dict(self) -> dict:
-        """Convert message to dictionary format"""
+    # Cached wire formats, dropped whenever a field is assigned
+    _dict: Optional[dict] = PrivateAttr(default=None)
+    _wire: Dict[bool, dict] = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop the cached serializations, e.g. after mutating a field in place"""
+        # Reassign rather than clear: copies of this message share the caches
+        self._dict = None
+        self._wire = {}
+
+    def _build_dict(self) -> dict:
         message = {"role": self.role}
         if self.content is not None:
             message["content"] = self.content
@@ -92,10 +141,47 @@ class Message(BaseModel):
             message["name"] = self.name
         if self.tool_call_id is not None:
             message["tool_call_id"] = self.tool_call_id
-        if self.base64_image is not None:
-            message["base64_image"] = self.base64_image
         return message
 
+    def to_dict(self) -> dict:
+        """Convert message to dictionary format"""
+        if self._dict is None:
+            self._dict = self._build_dict()
+        message = dict(self._dict)
+        base64_image = self.base64_image
+        if base64_image is not None:
+            message["base64_image"] = base64_image
+        return message
+
+    def to_wire(self, supports_images: bool = False) -> dict:
+        """The OpenAI wire format of this message.
+
+        The text part is built once and cached; the returned dict is shared
+        between calls and must not be mutated. The image, if any, becomes an
+        `image_url` content part when the model supports images and is still
+        available. It is loaded on every call rather than cached, so that
+        history does not keep image bytes alive between requests.
+        """
+        wire = self._wire.get(supports_images)
+        if wire is None:
+            if self._dict is None:
+                self._dict = self._build_dict()
+            wire = WireMessage(self._dict)
+            self._wire[supports_images] = wire
+
+        base64_image = self.base64_image if supports_images else None
+        if not base64_image:
+            return wire
+        content = wire.get("content")
+        parts = [{"type": "text", "text": content}] if content else []
+        parts.append(
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+            }
+        )
+        return WireMessage(wire, content=parts)
+
     @classmethod
     def user_message(
         cls, content: str, base64_image: Optional[str] = None
@@ -157,23 +243,197 @@ class Message(BaseModel):
 
 
 class Memory(BaseModel):
+    """Bounded conversation history.
+
+    Once more than `max_messages` are stored, the oldest messages are
+    evicted in place, always as whole tool-call groups (an assistant message
+    together with its tool results) so that no `tool` message is left
+    without the call it answers. Pinned messages, such as the initial user
+    request, are never evicted.
+
+    Appends below the limit are O(1); an append at the limit is O(n) with
+    n <= `max_messages`, as eviction shifts the remaining references down.
+    `messages` stays a list rather than a deque because agents index, slice
+    and assign it directly.
+    """
+
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
 
-    def add_message(self, message: Message) -> None:
+    # Running token total, maintained when a token counter is attached
+    _token_counter: Optional[Callable[[Message], int]] = PrivateAttr(default=None)
+    _async_token_counter: Optional[
+        Callable[[List[Message]], Awaitable[List[int]]]
+    ] = PrivateAttr(default=None)
+    # Bookkeeping is keyed by id() and holds on to the message itself, so an
+    # id cannot be reused by another message while it is tracked
+    _token_counts: Dict[int, Tuple[Message, int]] = PrivateAttr(default_factory=dict)
+    _token_total: int = PrivateAttr(default=0)
+    # Stored messages whose tokens have not been counted yet
+    _uncounted: Dict[int, Message] = PrivateAttr(default_factory=dict)
+    # Messages that are never evicted
+    _pinned: Dict[int, Message] = PrivateAttr(default_factory=dict)
+
+    def set_token_counter(
+        self,
+        counter: Optional[Callable[[Message], int]],
+        async_counter: Optional[Callable[[List[Message]], Awaitable[List[int]]]] = None,
+    ) -> None:
+        """Attach per-message token counters and rebuild the running total.
+
+        Messages are counted lazily: `atoken_count` counts the new ones in
+        one batch with `async_counter` (which may tokenize off the event
+        loop), and `token_count` falls back to `counter` for any left over.
+        """
+        self._token_counter = counter
+        self._async_token_counter = async_counter
+        self._token_counts = {}
+        self._token_total = 0
+        self._uncounted = {}
+        self._track(self.messages)
+
+    def _track(self, messages: List[Message]) -> None:
+        """Queue newly stored messages for counting"""
+        if self._token_counter is None:
+            return
+        for message in messages:
+            if id(message) not in self._token_counts:
+                self._uncounted[id(message)] = message
+
+    def _count(self, message: Message, tokens: int) -> None:
+        if self._uncounted.pop(id(message), None) is not None:
+            self._token_counts[id(message)] = (message, tokens)
+            self._token_total += tokens
+
+    def _untrack(self, messages: List[Message]) -> None:
+        """Subtract the token cost of evicted messages from the running total"""
+        self._forget(id(message) for message in messages)
+
+    def _forget(self, message_ids) -> None:
+        for message_id in list(message_ids):
+            self._uncounted.pop(message_id, None)
+            _, tokens = self._token_counts.pop(message_id, (None, 0))
+            self._token_total -= tokens
+
+    def recount(self, messages: List[Message]) -> None:
+        """Refresh the token cost of stored messages after they were modified"""
+        self._untrack(messages)
+        self._track(messages)
+
+    def pin(self, message: Message) -> None:
+        """Protect a stored message from eviction"""
+        self._pinned[id(message)] = message
+
+    def is_pinned(self, message: Message) -> bool:
+        return id(message) in self._pinned
+
+    def _enforce_limit(self) -> None:
+        """Evict the oldest unpinned messages, whole tool-call groups at a time"""
+        excess = len(self.messages) - self.max_messages
+        if excess <= 0:
+            return
+
+        drop = []
+        for index, message in enumerate(self.messages):
+            if id(message) in self._pinned:
+                continue
+            # Past the limit, keep evicting only the tool results that would
+            # otherwise lose the assistant message that called them
+            if excess <= 0 and message.role != Role.TOOL:
+                break
+            drop.append(index)
+            excess -= 1
+        if not drop:
+            return
+
+        evicted = [self.messages[i] for i in drop]
+        if drop[-1] - drop[0] == len(drop) - 1:
+            # Usually a single run, e.g. right after a pinned task message
+            del self.messages[drop[0] : drop[-1] + 1]
+        else:
+            dropped = set(drop)
+            self.messages[:] = [
+                m for i, m in enumerate(self.messages) if i not in dropped
+            ]
+        self._untrack(evicted)
+
+    def _resync(self) -> None:
+        # The message list may have been replaced or mutated directly, also
+        # by a list of the same length
+        live = {id(message) for message in self.messages}
+        tracked = self._token_counts.keys() | self._uncounted.keys()
+        if live != tracked:
+            self._forget(tracked - live)
+            self._track(self.messages)
+        for message_id in self._pinned.keys() - live:
+            del self._pinned[message_id]
+
+    @property
+    def token_count(self) -> int:
+        """Token total of the stored messages (0 without a token counter)"""
+        if self._token_counter is None:
+            return 0
+        self._resync()
+        for message in list(self._uncounted.values()):
+            self._count(message, self._token_counter(message))
+        return self._token_total
+
+    async def atoken_count(self) -> int:
+        """Like `token_count`, counting new messages with the async counter"""
+        if self._token_counter is None:
+            return 0
+        self._resync()
+        if self._uncounted and self._async_token_counter is not None:
+            batch = list(self._uncounted.values())
+            counts = await self._async_token_counter(batch)
+            # Messages evicted in the meantime are no longer pending
+            for message, tokens in zip(batch, counts):
+                self._count(message, tokens)
+        return self.token_count
+
+    def add_message(self, message: Message, pin: bool = False) -> None:
         """Add a message to memory"""
         self.messages.append(message)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._track([message])
+        if pin:
+            self.pin(message)
+        self._enforce_limit()
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
         self.messages.extend(messages)
+        self._track(messages)
+        self._enforce_limit()
+
+    def replace_messages(self, old: List[Message], new: List[Message]) -> bool:
+        """Replace a contiguous run of stored messages with `new`.
+
+        Returns False, leaving memory untouched, if `old` is no longer stored
+        contiguously (e.g. because it was evicted in the meantime).
+        """
+        if not old:
+            return False
+        try:
+            start = next(i for i, m in enumerate(self.messages) if m is old[0])
+        except StopIteration:
+            return False
+        end = start + len(old)
+        if len(self.messages) < end or any(
+            a is not b for a, b in zip(self.messages[start:end], old)
+        ):
+            return False
+        self.messages[start:end] = new
+        self._untrack(old)
+        self._track(new)
+        return True
 
     def clear(self) -> None:
         """Clear all messages"""
         self.messages.clear()
+        self._token_counts.clear()
+        self._uncounted.clear()
+        self._token_total = 0
+        self._pinned.clear()
 
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
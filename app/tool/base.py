@@ -8,6 +8,10 @@ class BaseTool(ABC, BaseModel):
     name: str
     description: str
     parameters: Optional[dict] = None
+    # Whether calls may run concurrently with other concurrency-safe calls
+    concurrency_safe: bool = False
+    # Seconds for which identical calls may reuse a result; None never caches
+    cache_ttl: Optional[float] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -20,6 +24,18 @@ class BaseTool(ABC, BaseModel):
     async def execute(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
 
+    def is_concurrency_safe(self, tool_input: Dict[str, Any]) -> bool:
+        """Whether this particular call can run alongside other safe calls."""
+        return self.concurrency_safe
+
+    async def cache_validator(self, tool_input: Dict[str, Any]) -> Optional[str]:
+        """Fingerprint of the state a call's result depends on.
+
+        A cached result is only reused while the fingerprint is unchanged.
+        None means this particular call must not be cached.
+        """
+        return ""
+
     def to_param(self) -> Dict:
         """Convert tool to function call format."""
         return {
@@ -1,8 +1,11 @@
 import asyncio
 import os
+import signal
 from typing import Optional
 
+from app.deadline import clamp_timeout
 from app.exceptions import ToolError
+from app.output_collector import DEFAULT_OUTPUT_LIMIT, OutputCollector
 from app.tool.base import BaseTool, CLIResult, ToolResult
 
 
@@ -22,6 +25,7 @@ class _BashSession:
     command: str = "/bin/bash"
     _output_delay: float = 0.2  # seconds
     _timeout: float = 120.0  # seconds
+    _output_limit: int = DEFAULT_OUTPUT_LIMIT  # bytes kept per stream
     _sentinel: str = "<<exit>>"
 
     def __init__(self):
@@ -48,9 +52,16 @@ class _BashSession:
         """Terminate the bash shell."""
         if not self._started:
             raise ToolError("Session has not started.")
+        self._kill(signal.SIGTERM)
+
+    def _kill(self, sig: int = signal.SIGKILL) -> None:
+        """Signal the shell's whole process group, including its children."""
         if self._process.returncode is not None:
             return
-        self._process.terminate()
+        try:
+            os.killpg(self._process.pid, sig)
+        except ProcessLookupError:
+            pass
 
     async def run(self, command: str):
         """Execute a command in the bash shell."""
@@ -77,42 +88,66 @@ class _BashSession:
         )
         await self._process.stdin.drain()
 
-        # read output from the process, until the sentinel is found
+        # read output from the process until the sentinel is found, moving it
+        # into bounded collectors as it arrives
+        stdout = OutputCollector(self._output_limit, name="bash")
+        stderr = OutputCollector(self._output_limit, name="bash-stderr")
+        sentinel = self._sentinel.encode()
+        pending = b""
+        timeout = clamp_timeout(self._timeout)
         try:
-            async with asyncio.timeout(self._timeout):
+            async with asyncio.timeout(timeout):
                 while True:
-                    await asyncio.sleep(self._output_delay)
                     # if we read directly from stdout/stderr, it will wait forever for
                     # EOF. use the StreamReader buffer directly instead.
-                    output = (
-                        self._process.stdout._buffer.decode()
-                    )  # pyright: ignore[reportAttributeAccessIssue]
-                    if self._sentinel in output:
+                    chunk = _drain(self._process.stdout)
+                    errors = _drain(self._process.stderr)
+                    stderr.write(errors)
+                    pending += chunk
+                    if sentinel in pending:
                         # strip the sentinel and break
-                        output = output[: output.index(self._sentinel)]
+                        stdout.write(pending[: pending.index(sentinel)])
+                        stderr.write(_drain(self._process.stderr))
                         break
+                    # hold back what may be the start of the sentinel
+                    keep = len(sentinel) - 1
+                    stdout.write(pending[:-keep])
+                    pending = pending[-keep:]
+                    if not chunk and not errors:
+                        await asyncio.sleep(self._output_delay)
         except asyncio.TimeoutError:
             self._timed_out = True
+            self._kill()
             raise ToolError(
-                f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
+                f"timed out: bash has not returned in {timeout:g} seconds and must be restarted",
             ) from None
-
+        except asyncio.CancelledError:
+            # Don't leave the command running after its run was cancelled
+            self._kill()
+            raise
+        finally:
+            stdout.close()
+            stderr.close()
+
+        output = stdout.text()
         if output.endswith("\n"):
             output = output[:-1]
-
-        error = (
-            self._process.stderr._buffer.decode()
-        )  # pyright: ignore[reportAttributeAccessIssue]
+        error = stderr.text()
         if error.endswith("\n"):
             error = error[:-1]
 
-        # clear the buffers so that the next output can be read correctly
-        self._process.stdout._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-        self._process.stderr._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-
         return CLIResult(output=output, error=error)
 
 
+def _drain(reader: asyncio.StreamReader) -> bytes:
+    """Take what is buffered in `reader` without waiting for more."""
+    data = bytes(reader._buffer)  # pyright: ignore[reportAttributeAccessIssue]
+    reader._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
+    # the pipe is no longer read while the buffer is full; resume it
+    reader._maybe_resume_transport()  # pyright: ignore[reportAttributeAccessIssue]
+    return data
+
+
 class Bash(BaseTool):
     """A tool for executing bash commands"""
 
@@ -151,6 +186,12 @@ class Bash(BaseTool):
 
         raise ToolError("no command provided.")
 
+    async def cleanup(self):
+        """Stop the bash session and the processes it started."""
+        if self._session is not None:
+            self._session.stop()
+            self._session = None
+
 
 if __name__ == "__main__":
     bash = Bash()
@@ -1,6 +1,7 @@
 import asyncio
+import hashlib
 import json
-from typing import Generic, Optional, TypeVar
+from typing import Any, Dict, Generic, Optional, TypeVar
 
 from browser_use import Browser as BrowserUseBrowser
 from browser_use import BrowserConfig
@@ -48,6 +49,39 @@ Utility:
 Context = TypeVar("Context")
 
 
+def create_browser() -> BrowserUseBrowser:
+    """Create a browser configured from `config.browser_config`."""
+    browser_config_kwargs = {"headless": False, "disable_security": True}
+
+    if config.browser_config:
+        from browser_use.browser.browser import ProxySettings
+
+        # handle proxy settings.
+        if config.browser_config.proxy and config.browser_config.proxy.server:
+            browser_config_kwargs["proxy"] = ProxySettings(
+                server=config.browser_config.proxy.server,
+                username=config.browser_config.proxy.username,
+                password=config.browser_config.proxy.password,
+            )
+
+        browser_attrs = [
+            "headless",
+            "disable_security",
+            "extra_chromium_args",
+            "chrome_instance_path",
+            "wss_url",
+            "cdp_url",
+        ]
+
+        for attr in browser_attrs:
+            value = getattr(config.browser_config, attr, None)
+            if value is not None:
+                if not isinstance(value, list) or value:
+                    browser_config_kwargs[attr] = value
+
+    return BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
+
+
 class BrowserUseTool(BaseTool, Generic[Context]):
     name: str = "browser_use"
     description: str = _BROWSER_DESCRIPTION
@@ -133,8 +167,12 @@ class BrowserUseTool(BaseTool, Generic[Context]):
         },
     }
 
+    # Only `extract_content` is cached, see `cache_validator`
+    cache_ttl: Optional[float] = 300
     lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
     browser: Optional[BrowserUseBrowser] = Field(default=None, exclude=True)
+    # False when the browser is shared and only this tool's context is private
+    owns_browser: bool = Field(default=True, exclude=True)
     context: Optional[BrowserContext] = Field(default=None, exclude=True)
     dom_service: Optional[DomService] = Field(default=None, exclude=True)
     web_search_tool: WebSearch = Field(default_factory=WebSearch, exclude=True)
@@ -153,35 +191,7 @@ class BrowserUseTool(BaseTool, Generic[Context]):
     async def _ensure_browser_initialized(self) -> BrowserContext:
         """Ensure browser and context are initialized."""
         if self.browser is None:
-            browser_config_kwargs = {"headless": False, "disable_security": True}
-
-            if config.browser_config:
-                from browser_use.browser.browser import ProxySettings
-
-                # handle proxy settings.
-                if config.browser_config.proxy and config.browser_config.proxy.server:
-                    browser_config_kwargs["proxy"] = ProxySettings(
-                        server=config.browser_config.proxy.server,
-                        username=config.browser_config.proxy.username,
-                        password=config.browser_config.proxy.password,
-                    )
-
-                browser_attrs = [
-                    "headless",
-                    "disable_security",
-                    "extra_chromium_args",
-                    "chrome_instance_path",
-                    "wss_url",
-                    "cdp_url",
-                ]
-
-                for attr in browser_attrs:
-                    value = getattr(config.browser_config, attr, None)
-                    if value is not None:
-                        if not isinstance(value, list) or value:
-                            browser_config_kwargs[attr] = value
-
-            self.browser = BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
+            self.browser = create_browser()
 
         if self.context is None:
             context_config = BrowserContextConfig()
@@ -199,6 +209,18 @@ class BrowserUseTool(BaseTool, Generic[Context]):
 
         return self.context
 
+    async def cache_validator(self, tool_input: Dict[str, Any]) -> Optional[str]:
+        """Extractions are reused while the page's URL and DOM are unchanged."""
+        if tool_input.get("action") != "extract_content" or self.context is None:
+            return None
+        try:
+            async with self.lock:
+                page = await self.context.get_current_page()
+                html = await page.content()
+        except Exception:
+            return None
+        return f"{page.url}:{hashlib.sha256(html.encode()).hexdigest()}"
+
     async def execute(
         self,
         action: str,
@@ -590,7 +612,9 @@ Page content:
                 self.context = None
                 self.dom_service = None
             if self.browser is not None:
-                await self.browser.close()
+                # A shared browser is closed by its owner, not by each tool
+                if self.owns_browser:
+                    await self.browser.close()
                 self.browser = None
 
     def __del__(self):
@@ -1,8 +1,10 @@
+import asyncio
 import multiprocessing
 import sys
 from io import StringIO
 from typing import Dict
 
+from app.deadline import clamp_timeout
 from app.tool.base import BaseTool
 
 
@@ -62,14 +64,21 @@ class PythonExecute(BaseTool):
                 target=self._run_code, args=(code, result, safe_globals)
             )
             proc.start()
-            proc.join(timeout)
-
-            # timeout process
-            if proc.is_alive():
-                proc.terminate()
-                proc.join(1)
+            timeout = clamp_timeout(timeout)
+            try:
+                # Wait off the event loop so that the run can still be cancelled
+                await asyncio.to_thread(proc.join, timeout)
+                timed_out = proc.is_alive()
+            finally:
+                # Stop the process on timeout and when the wait is cancelled
+                if proc.is_alive():
+                    proc.terminate()
+                    proc.join(1)
+                    if proc.is_alive():
+                        proc.kill()
+            if timed_out:
                 return {
-                    "observation": f"Execution timeout after {timeout} seconds",
+                    "observation": f"Execution timeout after {timeout:g} seconds",
                     "success": False,
                 }
             return dict(result)
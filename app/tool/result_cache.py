@@ -0,0 +1,64 @@
+"""Reuse of results of repeated, idempotent tool calls.
+
+Agents often repeat a call they already made: the same web search, a `view`
+of a file they have not changed, or content extraction from a page that is
+still the same. Tools opt in by setting `cache_ttl`; `ToolCollection` then
+answers identical calls (same tool, same normalized arguments) from this
+cache for up to `cache_ttl` seconds. A result is only reused while the
+tool's `cache_validator` fingerprint of the state it was computed from
+(e.g. a file's mtime, a page's URL and DOM hash) is unchanged.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class ToolResultCache:
+    """An LRU of tool results with per-entry expiry and validator."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(name: str, tool_input: Dict[str, Any]) -> str:
+        """Key of a call, ignoring argument order, None values and outer spaces."""
+        arguments = json.dumps(
+            _normalize(tool_input or {}), sort_keys=True, default=str
+        )
+        return f"{name}:{arguments}"
+
+    def get(self, key: str, validator: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, cached_validator, result = entry
+            if time.monotonic() < expires_at and cached_validator == validator:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, validator: str, result: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, validator, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -1,8 +1,10 @@
 """File and directory manipulation tool with sandbox support."""
 
+import os
 from collections import defaultdict
 from pathlib import Path
-from typing import Any, DefaultDict, List, Literal, Optional, get_args
+from stat import S_ISREG
+from typing import Any, DefaultDict, Dict, List, Literal, Optional, get_args
 
 from app.config import config
 from app.exceptions import ToolError
@@ -98,10 +100,28 @@ class StrReplaceEditor(BaseTool):
         },
         "required": ["command", "path"],
     }
+    cache_ttl: Optional[float] = 300
     _file_history: DefaultDict[PathLike, List[str]] = defaultdict(list)
     _local_operator: LocalFileOperator = LocalFileOperator()
     _sandbox_operator: SandboxFileOperator = SandboxFileOperator()
 
+    def is_concurrency_safe(self, tool_input: Dict[str, Any]) -> bool:
+        """Only `view` is read-only; edits stay ordered with other calls."""
+        return tool_input.get("command") == "view"
+
+    async def cache_validator(self, tool_input: Dict[str, Any]) -> Optional[str]:
+        """Views of a local file are reused until the file is modified."""
+        if tool_input.get("command") != "view" or config.sandbox.use_sandbox:
+            return None
+        try:
+            stat = os.stat(tool_input.get("path", ""))
+        except OSError:
+            return None
+        # Directory listings also depend on nested files; don't cache them
+        if not S_ISREG(stat.st_mode):
+            return None
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
     # def _get_operator(self, use_sandbox: bool) -> FileOperator:
     def _get_operator(self) -> FileOperator:
         """Get the appropriate file operator based on execution mode."""
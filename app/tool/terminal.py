@@ -1,8 +1,13 @@
 import asyncio
 import os
 import shlex
+import signal
 from typing import Optional
 
+from pydantic import Field
+
+from app.deadline import clamp_timeout
+from app.output_collector import DEFAULT_OUTPUT_LIMIT, OutputCollector
 from app.tool.base import BaseTool, CLIResult
 
 
@@ -27,7 +32,9 @@ Note: You MUST append a `sleep 0.05` to the end of the command for commands that
     }
     process: Optional[asyncio.subprocess.Process] = None
     current_path: str = os.getcwd()
-    lock: asyncio.Lock = asyncio.Lock()
+    # Output beyond this many bytes per stream is saved to a workspace file
+    max_output: int = DEFAULT_OUTPUT_LIMIT
+    lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
 
     async def execute(self, command: str) -> CLIResult:
         """
@@ -57,12 +64,35 @@ Note: You MUST append a `sleep 0.05` to the end of the command for commands that
                             stdout=asyncio.subprocess.PIPE,
                             stderr=asyncio.subprocess.PIPE,
                             cwd=self.current_path,
+                            start_new_session=True,
+                        )
+                        stdout = OutputCollector(self.max_output, name="terminal")
+                        stderr = OutputCollector(
+                            self.max_output, name="terminal-stderr"
                         )
-                        stdout, stderr = await self.process.communicate()
+                        try:
+                            await asyncio.wait_for(
+                                asyncio.gather(
+                                    stdout.consume(self.process.stdout),
+                                    stderr.consume(self.process.stderr),
+                                    self.process.wait(),
+                                ),
+                                clamp_timeout(None),
+                            )
+                        finally:
+                            stdout.close()
+                            stderr.close()
                         result = CLIResult(
-                            output=stdout.decode().strip(),
-                            error=stderr.decode().strip(),
+                            output=stdout.text().strip(),
+                            error=stderr.text().strip(),
                         )
+                    except asyncio.TimeoutError:
+                        self._kill_process()
+                        result = CLIResult(output="", error="Command timed out")
+                    except asyncio.CancelledError:
+                        # Don't leave the command running after its run was cancelled
+                        self._kill_process()
+                        raise
                     except Exception as e:
                         result = CLIResult(output="", error=str(e))
                     finally:
@@ -83,6 +113,15 @@ Note: You MUST append a `sleep 0.05` to the end of the command for commands that
         final_output.error = final_output.error.rstrip()
         return final_output
 
+    def _kill_process(self) -> None:
+        if self.process is None or self.process.returncode is not None:
+            return
+        try:
+            # The command runs in its own session; stop its children too
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
     async def execute_in_env(self, env_name: str, command: str) -> CLIResult:
         """
         Execute a terminal command asynchronously within a specified Conda environment.
@@ -173,6 +212,9 @@ Note: You MUST append a `sleep 0.05` to the end of the command for commands that
                 finally:
                     self.process = None
 
+    async def cleanup(self):
+        await self.close()
+
     async def __aenter__(self):
         """Enter the asynchronous context manager."""
         return self
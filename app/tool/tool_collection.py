@@ -1,8 +1,11 @@
 """Collection classes for managing multiple tools."""
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
+from app.deadline import check_deadline
 from app.exceptions import ToolError
+from app.logger import logger
 from app.tool.base import BaseTool, ToolFailure, ToolResult
+from app.tool.result_cache import ToolResultCache
 
 
 class ToolCollection:
@@ -11,12 +14,40 @@ class ToolCollection:
     def __init__(self, *tools: BaseTool):
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
+        self._version = 0
+        self._params: Optional[List[Dict[str, Any]]] = None
+        self._params_tokens: Dict[Callable[[str], int], int] = {}
+        # Results of calls to tools that opt in through `cache_ttl`
+        self.result_cache = ToolResultCache()
 
     def __iter__(self):
         return iter(self.tools)
 
+    @property
+    def version(self) -> int:
+        """Incremented whenever the set of tools changes."""
+        return self._version
+
+    def _invalidate(self) -> None:
+        self._version += 1
+        self._params = None
+        self._params_tokens.clear()
+        # A replaced tool must not answer with its predecessor's results
+        self.result_cache.clear()
+
     def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+        """Return the function-call schemas, built once per tool set version."""
+        if self._params is None:
+            self._params = [tool.to_param() for tool in self.tools]
+        return list(self._params)
+
+    def params_token_cost(self, count_tokens: Callable[[str], int]) -> int:
+        """Token cost of the tool schemas, cached per counter and tool set version."""
+        if count_tokens not in self._params_tokens:
+            self._params_tokens[count_tokens] = sum(
+                count_tokens(str(param)) for param in self.to_params()
+            )
+        return self._params_tokens[count_tokens]
 
     async def execute(
         self, *, name: str, tool_input: Dict[str, Any] = None
@@ -24,11 +55,27 @@ class ToolCollection:
         tool = self.tool_map.get(name)
         if not tool:
             return ToolFailure(error=f"Tool {name} is invalid")
+        # Don't start tools once the run is out of time; running ones clamp
+        # their own timeouts to the time remaining
+        check_deadline()
+
+        key = validator = None
+        if tool.cache_ttl is not None:
+            validator = await tool.cache_validator(tool_input or {})
+            if validator is not None:
+                key = self.result_cache.key(name, tool_input)
+                cached = self.result_cache.get(key, validator)
+                if cached is not None:
+                    logger.debug(f"Reusing cached result of tool '{name}'")
+                    return cached
         try:
             result = await tool(**tool_input)
-            return result
         except ToolError as e:
             return ToolFailure(error=e.message)
+        # Failures are not cached; the next identical call tries again
+        if key is not None and result and not getattr(result, "error", None):
+            self.result_cache.put(key, validator, result, tool.cache_ttl)
+        return result
 
     async def execute_all(self) -> List[ToolResult]:
         """Execute all tools in the collection sequentially."""
@@ -45,8 +92,10 @@ class ToolCollection:
         return self.tool_map.get(name)
 
     def add_tool(self, tool: BaseTool):
-        self.tools += (tool,)
+        """Add `tool`, replacing any tool of the same name."""
+        self.tools = tuple(t for t in self.tools if t.name != tool.name) + (tool,)
         self.tool_map[tool.name] = tool
+        self._invalidate()
         return self
 
     def add_tools(self, *tools: BaseTool):
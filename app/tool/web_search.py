@@ -1,5 +1,5 @@
 import asyncio
-from typing import List
+from typing import List, Optional
 
 from tenacity import retry, stop_after_attempt, wait_exponential
 
@@ -16,6 +16,8 @@ from app.tool.search import (
 
 class WebSearch(BaseTool):
     name: str = "web_search"
+    concurrency_safe: bool = True
+    cache_ttl: Optional[float] = 600
     description: str = """Perform a web search and return a list of relevant links.
     This function attempts to use the primary search engine API to get up-to-date results.
     If an error occurs, it falls back to an alternative search engine."""
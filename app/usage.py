@@ -0,0 +1,132 @@
+"""Token usage accounting scoped to runs.
+
+`LLM` instances are shared per config name, so usage and budgets cannot live
+on them once several tasks run in one process. Instead every completion is
+recorded against the `UsageScope` active in the current context (and all of
+its parents), plus the process-wide aggregate `process_usage`. Scopes follow
+asyncio tasks through `contextvars`, so tool calls and background requests
+spawned by a run are charged to that run.
+
+    with usage_scope("task-42", max_input_tokens=200_000) as usage:
+        await agent.run(prompt)
+    print(usage.input_tokens, usage.completion_tokens)
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+
+class UsageScope:
+    """Token totals and an optional budget for one run."""
+
+    def __init__(
+        self,
+        name: str,
+        max_input_tokens: Optional[int] = None,
+        parent: Optional["UsageScope"] = None,
+    ):
+        self.name = name
+        self.max_input_tokens = max_input_tokens
+        self.parent = parent
+        self.input_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+        self.by_config: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.completion_tokens
+
+    def chain(self) -> List["UsageScope"]:
+        """This scope followed by its ancestors."""
+        scopes, scope = [], self
+        while scope is not None:
+            scopes.append(scope)
+            scope = scope.parent
+        return scopes
+
+    @property
+    def run(self) -> "UsageScope":
+        """The outermost scope below the process aggregate."""
+        return [s for s in self.chain() if s is not process_usage][-1]
+
+    def config_input_tokens(self, config_name: str) -> int:
+        return self.by_config.get(config_name, {}).get("input_tokens", 0)
+
+    def record(
+        self, config_name: str, input_tokens: int, completion_tokens: int = 0
+    ) -> None:
+        """Charge usage to this scope and every enclosing scope."""
+        for scope in self.chain():
+            scope.input_tokens += input_tokens
+            scope.completion_tokens += completion_tokens
+            if input_tokens:
+                scope.requests += 1
+            per_config = scope.by_config.setdefault(
+                config_name, {"input_tokens": 0, "completion_tokens": 0}
+            )
+            per_config["input_tokens"] += input_tokens
+            per_config["completion_tokens"] += completion_tokens
+
+    def budget_error(self, input_tokens: int) -> Optional[str]:
+        """Describe the first budget in the chain `input_tokens` would exceed."""
+        for scope in self.chain():
+            limit = scope.max_input_tokens
+            if limit is not None and scope.input_tokens + input_tokens > limit:
+                return (
+                    f"Request may exceed input token budget of '{scope.name}' "
+                    f"(Current: {scope.input_tokens}, Needed: {input_tokens}, Max: {limit})"
+                )
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "input_tokens": self.input_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "requests": self.requests,
+            "by_config": {k: dict(v) for k, v in self.by_config.items()},
+        }
+
+
+# Aggregate of every request made by this process
+process_usage = UsageScope("process")
+
+_current_scope: ContextVar[Optional[UsageScope]] = ContextVar(
+    "usage_scope", default=None
+)
+
+
+def current_usage() -> Optional[UsageScope]:
+    """The innermost usage scope of the current context, if any."""
+    return _current_scope.get()
+
+
+@contextmanager
+def usage_scope(
+    name: str, max_input_tokens: Optional[int] = None
+) -> Iterator[UsageScope]:
+    """Open a usage scope nested in the current one for the enclosed code."""
+    scope = UsageScope(
+        name,
+        max_input_tokens=max_input_tokens,
+        parent=current_usage() or process_usage,
+    )
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+@contextmanager
+def run_usage_scope(name: str) -> Iterator[UsageScope]:
+    """Join the active usage scope, or open a new one for a top-level run."""
+    scope = current_usage()
+    if scope is not None:
+        yield scope
+        return
+    with usage_scope(name) as scope:
+        yield scope
@@ -1,12 +1,22 @@
+import argparse
 import asyncio
 
 from app.agent.manus import Manus
+from app.http_client import close_http_clients
+from app.journal import Journal
 from app.logger import logger
 
 
-async def main():
-    agent = Manus()
+async def main(journal_path: str = None, resume: bool = False):
+    journal = Journal(journal_path) if journal_path else None
+    agent = Manus(journal=journal)
     try:
+        if resume and journal and journal.restore_agent(agent):
+            logger.warning("Resuming the journaled run...")
+            await agent.run()
+            logger.info("Request processing completed.")
+            return
+
         prompt = input("Enter your prompt: ")
         if not prompt.strip():
             logger.warning("Empty prompt provided.")
@@ -17,7 +27,15 @@ async def main():
         logger.info("Request processing completed.")
     except KeyboardInterrupt:
         logger.warning("Operation interrupted.")
+    finally:
+        await close_http_clients()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Run the Manus agent")
+    parser.add_argument("--journal", help="Record each step to this journal file")
+    parser.add_argument(
+        "--resume", action="store_true", help="Resume the run recorded in --journal"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.journal, args.resume))
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+
+from app.batch import BatchRunner, load_tasks
+from app.http_client import close_http_clients
+from app.logger import logger
+
+
+async def run_batch(args: argparse.Namespace):
+    tasks = load_tasks(args.tasks)
+    if not tasks:
+        logger.warning("No tasks found.")
+        return
+
+    logger.warning(f"Running {len(tasks)} tasks, {args.concurrency} at a time...")
+    runner = BatchRunner(concurrency=args.concurrency, timeout=args.timeout)
+    try:
+        results = await runner.run(tasks, args.output)
+    finally:
+        await close_http_clients()
+    failed = [result.id for result in results if result.status != "completed"]
+    if failed:
+        logger.warning(f"Unsuccessful tasks: {', '.join(failed)}")
+    logger.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a JSONL file of tasks")
+    parser.add_argument(
+        "tasks", help='Task file, one {"id": ..., "prompt": ...} object per line'
+    )
+    parser.add_argument("--output", default="results.jsonl", help="Results file")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Number of agents run at once"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=3600, help="Time limit per task (seconds)"
+    )
+    asyncio.run(run_batch(parser.parse_args()))
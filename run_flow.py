@@ -1,40 +1,51 @@
+import argparse
 import asyncio
 import time
 
 from app.agent.manus import Manus
+from app.deadline import deadline_scope
+from app.exceptions import DeadlineExceeded
 from app.flow.base import FlowType
 from app.flow.flow_factory import FlowFactory
+from app.http_client import close_http_clients
+from app.journal import Journal
 from app.logger import logger
 
 
-async def run_flow():
+async def run_flow(journal_path: str = None, resume: bool = False):
     agents = {
         "manus": Manus(),
     }
 
     try:
-        prompt = input("Enter your prompt: ")
-
-        if prompt.strip().isspace() or not prompt:
-            logger.warning("Empty prompt provided.")
-            return
-
         flow = FlowFactory.create_flow(
             flow_type=FlowType.PLANNING,
             agents=agents,
+            journal=Journal(journal_path) if journal_path else None,
         )
+
+        if resume and flow.restore():
+            # The plan already exists; continue with its remaining steps
+            prompt = ""
+        else:
+            prompt = input("Enter your prompt: ")
+
+            if prompt.strip().isspace() or not prompt:
+                logger.warning("Empty prompt provided.")
+                return
+
         logger.warning("Processing your request...")
 
         try:
             start_time = time.time()
-            result = await asyncio.wait_for(
-                flow.execute(prompt),
-                timeout=3600,  # 60 minute timeout for the entire execution
-            )
+            # 60 minute deadline shared by every LLM call, tool and sandbox
+            # command of the flow; what is still running then is torn down
+            async with deadline_scope(3600):
+                result = await flow.execute(prompt)
             elapsed_time = time.time() - start_time
             logger.info(f"Request processed in {elapsed_time:.2f} seconds")
             logger.info(result)
-        except asyncio.TimeoutError:
+        except DeadlineExceeded:
             logger.error("Request processing timed out after 1 hour")
             logger.info(
                 "Operation terminated due to timeout. Please try a simpler request."
@@ -44,7 +55,15 @@ async def run_flow():
         logger.info("Operation cancelled by user.")
     except Exception as e:
         logger.error(f"Error: {str(e)}")
+    finally:
+        await close_http_clients()
 
 
 if __name__ == "__main__":
-    asyncio.run(run_flow())
+    parser = argparse.ArgumentParser(description="Run the planning flow")
+    parser.add_argument("--journal", help="Record plan and steps to this journal file")
+    parser.add_argument(
+        "--resume", action="store_true", help="Resume the flow recorded in --journal"
+    )
+    args = parser.parse_args()
+    asyncio.run(run_flow(args.journal, args.resume))
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from app.agent.swe import SWEAgent
+from app.agent.toolcall import ToolCallAgent
+from app.batch import BatchRunner, BatchTask, load_tasks
+from app.deadline import deadline_scope
+from app.sandbox.client import get_sandbox_client
+from app.tool import PlanningTool, StrReplaceEditor
+from app.tool.terminal import Terminal
+from app.usage import current_usage
+
+
+class FakeAgent:
+    """Stands in for an agent; records the sandbox client it ran with."""
+
+    running = 0
+    peak = 0
+
+    def __init__(self):
+        self.max_steps = 10
+        self.current_step = 0
+        self.sandbox = None
+
+    async def run(self, prompt: str, timeout: float = None) -> str:
+        FakeAgent.running += 1
+        FakeAgent.peak = max(FakeAgent.peak, FakeAgent.running)
+        try:
+            async with deadline_scope(timeout):
+                self.sandbox = get_sandbox_client()
+                current_usage().record("default", len(prompt), 1)
+                if prompt == "fail":
+                    raise RuntimeError("boom")
+                await asyncio.sleep(0.5 if prompt == "slow" else 0.01)
+                self.current_step = self.max_steps
+                return f"done: {prompt}"
+        finally:
+            FakeAgent.running -= 1
+
+    async def cleanup(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_tasks_run_concurrently_with_isolated_state(tmp_path):
+    agents = []
+
+    def factory():
+        agents.append(FakeAgent())
+        return agents[-1]
+
+    tasks = [BatchTask(id=str(i), prompt="x" * (i + 1)) for i in range(5)]
+    tasks.append(BatchTask(id="f", prompt="fail"))
+    tasks.append(BatchTask(id="s", prompt="slow", max_steps=3))
+    runner = BatchRunner(
+        concurrency=3, timeout=0.2, agent_factory=factory, share_browser=False
+    )
+
+    output = tmp_path / "results.jsonl"
+    results = await runner.run(tasks, output)
+
+    assert FakeAgent.peak == 3
+    assert [r.id for r in results] == [t.id for t in tasks]
+    assert [r.status for r in results] == ["completed"] * 5 + ["failed", "timeout"]
+    assert results[2].result == "done: xxx" and results[2].steps == 10
+    assert results[5].error == "boom"
+    # Each task has its own usage scope and sandbox client
+    assert [r.usage["input_tokens"] for r in results[:5]] == [1, 2, 3, 4, 5]
+    assert len({id(agent.sandbox) for agent in agents}) == len(tasks)
+
+    written = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["id"] for r in written) == sorted(t.id for t in tasks)
+
+
+def test_load_tasks(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text('{"prompt": "a"}\n\n{"id": 7, "prompt": "b", "max_steps": 2}\n')
+    tasks = load_tasks(path)
+    assert [(t.id, t.prompt, t.max_steps) for t in tasks] == [
+        ("1", "a", None),
+        ("7", "b", 2),
+    ]
+
+
+def test_concurrent_tasks_do_not_share_tool_state():
+    """Tests that state a task's tools keep is per instance."""
+    for agent_class in (ToolCallAgent, SWEAgent):
+        first, second = (agent_class.model_construct(llm=None) for _ in range(2))
+        assert first.available_tools is not second.available_tools
+    assert Terminal().lock is not Terminal().lock
+    # Mutable defaults that pydantic already copied per instance
+    assert StrReplaceEditor()._file_history is not StrReplaceEditor()._file_history
+    assert PlanningTool().plans is not PlanningTool().plans
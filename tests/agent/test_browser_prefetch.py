@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+import pytest
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+
+from app.agent.browser import BrowserAgent
+from app.agent.toolcall import ToolCallAgent
+from app.schema import Function, Memory, ToolCall
+from app.tool import ToolCollection
+from app.tool.base import BaseTool, ToolResult
+
+
+class FakeBrowser(BaseTool):
+    name: str = "browser_use"
+    description: str = "browser"
+
+    async def execute(self, **kwargs) -> ToolResult:
+        return ToolResult(output="clicked")
+
+
+class SlowTool(BaseTool):
+    name: str = "python_execute"
+    description: str = "slow"
+
+    async def execute(self, **kwargs) -> ToolResult:
+        await asyncio.sleep(0.05)
+        return ToolResult(output="done")
+
+
+def _call(i: int, name: str) -> ToolCall:
+    return ToolCall(id=f"call_{i}", function=Function(name=name, arguments="{}"))
+
+
+@pytest.mark.asyncio
+async def test_state_is_captured_while_later_tools_run():
+    agent = BrowserAgent.model_construct(
+        llm=None,
+        available_tools=ToolCollection(FakeBrowser(), SlowTool()),
+        special_tool_names=[],
+    )
+    captures = []
+
+    async def get_browser_state():
+        captures.append(asyncio.get_running_loop().time())
+        return {"url": f"https://example.com/{len(captures)}"}
+
+    object.__setattr__(agent, "get_browser_state", get_browser_state)
+    agent.tool_calls = [_call(0, "browser_use"), _call(1, "python_execute")]
+
+    start = asyncio.get_running_loop().time()
+    await agent._run_tool_calls(agent.tool_calls)
+    end = asyncio.get_running_loop().time()
+
+    # Captured once, right after the browser call and before the slow tool ended
+    assert len(captures) == 1 and captures[0] - start < end - start
+    assert await agent._next_browser_state() == {"url": "https://example.com/1"}
+
+    # Without a pending prefetch the state is captured on demand
+    assert await agent._next_browser_state() == {"url": "https://example.com/2"}
+
+
+def test_only_the_last_browser_call_prefetches():
+    agent = BrowserAgent.model_construct(llm=None, available_tools=ToolCollection())
+    agent.tool_calls = [_call(0, "browser_use"), _call(1, "browser_use")]
+    assert not agent._is_last_browser_call(agent.tool_calls[0])
+    assert agent._is_last_browser_call(agent.tool_calls[1])
+
+
+class BrowsingAgent(BrowserAgent):
+    """Clicks once per step, leaving a state capture pending."""
+
+    async def step(self) -> str:
+        self.tool_calls = [_call(self.current_step, "browser_use")]
+        await self._run_tool_calls(self.tool_calls)
+        return "clicked"
+
+
+def _slow_state_agent(**kwargs) -> BrowserAgent:
+    agent = BrowsingAgent.model_construct(
+        llm=None,
+        available_tools=ToolCollection(FakeBrowser()),
+        special_tool_names=[],
+        **kwargs,
+    )
+
+    async def get_browser_state():
+        await asyncio.sleep(10)
+
+    object.__setattr__(agent, "get_browser_state", get_browser_state)
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_prefetch_is_cancelled_when_run_reaches_max_steps():
+    agent = _slow_state_agent(max_steps=1)
+    tasks = []
+    start_prefetch = agent._start_state_prefetch
+
+    def record_prefetch():
+        start_prefetch()
+        tasks.append(agent._browser_state_task)
+
+    object.__setattr__(agent, "_start_state_prefetch", record_prefetch)
+
+    result = await agent.run("browse")
+    assert "Reached max steps" in result
+    await asyncio.sleep(0)
+    assert len(tasks) == 1 and tasks[0].cancelled()
+    assert agent._browser_state_task is None
+
+
+@pytest.mark.asyncio
+async def test_prefetch_is_cancelled_on_cleanup():
+    agent = _slow_state_agent()
+    agent._start_state_prefetch()
+    task = agent._browser_state_task
+
+    await agent.cleanup()
+    await asyncio.sleep(0)
+    assert task.cancelled() and agent._browser_state_task is None
+
+
+class StreamingLLM:
+    """Streams a browser call and then, a little later, a slow tool call."""
+
+    def __init__(self):
+        self.calls = [
+            ChatCompletionMessageToolCall(
+                id=f"call_{i}",
+                type="function",
+                function={"name": name, "arguments": json.dumps({})},
+            )
+            for i, name in enumerate(["browser_use", "python_execute"])
+        ]
+
+    def count_tokens(self, text: str) -> int:
+        return 0
+
+    async def ask_tool_stream(self, on_tool_call=None, **request):
+        for call in self.calls:
+            await on_tool_call(call)
+            await asyncio.sleep(0.02)
+        return ChatCompletionMessage(
+            role="assistant", content=None, tool_calls=self.calls
+        )
+
+
+@pytest.mark.asyncio
+async def test_streamed_browser_call_prefetches_state():
+    agent = BrowserAgent.model_construct(
+        llm=StreamingLLM(),
+        memory=Memory(),
+        available_tools=ToolCollection(FakeBrowser(), SlowTool()),
+        special_tool_names=[],
+        stream_tool_calls=True,
+        next_step_prompt=None,
+        # Left over from an earlier step
+        tool_calls=[_call(9, "browser_use")],
+    )
+    captures = []
+
+    async def get_browser_state():
+        captures.append(asyncio.get_running_loop().time())
+        return {"url": "https://example.com/"}
+
+    object.__setattr__(agent, "get_browser_state", get_browser_state)
+
+    assert await ToolCallAgent.think(agent)
+    # Captured while the response was still streaming
+    assert len(captures) == 1
+    await agent.act()
+    assert len(captures) == 1
+    assert await agent._next_browser_state() == {"url": "https://example.com/"}
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from app.agent.compaction import ContextCompactor
+from app.agent.toolcall import ToolCallAgent
+from app.config import CompactionSettings
+from app.schema import AgentState, Function, Memory, Message, ToolCall
+
+
+class SummaryLLM:
+    """Stands in for `LLM`, answering every summary request after a delay."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.prompts = []
+
+    def remaining_input_tokens(self):
+        return None
+
+    async def ask(self, messages, system_msgs=None, stream=False):
+        self.prompts.append(messages[0].content)
+        await asyncio.sleep(self.delay)
+        return "the story so far"
+
+
+def _tool_round(i: int):
+    call = ToolCall(id=f"call_{i}", function=Function(name="bash", arguments="{}"))
+    return [
+        Message.user_message(f"step {i}"),
+        Message.from_tool_calls([call], content=f"thinking {i}"),
+        Message.tool_message(f"output {i}", name="bash", tool_call_id=f"call_{i}"),
+    ]
+
+
+def _memory(rounds: int) -> Memory:
+    memory = Memory()
+    memory.set_token_counter(lambda message: 10)
+    memory.add_message(Message.user_message("the task"))
+    for i in range(rounds):
+        memory.add_messages(_tool_round(i))
+    return memory
+
+
+def test_span_keeps_task_and_tool_pairs():
+    """Tests that the span skips the task and never splits a tool call."""
+    memory = _memory(4)
+    compactor = ContextCompactor(SummaryLLM(), CompactionSettings(keep_recent=2))
+
+    span = compactor.select_span(memory.messages)
+    assert span[0] is memory.messages[1]
+    # keep_recent=2 would start the kept tail at a tool result; it moves back
+    kept = memory.messages[1 + len(span) :]
+    assert kept[0].role != "tool"
+    assert kept[0].tool_calls and kept[1].tool_call_id == kept[0].tool_calls[0].id
+
+
+@pytest.mark.asyncio
+async def test_background_summary_replaces_span():
+    memory = _memory(4)
+    settings = CompactionSettings(enabled=True, context_tokens=150, keep_recent=3)
+    compactor = ContextCompactor(SummaryLLM(delay=0.01), settings)
+
+    assert compactor.maybe_start(memory)
+    assert not await compactor.apply(memory)  # still running, memory fits
+
+    await asyncio.sleep(0.05)
+    assert await compactor.apply(memory)
+    assert [m.role for m in memory.messages] == [
+        "user",
+        "user",
+        "user",
+        "assistant",
+        "tool",
+    ]
+    assert "the story so far" in memory.messages[1].content
+    assert memory.token_count == 50
+
+
+@pytest.mark.asyncio
+async def test_summary_is_discarded_if_span_was_evicted():
+    memory = _memory(4)
+    settings = CompactionSettings(enabled=True, context_tokens=150, keep_recent=3)
+    compactor = ContextCompactor(SummaryLLM(), settings)
+    assert compactor.maybe_start(memory)
+
+    memory.messages = memory.messages[5:]
+    await asyncio.sleep(0.01)
+    assert not await compactor.apply(memory)
+    assert not compactor.running
+
+
+def test_span_stops_at_pinned_message():
+    memory = _memory(4)
+    pinned = memory.messages[4]
+    memory.pin(pinned)
+    compactor = ContextCompactor(SummaryLLM(), CompactionSettings(keep_recent=2))
+
+    span = compactor.select_span(memory.messages, memory.is_pinned)
+    assert span == memory.messages[1:4]
+
+
+class SummarizingAgent(ToolCallAgent):
+    """Starts a slow summary and finishes in the same step."""
+
+    async def step(self) -> str:
+        assert self.compactor.maybe_start(self.memory)
+        self.state = AgentState.FINISHED
+        return "done"
+
+
+@pytest.mark.asyncio
+async def test_unfinished_summary_is_cancelled_when_run_ends():
+    settings = CompactionSettings(enabled=True, context_tokens=150, keep_recent=3)
+    llm = SummaryLLM(delay=10)
+    agent = SummarizingAgent.model_construct(llm=llm, memory=_memory(4))
+    agent._compactor = ContextCompactor(llm, settings)
+
+    await agent.run()
+    assert not agent.compactor.running
+
+    # Also on cleanup, e.g. when the caller abandons a running agent
+    assert agent.compactor.maybe_start(agent.memory)
+    task = agent.compactor._task
+    await agent.cleanup()
+    await asyncio.sleep(0)
+    assert task.cancelled() and not agent.compactor.running
+
+
+@pytest.mark.asyncio
+async def test_summary_is_cancelled_when_llm_changes():
+    settings = CompactionSettings(enabled=True, context_tokens=150, keep_recent=3)
+    llm = SummaryLLM(delay=10)
+    agent = SummarizingAgent.model_construct(llm=llm, memory=_memory(4))
+    agent._compactor = ContextCompactor(llm, settings)
+    assert agent.compactor.maybe_start(agent.memory)
+    task = agent.compactor._task
+
+    agent.llm = SummaryLLM()
+    assert agent.compactor.llm is agent.llm
+    await asyncio.sleep(0)
+    assert task.cancelled()
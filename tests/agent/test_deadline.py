@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.agent.base import BaseAgent
+from app.agent.planning import PlanningAgent
+from app.deadline import clamp_timeout, current_deadline, deadline_scope
+from app.exceptions import DeadlineExceeded
+from app.schema import AgentState, Memory
+from app.tool import ToolCollection
+from app.tool.bash import Bash
+from app.tool.python_execute import PythonExecute
+from app.tool.terminate import Terminate
+
+
+class SlowAgent(BaseAgent):
+    name: str = "slow"
+    cleaned_up: bool = False
+
+    async def step(self) -> str:
+        await asyncio.sleep(10)
+        return "done"
+
+    async def cleanup(self) -> None:
+        self.cleaned_up = True
+
+
+@pytest.mark.asyncio
+async def test_nested_scopes_keep_the_earliest_deadline():
+    assert clamp_timeout(30) == 30
+    async with deadline_scope(5) as outer:
+        assert clamp_timeout(30) <= 5
+        async with deadline_scope(60) as inner:
+            assert inner is outer
+        async with deadline_scope(1) as inner:
+            assert current_deadline() is inner and clamp_timeout(None) <= 1
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+@pytest.mark.asyncio
+async def test_agent_run_is_cancelled_and_cleaned_up_at_deadline():
+    agent = SlowAgent.model_construct(llm=None, memory=Memory())
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await agent.run("task", timeout=0.1)
+    assert time.monotonic() - start < 2
+    assert agent.cleaned_up
+    assert agent.state == AgentState.IDLE
+
+
+class SlowPlanningAgent(PlanningAgent):
+    async def create_initial_plan(self, request: str) -> None:
+        await asyncio.sleep(10)
+
+
+@pytest.mark.asyncio
+async def test_planning_agent_run_accepts_a_timeout():
+    """Tests that the time budget also covers creating the plan."""
+    agent = SlowPlanningAgent.model_construct(llm=None, memory=Memory())
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await agent.run("task", timeout=0.1)
+    assert time.monotonic() - start < 2
+
+
+@pytest.mark.asyncio
+async def test_tools_are_not_started_after_the_deadline():
+    tools = ToolCollection(Terminate())
+    async with deadline_scope(0.05):
+        time.sleep(0.06)  # no await, so the scope has no chance to cancel
+        with pytest.raises(DeadlineExceeded):
+            await tools.execute(name="terminate", tool_input={"status": "success"})
+
+
+@pytest.mark.asyncio
+async def test_cancelled_bash_command_kills_its_processes(tmp_path):
+    pid_file = tmp_path / "pid"
+    bash = Bash()
+    with pytest.raises(DeadlineExceeded):
+        async with deadline_scope(1):
+            await bash.execute(f"sleep 30 & echo $! > {pid_file}; wait")
+    stat = f"/proc/{pid_file.read_text().strip()}/stat"
+    for _ in range(20):
+        # Killed processes may linger as zombies until they are reaped
+        if not os.path.exists(stat) or open(stat).read().split(") ")[1][0] == "Z":
+            break
+        await asyncio.sleep(0.05)
+    else:
+        pytest.fail("background process survived the cancelled command")
+
+
+@pytest.mark.asyncio
+async def test_python_execute_can_be_cancelled():
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        async with deadline_scope(0.5):
+            await PythonExecute().execute("while True: pass", timeout=30)
+    assert time.monotonic() - start < 5
@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+
+from app.agent.toolcall import ToolCallAgent
+from app.schema import Memory
+from app.tool import ToolCollection
+from app.tool.base import BaseTool, ToolResult
+
+
+class StepTool(BaseTool):
+    """Records when each call starts and ends."""
+
+    name: str = "step"
+    description: str = "step"
+    events: list = []
+
+    async def execute(self, label: str, delay: float = 0.0) -> ToolResult:
+        self.events.append(("start", label))
+        await asyncio.sleep(delay)
+        self.events.append(("end", label))
+        return ToolResult(output=label)
+
+
+def _call(i: int, **args) -> ChatCompletionMessageToolCall:
+    return ChatCompletionMessageToolCall(
+        id=f"call_{i}",
+        type="function",
+        function={"name": "step", "arguments": json.dumps(args)},
+    )
+
+
+class StreamingLLM:
+    """Streams `calls`, optionally failing after `fail_after` of them."""
+
+    def __init__(self, calls, fail_after=None, error=RuntimeError("stream broke")):
+        self.calls = calls
+        self.fail_after = fail_after
+        self.error = error
+        self.unstreamed = 0
+
+    def count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    async def ask_tool_stream(self, on_tool_call=None, **request):
+        for i, call in enumerate(self.calls):
+            if i == self.fail_after:
+                raise self.error
+            await on_tool_call(call)
+            # The model is still emitting later calls
+            await asyncio.sleep(0.02)
+        if self.fail_after == len(self.calls):
+            raise self.error
+        return ChatCompletionMessage(
+            role="assistant", content=None, tool_calls=self.calls
+        )
+
+    async def ask_tool(self, **request):
+        self.unstreamed += 1
+        return ChatCompletionMessage(
+            role="assistant", content=None, tool_calls=self.calls
+        )
+
+
+def _agent(llm: StreamingLLM) -> ToolCallAgent:
+    return ToolCallAgent.model_construct(
+        llm=llm,
+        memory=Memory(),
+        available_tools=ToolCollection(StepTool()),
+        special_tool_names=[],
+        stream_tool_calls=True,
+        next_step_prompt=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_streamed_calls_start_early_and_finish_in_order():
+    calls = [_call(0, label="a", delay=0.05), _call(1, label="b")]
+    agent = _agent(StreamingLLM(calls))
+    events = agent.available_tools.get_tool("step").events
+
+    assert await agent.think()
+    # The first call ran while the response was still streaming
+    assert ("start", "a") in events
+    await agent.act()
+
+    assert events == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+    assert [m.content for m in agent.memory.messages[-2:]] == [
+        "Observed output of cmd `step` executed:\na",
+        "Observed output of cmd `step` executed:\nb",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_failure_before_dispatch_falls_back_to_ask_tool():
+    llm = StreamingLLM([_call(0, label="a")], fail_after=0)
+    agent = _agent(llm)
+
+    assert await agent.think()
+    assert llm.unstreamed == 1
+    await agent.act()
+    assert agent.available_tools.get_tool("step").events == [
+        ("start", "a"),
+        ("end", "a"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_failure_after_dispatch_cancels_started_calls():
+    llm = StreamingLLM([_call(0, label="a", delay=10), _call(1)], fail_after=1)
+    agent = _agent(llm)
+    events = agent.available_tools.get_tool("step").events
+
+    with pytest.raises(RuntimeError):
+        await agent.think()
+    await asyncio.sleep(0)
+    assert events == [("start", "a")] and llm.unstreamed == 0
+    assert agent._early_tool_tasks is None
+
+
+@pytest.mark.asyncio
+async def test_unconsumed_early_calls_are_cancelled_with_the_run():
+    agent = _agent(StreamingLLM([]))
+    agent._early_tool_tasks = {}
+    await agent._dispatch_tool_call(_call(0, label="a", delay=10))
+    task = agent._early_tool_tasks["call_0"]
+
+    agent.cancel_background_tasks()
+    await asyncio.sleep(0)
+    assert task.cancelled()
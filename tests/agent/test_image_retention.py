@@ -0,0 +1,40 @@
+import pytest
+
+from app.agent.images import ImageRetention
+from app.blob_store import BlobStore
+from app.config import ImageStoreSettings
+from app.schema import Memory, Message
+
+
+@pytest.mark.asyncio
+async def test_old_images_are_dropped():
+    """Tests that only images from the last `keep_recent_steps` steps remain."""
+    retention = ImageRetention(
+        ImageStoreSettings(keep_recent_steps=2), BlobStore(max_memory_bytes=1024)
+    )
+    memory = Memory()
+    memory.set_token_counter(lambda message: 100 if message.image_ref else 1)
+
+    for step in range(1, 5):
+        memory.add_message(
+            Message.user_message(f"screenshot {step}", base64_image=f"QUJD{step}")
+        )
+        await retention.apply(memory, step)
+
+    assert [m.image_ref is not None for m in memory.messages] == [
+        False,
+        False,
+        True,
+        True,
+    ]
+    assert [m.content for m in memory.messages][0] == "screenshot 1"
+    assert memory.token_count == 202
+
+
+@pytest.mark.asyncio
+async def test_disabled_by_default():
+    retention = ImageRetention(ImageStoreSettings(), BlobStore(max_memory_bytes=1024))
+    memory = Memory()
+    memory.add_message(Message.user_message("screenshot", base64_image="QUJD"))
+    assert await retention.apply(memory, 100) == 0
+    assert memory.messages[0].image_ref is not None
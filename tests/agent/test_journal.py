@@ -0,0 +1,149 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app import blob_store
+from app import journal as journal_module
+from app.blob_store import BlobStore
+from app.journal import Journal
+from app.logger import logger
+from app.schema import AgentState, Memory, Message
+
+
+def _agent(name: str = "manus", max_messages: int = 100):
+    return SimpleNamespace(
+        name=name,
+        memory=Memory(max_messages=max_messages),
+        current_step=0,
+        state=AgentState.RUNNING,
+    )
+
+
+def _step(agent, text: str):
+    agent.current_step += 1
+    agent.memory.add_message(Message.assistant_message(text))
+
+
+def _contents(agent):
+    return [m.content for m in agent.memory.messages]
+
+
+def test_resume_restores_memory_and_step(tmp_path):
+    """Tests that eviction and pins survive a journal round trip."""
+    journal = Journal(tmp_path / "run.jsonl", fsync=False)
+    agent = _agent(max_messages=3)
+    agent.memory.add_message(Message.user_message("the task"), pin=True)
+    for i in range(4):
+        _step(agent, f"step {i}")
+        journal.checkpoint(agent)
+
+    restored = _agent(max_messages=3)
+    assert Journal(tmp_path / "run.jsonl").restore_agent(restored)
+    assert _contents(restored) == _contents(agent) == ["the task", "step 2", "step 3"]
+    assert restored.current_step == 4
+    assert restored.memory.is_pinned(restored.memory.messages[0])
+
+
+def test_rewritten_memory_is_recorded_in_full(tmp_path):
+    journal = Journal(tmp_path / "run.jsonl", fsync=False)
+    agent = _agent()
+    for i in range(3):
+        _step(agent, f"step {i}")
+    journal.checkpoint(agent)
+
+    summary = Message.user_message("summary")
+    agent.memory.replace_messages(agent.memory.messages[:2], [summary])
+    journal.checkpoint(agent)
+
+    records = [json.loads(line) for line in journal.path.read_text().splitlines()]
+    assert records[-1].get("reset")
+    messages = Journal(journal.path).state.agents["manus"].messages
+    assert [m["content"] for m in messages] == ["summary", "step 2"]
+
+
+def test_snapshot_truncates_journal(tmp_path):
+    """Tests that recovery reads the snapshot plus only the records after it."""
+    journal = Journal(tmp_path / "run.jsonl", snapshot_every=3, fsync=False)
+    agent = _agent()
+    for i in range(4):
+        _step(agent, f"step {i}")
+        journal.checkpoint(agent)
+    journal.record_plan("plan_1", {"steps": ["a", "b"]}, current_step_index=1)
+
+    assert journal.snapshot_path.exists()
+    assert len(journal.path.read_text().splitlines()) == 2
+
+    state = Journal(tmp_path / "run.jsonl").state
+    assert len(state.agents["manus"].messages) == 4
+    assert state.plans["plan_1"]["steps"] == ["a", "b"]
+    assert state.flow == {"plan_id": "plan_1", "current_step_index": 1}
+
+
+def test_torn_final_record_is_ignored(tmp_path):
+    journal = Journal(tmp_path / "run.jsonl", fsync=False)
+    agent = _agent()
+    _step(agent, "step 0")
+    journal.checkpoint(agent)
+    with journal.path.open("a") as f:
+        f.write('{"seq": 2, "type": "age')
+
+    assert len(Journal(journal.path).state.agents["manus"].messages) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_checkpoint_syncs_off_the_event_loop(tmp_path, monkeypatch):
+    synced = []
+    fsync = journal_module.os.fsync
+    monkeypatch.setattr(
+        journal_module.os,
+        "fsync",
+        lambda fd: synced.append(threading.current_thread()) or fsync(fd),
+    )
+    journal = Journal(tmp_path / "run.jsonl")
+    agent = _agent()
+    _step(agent, "step 0")
+    await journal.acheckpoint(agent)
+    await journal.arecord_plan("plan_1", {"steps": ["a"]})
+
+    assert len(synced) == 2
+    assert threading.main_thread() not in synced
+    state = Journal(journal.path).state
+    assert len(state.agents["manus"].messages) == 1 and "plan_1" in state.plans
+
+
+def test_images_are_persisted_for_restore(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        blob_store, "_blob_store", BlobStore(1024, directory=tmp_path / "blobs")
+    )
+    journal = Journal(tmp_path / "run.jsonl", fsync=False)
+    agent = _agent()
+    agent.memory.add_message(Message.user_message("look", base64_image="QUJD"))
+    journal.checkpoint(agent)
+
+    # A new process starts with an empty in-memory store
+    monkeypatch.setattr(
+        blob_store, "_blob_store", BlobStore(1024, directory=tmp_path / "blobs")
+    )
+    restored = _agent()
+    assert Journal(journal.path).restore_agent(restored)
+    assert restored.memory.messages[0].base64_image == "QUJD"
+
+
+def test_images_without_blob_directory_are_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "_blob_store", BlobStore(1024))
+    journal = Journal(tmp_path / "run.jsonl", fsync=False)
+    agent = _agent()
+    agent.memory.add_message(Message.user_message("look", base64_image="QUJD"))
+    logged = []
+    sink = logger.add(logged.append, level="WARNING", format="{message}")
+    try:
+        journal.checkpoint(agent)
+        monkeypatch.setattr(blob_store, "_blob_store", BlobStore(1024))
+        assert Journal(journal.path).restore_agent(_agent())
+    finally:
+        logger.remove(sink)
+
+    assert "only kept in memory" in logged[0]
+    assert "could not be restored" in logged[1]
@@ -0,0 +1,84 @@
+import json
+
+from app.agent.loop_detector import LoopDetector, MinHash
+from app.agent.toolcall import ToolCallAgent
+from app.schema import Function, Memory, Message, ToolCall
+
+
+def _scroll(i: int, amount: int = 500) -> Message:
+    call = ToolCall(
+        id=f"call_{i}",
+        function=Function(
+            name="browser_use",
+            arguments=json.dumps({"action": "scroll_down", "scroll_amount": amount}),
+        ),
+    )
+    return Message.from_tool_calls([call])
+
+
+def test_repeated_tool_calls_are_detected():
+    """Tests that identical calls count even when the call ids differ."""
+    detector = LoopDetector(threshold=2)
+    assert not detector.observe(_scroll(0))
+    assert not detector.observe(_scroll(1))
+    assert detector.observe(_scroll(2))
+    assert not detector.observe(_scroll(3, amount=800))
+
+
+def test_argument_order_does_not_matter():
+    detector = LoopDetector(threshold=1)
+    first = _scroll(0)
+    second = _scroll(1)
+    second.tool_calls[0].function.arguments = json.dumps(
+        {"scroll_amount": 500, "action": "scroll_down"}
+    )
+    assert not detector.observe(first)
+    assert detector.observe(second)
+
+
+def test_window_forgets_old_turns():
+    detector = LoopDetector(threshold=1, window=2, similarity=None)
+    detector.observe(Message.assistant_message("checking the page"))
+    detector.observe(Message.assistant_message("something else"))
+    detector.observe(Message.assistant_message("and another thing"))
+    assert not detector.observe(Message.assistant_message("checking the page"))
+
+
+def test_near_duplicates_are_detected():
+    text = (
+        "I will open the search results page and look for the pricing table "
+        "of the product, then extract the monthly plan prices for comparison"
+    )
+    detector = LoopDetector(threshold=2, similarity=0.5, num_perm=64)
+    assert not detector.observe(Message.assistant_message(text))
+    assert not detector.observe(Message.assistant_message(text + " now"))
+    assert detector.observe(Message.assistant_message(text + " again"))
+    assert not detector.observe(
+        Message.assistant_message("The task is complete, terminating.")
+    )
+
+
+def test_minhash_similarity_estimates_jaccard():
+    minhash = MinHash(num_perm=64)
+    a = minhash.signature("one two three four five six seven eight")
+    assert MinHash.similarity(a, a) == 1.0
+    b = minhash.signature("alpha beta gamma delta epsilon zeta eta theta")
+    assert MinHash.similarity(a, b) < 0.2
+
+
+def test_agent_checks_only_new_messages():
+    agent = ToolCallAgent.model_construct(llm=None, memory=Memory())
+    results = []
+    for i in range(3):
+        agent.memory.add_message(_scroll(i))
+        agent.memory.add_message(
+            Message.tool_message("scrolled", "browser_use", f"call_{i}")
+        )
+        results.append(agent.is_stuck())
+    assert results == [False, False, True]
+    # Nothing new since the last check
+    assert not agent.is_stuck()
+
+    agent.handle_stuck_state()
+    agent.handle_stuck_state()
+    assert agent.next_step_prompt.count("Observed duplicate responses") == 1
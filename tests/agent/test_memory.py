@@ -0,0 +1,103 @@
+from app.schema import Function, Memory, Message, ToolCall
+
+
+def _tool_round(i: int, calls: int = 1):
+    tool_calls = [
+        ToolCall(id=f"call_{i}_{n}", function=Function(name="bash", arguments="{}"))
+        for n in range(calls)
+    ]
+    return [Message.from_tool_calls(tool_calls, content=f"thinking {i}")] + [
+        Message.tool_message(f"output {i}", name="bash", tool_call_id=call.id)
+        for call in tool_calls
+    ]
+
+
+def _assert_no_orphans(memory: Memory):
+    called = set()
+    for message in memory.messages:
+        for call in message.tool_calls or []:
+            called.add(call.id)
+        if message.role == "tool":
+            assert message.tool_call_id in called
+
+
+def test_eviction_removes_whole_tool_call_groups():
+    """Tests that evicting an assistant message also evicts its tool results."""
+    memory = Memory(max_messages=5)
+    memory.add_messages(_tool_round(0, calls=2))
+    memory.add_messages(_tool_round(1, calls=2))
+
+    # One message over the limit drops the whole three-message group
+    assert len(memory.messages) == 3
+    assert memory.messages[0].content == "thinking 1"
+    _assert_no_orphans(memory)
+
+
+def test_bulk_add_respects_limit():
+    memory = Memory(max_messages=4)
+    memory.set_token_counter(lambda message: 1)
+    memory.add_messages([Message.user_message(str(i)) for i in range(10)])
+
+    assert [m.content for m in memory.messages] == ["6", "7", "8", "9"]
+    assert memory.token_count == 4
+
+
+def test_pinned_messages_survive_eviction():
+    """Tests that a pinned task stays first while later rounds are evicted."""
+    memory = Memory(max_messages=4)
+    task = Message.user_message("the task")
+    memory.add_message(task, pin=True)
+    for i in range(5):
+        for message in _tool_round(i):
+            memory.add_message(message)
+        _assert_no_orphans(memory)
+
+    assert memory.messages[0] is task
+    assert [m.content for m in memory.messages[1:]] == [
+        "thinking 4",
+        "output 4",
+    ]
+
+    memory.clear()
+    assert not memory.is_pinned(task)
+
+
+def test_eviction_after_pinned_head_deletes_in_place():
+    """Tests that eviction behind a pinned message keeps the same list."""
+    memory = Memory(max_messages=3)
+    memory.add_message(Message.user_message("the task"), pin=True)
+    stored = memory.messages
+    for i in range(4):
+        memory.add_message(Message.user_message(str(i)))
+
+    assert memory.messages is stored
+    assert [m.content for m in memory.messages] == ["the task", "2", "3"]
+
+
+def test_same_length_replacement_is_recounted():
+    """Tests that replacing the list with one of equal length updates the total."""
+    memory = Memory()
+    memory.set_token_counter(lambda message: len(message.content))
+    memory.add_messages([Message.user_message("ab"), Message.user_message("cd")])
+    assert memory.token_count == 4
+
+    memory.messages = [Message.user_message("abcde"), Message.user_message("fghij")]
+    assert memory.token_count == 10
+
+    memory.messages[0] = Message.user_message("x")
+    assert memory.token_count == 6
+
+
+def test_replaced_messages_do_not_leak_count_or_pin():
+    """Tests that a new message never inherits a dropped message's entries."""
+    memory = Memory()
+    memory.set_token_counter(lambda message: len(message.content))
+    memory.add_message(Message.user_message("x" * 100), pin=True)
+    assert memory.token_count == 100
+
+    # Dropped outside of Memory; its id() must not be handed out again
+    memory.messages = []
+    for _ in range(50):
+        memory.messages = [Message.user_message("y")]
+        assert not memory.is_pinned(memory.messages[0])
+        assert memory.token_count == 1
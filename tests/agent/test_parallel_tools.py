@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.schema import Function, ToolCall
+from app.tool import ToolCollection
+from app.tool.base import BaseTool, ToolResult
+
+
+class SleepTool(BaseTool):
+    """Records how many calls overlap while sleeping."""
+
+    name: str = "sleep"
+    description: str = "sleep"
+    concurrency_safe: bool = True
+    running: int = 0
+    peak: int = 0
+
+    async def execute(self, label: str, delay: float = 0.02) -> ToolResult:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(delay)
+        self.running -= 1
+        return ToolResult(output=label, base64_image=f"img-{label}")
+
+
+class WriteTool(SleepTool):
+    name: str = "write"
+    concurrency_safe: bool = False
+
+
+def _call(i: int, name: str, **args) -> ToolCall:
+    return ToolCall(
+        id=f"call_{i}",
+        function=Function(name=name, arguments=json.dumps(args)),
+    )
+
+
+def _agent(*tools: BaseTool, **fields) -> ToolCallAgent:
+    # No LLM is needed to run tool calls
+    return ToolCallAgent.model_construct(
+        llm=None,
+        available_tools=ToolCollection(*tools),
+        special_tool_names=[],
+        **fields,
+    )
+
+
+@pytest.mark.asyncio
+async def test_safe_calls_run_concurrently_in_order():
+    sleep = SleepTool()
+    agent = _agent(sleep, max_parallel_tools=2)
+    # Later calls finish first; outcomes still follow call order
+    calls = [_call(i, "sleep", label=str(i), delay=0.04 - i * 0.01) for i in range(3)]
+
+    outcomes = await agent._run_tool_calls(calls)
+
+    assert sleep.peak == 2
+    assert all(result.endswith(str(i)) for i, (result, _) in enumerate(outcomes))
+    assert [image for _, image in outcomes] == ["img-0", "img-1", "img-2"]
+
+
+@pytest.mark.asyncio
+async def test_unsafe_call_is_a_barrier():
+    """Tests that a stateful call neither overlaps nor reorders other calls."""
+    sleep, write = SleepTool(), WriteTool()
+    agent = _agent(sleep, write)
+    order = []
+
+    async def track(command):
+        order.append(("start", command.id))
+        result = await ToolCallAgent._execute_tool_with_image(agent, command)
+        order.append(("end", command.id))
+        return result
+
+    object.__setattr__(agent, "_execute_tool_with_image", track)
+    calls = [
+        _call(0, "sleep", label="a"),
+        _call(1, "write", label="b"),
+        _call(2, "sleep", label="c"),
+    ]
+    await agent._run_tool_calls(calls)
+
+    assert order == [
+        ("start", "call_0"),
+        ("end", "call_0"),
+        ("start", "call_1"),
+        ("end", "call_1"),
+        ("start", "call_2"),
+        ("end", "call_2"),
+    ]
+    assert sleep.peak == write.peak == 1
@@ -0,0 +1,49 @@
+import pytest
+from openai.types.chat import ChatCompletionMessage
+
+from app.agent.toolcall import ToolCallAgent
+from app.schema import Memory, Message
+from app.tool import ToolCollection
+
+
+class RecordingLLM:
+    """Stands in for `LLM`, recording the messages of each request."""
+
+    def __init__(self):
+        self.requests = []
+
+    def count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    def remaining_input_tokens(self):
+        return None
+
+    async def ask_tool(self, messages, **kwargs):
+        self.requests.append([m.content for m in messages])
+        return ChatCompletionMessage(role="assistant", content="thinking")
+
+
+@pytest.mark.asyncio
+async def test_step_prompts_are_sent_but_not_stored():
+    llm = RecordingLLM()
+    agent = ToolCallAgent.model_construct(
+        llm=llm,
+        memory=Memory(),
+        available_tools=ToolCollection(),
+        next_step_prompt="What next?",
+    )
+    agent.memory.add_message(Message.user_message("the task"))
+
+    agent.add_step_message(Message.user_message("screenshot"))
+    await agent.think()
+    await agent.think()
+
+    assert llm.requests == [
+        ["the task", "screenshot", "What next?"],
+        ["the task", "thinking", "What next?"],
+    ]
+    assert [m.content for m in agent.memory.messages] == [
+        "the task",
+        "thinking",
+        "thinking",
+    ]
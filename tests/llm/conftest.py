@@ -0,0 +1,44 @@
+import itertools
+from typing import Any, List
+
+import pytest
+
+from app import llm as llm_module
+from app.llm import LLM
+
+
+class WordTokenizer:
+    """Counts whitespace separated words; tiktoken needs a download."""
+
+    def encode(self, text: str):
+        return text.split()
+
+
+class FakeRouter:
+    """Records request params and answers with queued responses."""
+
+    def __init__(self):
+        self.requests: List[dict] = []
+        self.responses: List[Any] = []
+
+    async def send(self, params: dict):
+        self.requests.append(params)
+        return self.responses.pop(0)
+
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """An `LLM` of the default config whose requests go to a `FakeRouter`."""
+    monkeypatch.setattr(
+        llm_module.tiktoken, "encoding_for_model", lambda _: WordTokenizer()
+    )
+    name = f"test-{next(_names)}"
+    llm = LLM(config_name=name)
+    llm.model = "gpt-4o"
+    llm.router = FakeRouter()
+    llm.hedge_percentile = None
+    yield llm
+    LLM._instances.pop(name, None)
@@ -0,0 +1,45 @@
+import base64
+import io
+
+from PIL import Image
+
+from app.blob_store import BlobStore, downscale_image
+
+
+def _png(size: int) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), "red").save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def test_lru_eviction_without_directory():
+    store = BlobStore(max_memory_bytes=8)
+    first = store.put("AAAA")
+    second = store.put("BBBB")
+    assert store.get(first) == "AAAA"  # first is now most recently used
+
+    third = store.put("CCCC")
+    assert store.get(second) is None
+    assert store.get(first) == "AAAA" and store.get(third) == "CCCC"
+
+
+def test_evicted_blobs_spill_to_disk(tmp_path):
+    store = BlobStore(max_memory_bytes=4, directory=tmp_path)
+    first = store.put("AAAA")
+    store.put("BBBB")
+
+    assert store.stats()["blobs"] == 1 and store.spilled == 1
+    assert first in store
+    assert store.get(first) == "AAAA"
+
+
+def test_identical_blobs_share_a_reference():
+    store = BlobStore(max_memory_bytes=1024)
+    assert store.put("QUJD") == store.put("QUJD")
+    assert store.stats()["memory_bytes"] == 4
+
+
+def test_downscale_image():
+    small = downscale_image(_png(64), max_side=16)
+    with Image.open(io.BytesIO(base64.b64decode(small))) as image:
+        assert max(image.size) == 16
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+
+from app import http_client
+from app.config import HTTPClientSettings
+from app.http_client import close_http_clients, get_http_client, pool_stats
+
+
+@pytest.fixture(autouse=True)
+def isolated_clients(monkeypatch):
+    """Keeps the shared clients of these tests out of the process pool."""
+    monkeypatch.setattr(http_client, "_clients", {})
+    monkeypatch.setattr(http_client, "_counters", {})
+
+
+def _pool(client: httpx.AsyncClient):
+    return client._transport._pool
+
+
+@pytest.mark.asyncio
+async def test_clients_are_shared_per_origin():
+    settings = HTTPClientSettings()
+    client = get_http_client("https://api.example.com/v1", settings)
+
+    # Same scheme, host and default port, whatever the path
+    assert get_http_client("https://api.example.com:443/v2", settings) is client
+    assert get_http_client("https://API.example.com", settings) is client
+    assert get_http_client("http://api.example.com", settings) is not client
+    assert get_http_client("https://api.example.com:8443", settings) is not client
+    assert set(pool_stats()) == {
+        "https://api.example.com:443",
+        "http://api.example.com:80",
+        "https://api.example.com:8443",
+    }
+    await close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_limits_come_from_settings_and_http2_falls_back(monkeypatch):
+    monkeypatch.setattr(http_client, "_http2_available", lambda: False)
+    settings = HTTPClientSettings(
+        max_connections=7, max_keepalive_connections=3, keepalive_expiry=5, http2=True
+    )
+    pool = _pool(get_http_client("https://api.example.com", settings))
+
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 5
+    assert not pool._http2
+    await close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_counters_and_close(monkeypatch):
+    client = get_http_client("https://api.example.com", HTTPClientSettings())
+    statuses = iter([200, 503])
+    transport = httpx.MockTransport(lambda request: httpx.Response(next(statuses)))
+    monkeypatch.setattr(client, "_transport", transport)
+
+    await client.get("https://api.example.com/models")
+    await client.get("https://api.example.com/models")
+    stats = pool_stats()["https://api.example.com:443"]
+    assert (stats["requests"], stats["responses"], stats["server_errors"]) == (
+        2,
+        2,
+        1,
+    )
+
+    await close_http_clients()
+    assert client.is_closed and pool_stats() == {}
+
+    # A closed client is replaced; the origin's counters carry on
+    fresh = get_http_client("https://api.example.com", HTTPClientSettings())
+    assert fresh is not client and not fresh.is_closed
+    assert pool_stats()["https://api.example.com:443"]["requests"] == 2
+    await close_http_clients()
@@ -0,0 +1,58 @@
+import pytest
+
+from app.llm_cache import CacheMode, ResponseCache
+
+
+def make_cache(tmp_path, mode=CacheMode.READ_THROUGH, max_size_bytes=1024 * 1024):
+    return ResponseCache(tmp_path / "cache", mode, max_size_bytes)
+
+
+def test_key_depends_on_request_parts():
+    """Tests that every request part changes the cache key."""
+    base = dict(model="m", messages=[{"role": "user", "content": "hi"}])
+    key = ResponseCache.make_key(**base)
+    assert key == ResponseCache.make_key(**base)
+    assert key != ResponseCache.make_key(**base, temperature=0.5)
+    assert key != ResponseCache.make_key(**{**base, "model": "other"})
+
+
+def test_read_through_round_trip(tmp_path):
+    """Tests storing and reading a response, including across instances."""
+    cache = make_cache(tmp_path)
+    cache.put("abc123", {"content": "hello"})
+    assert cache.get("abc123") == {"content": "hello"}
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+
+    reopened = make_cache(tmp_path)
+    assert reopened.get("abc123") == {"content": "hello"}
+
+
+@pytest.mark.parametrize(
+    "mode,reads,writes",
+    [
+        (CacheMode.RECORD, False, True),
+        (CacheMode.REPLAY, True, False),
+        (CacheMode.OFF, False, False),
+    ],
+)
+def test_modes(tmp_path, mode, reads, writes):
+    """Tests which modes read from and write to the store."""
+    make_cache(tmp_path).put("k0", {"content": "seed"})
+    cache = make_cache(tmp_path, mode)
+    cache.put("k1", {"content": "new"})
+    assert (cache.get("k0") is not None) == reads
+    assert (make_cache(tmp_path).get("k1") is not None) == writes
+
+
+def test_lru_eviction_by_size(tmp_path):
+    """Tests that least recently used entries are evicted past the size limit."""
+    cache = make_cache(tmp_path, max_size_bytes=100)
+    cache.put("aa1", {"content": "x" * 30})
+    cache.put("bb2", {"content": "y" * 30})
+    cache.get("aa1")  # aa1 is now the most recently used
+    cache.put("cc3", {"content": "z" * 30})
+
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") is not None
+    assert cache.get("cc3") is not None
@@ -0,0 +1,140 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIStatusError, BadRequestError
+
+from app.llm_router import Endpoint, EndpointRouter, LatencyTracker, hedged
+
+
+def _status_error(cls, status_code: int):
+    request = httpx.Request("POST", "https://example.com/v1/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    return cls("error", response=response, body=None)
+
+
+class FakeClient:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **params):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.mark.asyncio
+async def test_fails_over_on_server_error():
+    """Tests that a 5xx moves the request to the next endpoint and cools down."""
+    primary = Endpoint("https://a", FakeClient(_status_error(APIStatusError, 503)))
+    backup = Endpoint("https://b", FakeClient("from-b"))
+    router = EndpointRouter([primary, backup])
+
+    assert await router.send({}) == "from-b"
+    assert primary.failures == 1 and not primary.available
+    assert backup.latency is not None
+
+    # The failed endpoint is skipped while it cools down
+    assert await router.send({}) == "ok"
+    assert primary.client.calls == 1 and backup.client.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_raises_after_every_endpoint_failed():
+    """Tests that each endpoint is tried once before the last error surfaces."""
+    errors = [_status_error(APIStatusError, 502), _status_error(APIStatusError, 500)]
+    router = EndpointRouter(
+        [
+            Endpoint("https://a", FakeClient(errors[0])),
+            Endpoint("https://b", FakeClient(errors[1])),
+        ]
+    )
+
+    with pytest.raises(APIStatusError) as exc_info:
+        await router.send({})
+    assert exc_info.value in errors
+    assert all(ep.client.calls == 1 for ep in router.endpoints)
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_fail_over():
+    """Tests that a request error is raised without touching other endpoints."""
+    primary = Endpoint("https://a", FakeClient(_status_error(BadRequestError, 400)))
+    backup = Endpoint("https://b", FakeClient())
+    router = EndpointRouter([primary, backup])
+
+    with pytest.raises(BadRequestError):
+        await router.send({})
+    assert backup.client.calls == 0
+
+
+def test_prefers_lower_latency_endpoint():
+    """Tests that the EWMA latency and error rate drive endpoint choice."""
+    slow = Endpoint("https://slow", None)
+    fast = Endpoint("https://fast", None)
+    router = EndpointRouter([slow, fast])
+    slow.record_success(2.0)
+    fast.record_success(0.5)
+    assert router.choose() is fast
+
+    fast.record_failure(retry_after=0)
+    fast.record_success(0.5)
+    assert fast.error_rate > 0
+    assert router.choose() is fast
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_cancels_straggler():
+    """Tests that a slow request is raced by a hedge and then cancelled."""
+    started = []
+    cancelled = asyncio.Event()
+
+    async def send():
+        started.append(len(started))
+        if len(started) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return f"response-{len(started)}"
+
+    hedges = []
+    result = await hedged(send, delay=0.01, on_hedge=lambda: hedges.append(1))
+    await asyncio.sleep(0)
+
+    assert result == "response-2"
+    assert hedges == [1] and cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_fast_request_is_not_hedged():
+    """Tests that no hedge is sent when the first request is fast enough."""
+    calls = []
+
+    async def send():
+        calls.append(1)
+        return "ok"
+
+    assert await hedged(send, delay=1.0) == "ok"
+    assert calls == [1]
+
+
+def test_latency_tracker_percentile_and_budget():
+    """Tests percentile lookup and that hedges are capped to a ratio."""
+    tracker = LatencyTracker()
+    for _ in range(19):
+        tracker.record(1.0)
+    assert tracker.hedge_delay(95) is None  # not enough samples yet
+
+    tracker.record(30.0)
+    assert tracker.percentile(50) == 1.0
+    assert tracker.percentile(100) == 30.0
+
+    tracker.hedges = 2
+    assert tracker.hedge_delay(95) is None
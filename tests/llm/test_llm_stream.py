@@ -0,0 +1,85 @@
+import io
+
+import pytest
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionChunk
+
+from app.llm_stream import StdoutSink, StreamDelta
+from app.schema import Message
+from app.usage import usage_scope
+
+
+class RecordingStream(io.StringIO):
+    def __init__(self, tty: bool):
+        super().__init__()
+        self.tty = tty
+        self.flushes = 0
+
+    def isatty(self) -> bool:
+        return self.tty
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+
+def test_redirected_sink_flushes_once():
+    """Tests that a non-interactive sink flushes per completion, not per delta."""
+    stream = RecordingStream(tty=False)
+    sink = StdoutSink(stream)
+    for text in ["Hello", ", ", "world"]:
+        sink.write(text)
+    sink.close()
+
+    assert stream.getvalue() == "Hello, world\n"
+    assert stream.flushes == 1
+
+
+def test_terminal_sink_flushes_each_delta():
+    stream = RecordingStream(tty=True)
+    sink = StdoutSink(stream)
+    sink.write("a")
+    sink.write("b")
+    assert stream.flushes == 2
+
+
+def test_final_delta_carries_usage():
+    usage = CompletionUsage(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+    assert not StreamDelta(content="hi").is_final
+    assert StreamDelta(usage=usage).is_final
+
+
+def _chunk(content=None, usage=None) -> ChatCompletionChunk:
+    choices = [] if content is None else [{"index": 0, "delta": {"content": content}}]
+    return ChatCompletionChunk(
+        id="1",
+        object="chat.completion.chunk",
+        created=0,
+        model="gpt-4o",
+        choices=choices,
+        usage=usage,
+    )
+
+
+async def _stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_ask_records_usage_of_final_chunk(fake_llm):
+    """Tests that the provider's completion count wins over the estimate."""
+    usage = CompletionUsage(prompt_tokens=9, completion_tokens=42, total_tokens=51)
+    fake_llm.router.responses.append(
+        _stream(_chunk("Hello"), _chunk(" world"), _chunk(usage=usage))
+    )
+    stream = RecordingStream(tty=False)
+
+    with usage_scope("test") as scope:
+        answer = await fake_llm.ask(
+            [Message.user_message("hi")], sink=StdoutSink(stream)
+        )
+
+    assert answer == "Hello world"
+    assert stream.getvalue() == "Hello world\n"
+    assert fake_llm.total_completion_tokens == 42
+    assert scope.completion_tokens == 42 and scope.input_tokens > 0
@@ -0,0 +1,125 @@
+import pytest
+from openai.types.chat import ChatCompletion
+
+from app.exceptions import EmptyLLMResponse
+from app.llm import LLM, TokenCounter
+from app.logger import logger
+from app.schema import Function, Message, ToolCall
+
+
+class CountingTokenizer:
+    def encode(self, text: str):
+        return text.split()
+
+
+def test_wire_format_is_cached_until_mutation():
+    """Tests that unchanged messages reuse their serialized dict."""
+    message = Message.user_message("look at this")
+
+    first = LLM.format_messages([message], supports_images=True)[0]
+    second = LLM.format_messages([message], supports_images=True)[0]
+    assert first is second
+
+    message.content = "look again"
+    third = LLM.format_messages([message], supports_images=True)[0]
+    assert third is not first
+    assert third["content"] == "look again"
+
+
+def test_image_is_loaded_at_send_time():
+    """Tests that the message holds a reference and the image is not cached."""
+    message = Message.user_message("look at this", base64_image="QUJD")
+    assert "QUJD" not in message.model_dump_json()
+
+    first = LLM.format_messages([message], supports_images=True)[0]
+    assert first["content"] == [
+        {"type": "text", "text": "look at this"},
+        {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,QUJD"}},
+    ]
+    assert "base64_image" not in first
+    assert "QUJD" not in str(message.to_wire(supports_images=False))
+
+
+def test_image_is_dropped_for_text_only_models():
+    message = Message.user_message("hello", base64_image="QUJD")
+    assert LLM.format_messages([message]) == [{"role": "user", "content": "hello"}]
+    # The cached dict does not leak into to_dict results
+    assert message.to_dict()["base64_image"] == "QUJD"
+
+
+def test_copies_do_not_share_invalidated_cache():
+    call = ToolCall(id="call_1", function=Function(name="bash", arguments="{}"))
+    original = Message.from_tool_calls([call], content="run it")
+    original.to_wire()
+
+    copy = original.model_copy()
+    copy.content = "changed"
+    assert original.to_wire()["content"] == "run it"
+    assert copy.to_wire()["content"] == "changed"
+
+
+def test_token_key_is_remembered_on_wire_dicts(monkeypatch):
+    """Tests that unchanged history is not hashed again on later requests."""
+    counter = TokenCounter(CountingTokenizer())
+    history = [Message.user_message(f"message {i}") for i in range(3)]
+    formatted = LLM.format_messages(history)
+    counter.count_message_tokens(formatted)
+
+    def fail(message):
+        raise AssertionError("message hashed again")
+
+    monkeypatch.setattr(TokenCounter, "_message_key", staticmethod(fail))
+    assert counter.count_message_tokens(LLM.format_messages(history)) > 0
+
+
+@pytest.mark.asyncio
+async def test_ask_with_images_leaves_message_wire_intact(fake_llm):
+    """Tests that images attached for one request don't stick to the message."""
+    message = Message.user_message("describe this")
+    before = dict(message.to_wire(True))
+    fake_llm.router.responses.append(
+        ChatCompletion(
+            id="1",
+            object="chat.completion",
+            created=0,
+            model="gpt-4o",
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "a cat"},
+                }
+            ],
+            usage={"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+        )
+    )
+
+    answer = await fake_llm.ask_with_images(
+        [message], images=["https://example.com/cat.png"], stream=False
+    )
+
+    assert answer == "a cat"
+    sent = fake_llm.router.requests[0]["messages"][-1]
+    assert sent["content"][-1]["type"] == "image_url"
+    assert message.to_wire(True) == before
+
+
+@pytest.mark.asyncio
+async def test_empty_response_is_not_logged_as_validation_error(fake_llm):
+    fake_llm.router.responses.append(
+        ChatCompletion(
+            id="1", object="chat.completion", created=0, model="gpt-4o", choices=[]
+        )
+    )
+    logged = []
+    sink = logger.add(logged.append, level="WARNING", format="{message}")
+    try:
+        with pytest.raises(EmptyLLMResponse):
+            # Skips the retry decorator, which would ask again
+            await LLM.ask_tool.__wrapped__(fake_llm, [Message.user_message("hi")])
+    finally:
+        logger.remove(sink)
+
+    assert [str(m).strip() for m in logged] == [
+        "Invalid or empty response from LLM in ask_tool"
+    ]
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.rate_limiter import (
+    AdaptiveConcurrency,
+    LLMRateLimiter,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    """Tests that the bucket blocks once drained and refills over time."""
+    bucket = TokenBucket(rate_per_minute=600, capacity=2)  # 10 tokens/s
+    await bucket.acquire(2)
+
+    start = time.monotonic()
+    await bucket.acquire(1)
+    assert time.monotonic() - start >= 0.08
+
+
+@pytest.mark.asyncio
+async def test_oversized_request_is_clamped():
+    """Tests that a request larger than the bucket does not block forever."""
+    bucket = TokenBucket(rate_per_minute=60000, capacity=10)
+    await asyncio.wait_for(bucket.acquire(1000), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_aimd_window():
+    """Tests additive increase, multiplicative decrease and the ceiling."""
+    concurrency = AdaptiveConcurrency(max_concurrency=8)
+    assert concurrency.window == 8
+
+    await concurrency.acquire()
+    await concurrency.release(throttled=True)
+    assert concurrency.window == 4
+
+    for _ in range(4):
+        await concurrency.acquire()
+        await concurrency.release()
+    assert 4.5 < concurrency.window < 5
+
+    for _ in range(100):
+        await concurrency.acquire()
+        await concurrency.release()
+    assert concurrency.window == 8
+
+
+@pytest.mark.asyncio
+async def test_window_limits_in_flight_requests():
+    """Tests that callers beyond the window wait for a free slot."""
+    limiter = LLMRateLimiter("test", max_concurrency=2)
+    active = 0
+    peak = 0
+
+    async def call():
+        nonlocal active, peak
+        await limiter.acquire()
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        await limiter.release()
+
+    await asyncio.gather(*(call() for _ in range(6)))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_callers():
+    """Tests that a throttled release pauses new acquisitions."""
+    concurrency = AdaptiveConcurrency()
+    await concurrency.acquire()
+    await concurrency.release(throttled=True, retry_after=0.1)
+
+    start = time.monotonic()
+    await concurrency.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_parse_retry_after():
+    """Tests Retry-After header parsing."""
+
+    def error(headers):
+        return (
+            Exception()
+            if headers is None
+            else SimpleNamespace(response=SimpleNamespace(headers=headers))
+        )
+
+    assert parse_retry_after(error({"retry-after": "3"})) == 3.0
+    assert parse_retry_after(error({"retry-after-ms": "250"})) == 0.25
+    assert parse_retry_after(error({})) is None
+    assert parse_retry_after(error(None)) is None
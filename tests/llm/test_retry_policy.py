@@ -0,0 +1,93 @@
+import time
+
+import httpx
+import pytest
+from openai import APIStatusError, BadRequestError, InternalServerError, RateLimitError
+
+from app.exceptions import (
+    CircuitOpenError,
+    EmptyLLMResponse,
+    ResponseCacheMiss,
+    TokenLimitExceeded,
+)
+from app.llm_router import Endpoint, EndpointRouter
+from app.retry_policy import CircuitBreaker, CircuitState, is_transient
+
+
+def _status_error(cls, status_code: int):
+    request = httpx.Request("POST", "https://example.com/v1/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    return cls("error", response=response, body=None)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        _status_error(RateLimitError, 429),
+        _status_error(InternalServerError, 503),
+        _status_error(APIStatusError, 408),
+        EmptyLLMResponse("Empty response from streaming LLM"),
+    ],
+)
+def test_transient_errors(error):
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        TokenLimitExceeded("limit"),
+        ResponseCacheMiss("miss"),
+        CircuitOpenError("open"),
+        ValueError("Invalid tool_choice"),
+        _status_error(BadRequestError, 400),
+    ],
+)
+def test_permanent_errors(error):
+    assert not is_transient(error)
+
+
+def test_breaker_opens_and_probes():
+    """Tests closed -> open -> half-open with a single probe -> closed."""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN and not breaker.allow()
+
+    breaker.opened_at = time.monotonic() - 61
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast():
+    """Tests that no request is sent while every endpoint's breaker is open."""
+
+    class Client:
+        calls = 0
+
+        @property
+        def chat(self):
+            return self
+
+        @property
+        def completions(self):
+            return self
+
+        async def create(self, **params):
+            Client.calls += 1
+            raise _status_error(InternalServerError, 500)
+
+    breaker = CircuitBreaker("shared", failure_threshold=1)
+    router = EndpointRouter([Endpoint("https://a", Client(), breaker=breaker)])
+
+    with pytest.raises(InternalServerError):
+        await router.send({})
+    with pytest.raises(CircuitOpenError):
+        await router.send({})
+    assert Client.calls == 1
@@ -0,0 +1,168 @@
+import threading
+
+import pytest
+
+from app.llm import TokenCounter
+from app.schema import Memory, Message
+
+
+class WhitespaceTokenizer:
+    """Counts whitespace separated words and records every encode call."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text: str):
+        self.calls += 1
+        return text.split()
+
+
+def test_count_message_tokens_is_memoized():
+    """Tests that already counted messages are not tokenized again."""
+    tokenizer = WhitespaceTokenizer()
+    counter = TokenCounter(tokenizer)
+    history = [
+        {"role": "user", "content": "hello there"},
+        {"role": "assistant", "content": "general kenobi"},
+    ]
+
+    first = counter.count_message_tokens(history)
+    calls_after_first = tokenizer.calls
+
+    history.append({"role": "user", "content": "one more message"})
+    second = counter.count_message_tokens(history)
+
+    # Only the new message (role + content) was encoded
+    assert tokenizer.calls - calls_after_first == 2
+    assert second - first == counter.BASE_MESSAGE_TOKENS + 1 + 3
+
+
+def test_image_payload_does_not_change_cache_key():
+    """Tests that messages differing only in image bytes share a cache entry."""
+    counter = TokenCounter(WhitespaceTokenizer())
+    image_a = {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAA"}}
+    image_b = {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,BBB"}}
+    msg_a = {"role": "user", "content": [{"type": "text", "text": "x"}, image_a]}
+    msg_b = {"role": "user", "content": [{"type": "text", "text": "x"}, image_b]}
+
+    assert counter._message_key(msg_a) == counter._message_key(msg_b)
+    assert counter.count_single_message(msg_a) == counter.count_single_message(msg_b)
+
+
+def test_cache_is_bounded():
+    """Tests LRU eviction of the per-message cache."""
+    counter = TokenCounter(WhitespaceTokenizer(), cache_size=2)
+    for i in range(5):
+        counter.count_single_message({"role": "user", "content": f"message {i}"})
+    assert len(counter._message_cache) == 2
+
+
+def test_memory_running_token_total():
+    """Tests that Memory keeps a running total and subtracts evicted messages."""
+    memory = Memory(max_messages=2)
+    memory.set_token_counter(lambda message: len(message.content))
+
+    memory.add_message(Message.user_message("aaaa"))
+    memory.add_message(Message.assistant_message("bb"))
+    assert memory.token_count == 6
+
+    memory.add_message(Message.user_message("c"))
+    assert memory.token_count == 3
+
+    # Replacing the list directly is picked up on the next read
+    memory.messages = memory.messages + [Message.user_message("dddddd")]
+    assert memory.token_count == 9
+
+    memory.clear()
+    assert memory.token_count == 0
+
+
+class BatchTokenizer(WhitespaceTokenizer):
+    """Records batch calls and the thread they run on."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def encode_batch(self, texts):
+        self.batches.append((len(texts), threading.current_thread()))
+        return [text.split() for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_large_context_is_batch_encoded_off_loop():
+    """Tests that uncounted messages are encoded in one batch in a worker thread."""
+    tokenizer = BatchTokenizer()
+    counter = TokenCounter(tokenizer, offload_threshold=100)
+    history = [
+        {"role": "user", "content": "word " * 50},
+        {"role": "assistant", "content": "reply " * 50},
+    ]
+    expected = TokenCounter(WhitespaceTokenizer()).count_message_tokens(history)
+
+    assert await counter.acount_message_tokens(history) == expected
+    assert len(tokenizer.batches) == 1
+    size, thread = tokenizer.batches[0]
+    assert size == 4  # two roles and two contents
+    assert thread is not threading.main_thread()
+
+    # Memoized messages are not encoded again
+    assert await counter.acount_message_tokens(history) == expected
+    assert len(tokenizer.batches) == 1 and tokenizer.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_small_context_is_counted_inline():
+    tokenizer = BatchTokenizer()
+    counter = TokenCounter(tokenizer)
+    history = [{"role": "user", "content": "hello there"}]
+
+    assert await counter.acount_message_tokens(history) == counter.count_message_tokens(
+        history
+    )
+    assert tokenizer.batches == []
+
+
+@pytest.mark.asyncio
+async def test_memory_counts_new_messages_lazily_off_loop(fake_llm):
+    """Tests that adding to memory does not tokenize on the event loop."""
+    tokenizer = BatchTokenizer()
+    fake_llm.token_counter = TokenCounter(tokenizer, offload_threshold=100)
+    memory = Memory()
+    memory.set_token_counter(fake_llm.count_message, fake_llm.acount_messages)
+
+    memory.add_message(Message.user_message("word " * 50))
+    memory.add_message(Message.assistant_message("reply " * 50))
+    assert tokenizer.calls == 0 and tokenizer.batches == []
+
+    total = await memory.atoken_count()
+    assert len(tokenizer.batches) == 1
+    assert tokenizer.batches[0][1] is not threading.main_thread()
+    assert total == sum(fake_llm.count_message(m) for m in memory.messages)
+    assert memory.token_count == total and tokenizer.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_async_total_follows_replacement_and_eviction():
+    """Tests the lazy total across same-length replacement, eviction and re-adds."""
+    batches = []
+
+    async def count_batch(messages):
+        batches.append(len(messages))
+        return [len(message.content) for message in messages]
+
+    memory = Memory(max_messages=2)
+    memory.set_token_counter(lambda message: len(message.content), count_batch)
+    memory.add_messages([Message.user_message("ab"), Message.user_message("cd")])
+    assert await memory.atoken_count() == 4
+
+    memory.messages = [Message.user_message("abcde"), Message.user_message("fghij")]
+    assert await memory.atoken_count() == 10
+
+    evicted = memory.messages[0]
+    memory.add_message(Message.user_message("k"))
+    memory.add_message(evicted)
+    assert [m.content for m in memory.messages] == ["k", "abcde"]
+    assert await memory.atoken_count() == 6
+    assert memory.token_count == 6
+    assert batches == [2, 2, 2]
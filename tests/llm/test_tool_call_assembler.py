@@ -0,0 +1,40 @@
+from openai.types.chat.chat_completion_chunk import (
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+
+from app.llm import ToolCallAssembler
+
+
+def delta(index, id=None, name=None, arguments=None):
+    return ChoiceDeltaToolCall(
+        index=index,
+        id=id,
+        function=ChoiceDeltaToolCallFunction(name=name, arguments=arguments),
+    )
+
+
+def test_call_is_emitted_when_arguments_close():
+    """Tests that a call is released as soon as its JSON arguments are complete."""
+    assembler = ToolCallAssembler()
+    assert assembler.feed([delta(0, id="call_a", name="web_search")]) == []
+    assert assembler.feed([delta(0, arguments='{"query": "py')]) == []
+
+    completed = assembler.feed([delta(0, arguments='thon"}')])
+    assert [call.id for call in completed] == ["call_a"]
+    assert completed[0].function.arguments == '{"query": "python"}'
+
+    # Later calls are still being streamed
+    assert assembler.feed([delta(1, id="call_b", name="terminate")]) == []
+    assert assembler.feed([delta(1, arguments='{"status": "succ')]) == []
+    assert [call.id for call in assembler.finish()] == ["call_b"]
+    assert [call.id for call in assembler.tool_calls] == ["call_a", "call_b"]
+
+
+def test_next_index_flushes_previous_call():
+    """Tests that starting a new call completes the previous one."""
+    assembler = ToolCallAssembler()
+    assembler.feed([delta(0, id="call_a", name="view", arguments='{"path": "/')])
+    completed = assembler.feed([delta(1, id="call_b", name="view")])
+    assert [call.id for call in completed] == ["call_a"]
+    assert assembler.finish()[0].function.arguments == "{}"
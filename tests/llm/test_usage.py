@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from app.usage import current_usage, process_usage, run_usage_scope, usage_scope
+
+
+def test_nested_scopes_roll_up():
+    """Tests that usage is charged to the scope, its parents and the process."""
+    before = process_usage.input_tokens
+    with usage_scope("flow") as flow:
+        with usage_scope("step") as step:
+            current_usage().record("default", 100, 20)
+        flow.record("vision", 10)
+
+    assert step.total_tokens == 120
+    assert flow.input_tokens == 110 and flow.completion_tokens == 20
+    assert flow.config_input_tokens("vision") == 10
+    assert step.run is flow
+    assert process_usage.input_tokens - before == 110
+    assert current_usage() is None
+
+
+def test_budget_applies_to_enclosing_scopes():
+    with usage_scope("run", max_input_tokens=150) as run:
+        with usage_scope("agent") as agent:
+            agent.record("default", 100)
+            assert agent.budget_error(50) is None
+            assert "'run'" in agent.budget_error(51)
+    assert run.budget_error(0) is None
+
+
+def test_run_scope_joins_active_scope():
+    with usage_scope("flow") as flow:
+        with run_usage_scope("agent") as scope:
+            assert scope is flow
+    with run_usage_scope("agent") as scope:
+        assert scope.name == "agent" and scope.parent is process_usage
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_are_isolated():
+    """Tests that concurrent tasks each see and charge only their own scope."""
+
+    async def run(name: str, tokens: int):
+        with usage_scope(name) as scope:
+            for _ in range(3):
+                await asyncio.sleep(0)
+                current_usage().record("default", tokens)
+            return scope
+
+    first, second = await asyncio.gather(run("a", 1), run("b", 10))
+    assert first.input_tokens == 3
+    assert second.input_tokens == 30
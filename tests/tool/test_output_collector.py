@@ -0,0 +1,103 @@
+import pytest
+
+from app import output_collector
+from app.agent.toolcall import ToolCallAgent
+from app.config import config
+from app.output_collector import OutputCollector
+from app.schema import Function, Memory, ToolCall
+from app.tool import ToolCollection
+from app.tool.bash import Bash
+from app.tool.terminal import Terminal
+
+
+def test_short_output_is_kept_whole(tmp_path):
+    collector = OutputCollector(limit=10, directory=tmp_path)
+    collector.write(b"hello ")
+    collector.write(b"you")
+    assert collector.text() == "hello you"
+    assert collector.path is None and not list(tmp_path.iterdir())
+
+
+def test_long_output_keeps_head_and_tail_and_spills(tmp_path):
+    collector = OutputCollector(limit=10, name="cmd", directory=tmp_path)
+    data = b"".join(b"%03d," % i for i in range(1000))
+    for i in range(0, len(data), 7):
+        collector.write(data[i : i + 7])
+
+    text = collector.text()
+    assert text.startswith("000,0") and text.endswith(",999,")
+    assert f"{len(data) - 10} bytes omitted of {len(data)}" in text
+    assert str(collector.path) in text
+    assert collector.path.name.startswith("cmd-")
+    assert collector.path.read_bytes() == data
+
+
+def test_output_can_be_bounded_without_spilling(tmp_path):
+    """Tests the sandbox mode: no host file, and no host path in the text."""
+    collector = OutputCollector(
+        limit=10, name="sandbox", directory=tmp_path, spill=False
+    )
+    collector.write(b"0123456789" * 10)
+
+    text = collector.text()
+    assert text.startswith("01234") and text.endswith("56789")
+    assert "90 bytes omitted of 100" in text and str(tmp_path) not in text
+    assert collector.path is None and not list(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_bash_output_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(type(config), "workspace_root", property(lambda _: tmp_path))
+    bash = Bash()
+    # More than the pipe buffers, which used to stall until the timeout
+    result = await bash.execute("seq 1 200000")
+    assert len(result.output) < 11000
+    assert result.output.startswith("1\n2\n") and result.output.endswith("\n200000")
+    (spilled,) = (tmp_path / "tool_output").iterdir()
+    assert spilled.read_text().splitlines()[-1] == "200000"
+    await bash.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_terminal_output_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(type(config), "workspace_root", property(lambda _: tmp_path))
+    result = await Terminal(max_output=100).execute("seq 1 1000")
+    assert result.output.startswith("1\n2\n") and result.output.endswith("\n1000")
+    assert "bytes omitted" in result.output
+
+
+@pytest.mark.asyncio
+async def test_observation_clipping_keeps_tail_and_saved_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(type(config), "workspace_root", property(lambda _: tmp_path))
+    bash = Bash()
+    agent = ToolCallAgent.model_construct(
+        llm=None,
+        memory=Memory(),
+        available_tools=ToolCollection(bash),
+        special_tool_names=[],
+        max_observe=3000,
+    )
+    agent.tool_calls = [
+        ToolCall(
+            id="call_0",
+            function=Function(name="bash", arguments='{"command": "seq 1 200000"}'),
+        )
+    ]
+
+    observation = await agent.act()
+    await bash.cleanup()
+    assert len(observation) <= 3000
+    assert observation.endswith("\n200000")
+    assert f"saved to {tmp_path / 'tool_output'}" in observation
+
+
+def test_spilled_files_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(output_collector, "MAX_SPILL_BYTES", 250)
+    for i in range(5):
+        collector = OutputCollector(limit=10, name=f"cmd{i}", directory=tmp_path)
+        collector.write(b"x" * 100)
+        collector.close()
+
+    # Older files are removed once the others exceed the cap
+    names = sorted(path.name.split("-")[0] for path in tmp_path.iterdir())
+    assert names == ["cmd2", "cmd3", "cmd4"]
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from app.tool import StrReplaceEditor, ToolCollection
+from app.tool.base import BaseTool, ToolResult
+
+
+class LookupTool(BaseTool):
+    """Counts how often it really runs."""
+
+    name: str = "lookup"
+    description: str = "lookup"
+    cache_ttl: float = 60
+    calls: int = 0
+
+    async def execute(self, query: str, limit: int = None) -> ToolResult:
+        self.calls += 1
+        if query == "broken":
+            return ToolResult(error="engine down")
+        return ToolResult(output=f"{query}:{self.calls}")
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_reuse_results():
+    tool = LookupTool()
+    tools = ToolCollection(tool)
+
+    first = await tools.execute(name="lookup", tool_input={"query": "cats"})
+    again = await tools.execute(
+        name="lookup", tool_input={"limit": None, "query": " cats "}
+    )
+    other = await tools.execute(name="lookup", tool_input={"query": "dogs"})
+    assert again is first and other.output == "dogs:2"
+
+    # Failures are retried rather than cached
+    await tools.execute(name="lookup", tool_input={"query": "broken"})
+    await tools.execute(name="lookup", tool_input={"query": "broken"})
+    assert tool.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_results_expire_after_ttl():
+    tool = LookupTool(cache_ttl=0)
+    tools = ToolCollection(tool)
+    await tools.execute(name="lookup", tool_input={"query": "cats"})
+    await tools.execute(name="lookup", tool_input={"query": "cats"})
+    assert tool.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_file_view_is_invalidated_by_modification(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("first\n")
+    tools = ToolCollection(StrReplaceEditor())
+    view = {"command": "view", "path": str(path)}
+
+    first = await tools.execute(name="str_replace_editor", tool_input=view)
+    assert await tools.execute(name="str_replace_editor", tool_input=view) is first
+
+    path.write_text("second version\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    changed = await tools.execute(name="str_replace_editor", tool_input=view)
+    assert "second version" in str(changed)
+    assert tools.result_cache.hits == 1
+
+    # Directory listings are never cached
+    listing = {"command": "view", "path": str(tmp_path)}
+    await tools.execute(name="str_replace_editor", tool_input=listing)
+    await tools.execute(name="str_replace_editor", tool_input=listing)
+    assert tools.result_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_adding_tools_invalidates_caches():
+    tools = ToolCollection(LookupTool())
+    await tools.execute(name="lookup", tool_input={"query": "cats"})
+    assert len(tools.to_params()) == 1
+    assert tools.params_token_cost(len) > 0
+
+    replacement = LookupTool(description="a better lookup")
+    tools.add_tool(replacement)
+    result = await tools.execute(name="lookup", tool_input={"query": "cats"})
+
+    assert result.output == "cats:1" and replacement.calls == 1
+    assert [p["function"]["description"] for p in tools.to_params()] == [
+        "a better lookup"
+    ]
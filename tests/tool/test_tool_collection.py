@@ -0,0 +1,26 @@
+from app.tool import Terminate, ToolCollection
+from app.tool.create_chat_completion import CreateChatCompletion
+
+
+def test_params_are_cached_until_tools_change():
+    """Tests that schemas and their token cost are rebuilt only on add_tool."""
+    counted = []
+
+    def count_tokens(text: str) -> int:
+        counted.append(text)
+        return len(text)
+
+    tools = ToolCollection(Terminate())
+    version = tools.version
+    params = tools.to_params()
+    cost = tools.params_token_cost(count_tokens)
+
+    assert tools.to_params() == params
+    assert tools.params_token_cost(count_tokens) == cost
+    assert len(counted) == 1
+
+    tools.add_tool(CreateChatCompletion())
+    assert tools.version == version + 1
+    assert len(tools.to_params()) == 2
+    assert tools.params_token_cost(count_tokens) > cost
+    assert len(counted) == 3